@@ -1,362 +1,497 @@
-import requests
-import os
-from typing import Dict, Optional, List
-from datetime import datetime, timedelta
-import time
-
-
-class AmadeusClient:
-    def __init__(self):
-        self.api_key = os.getenv("AMADEUS_API_KEY", "RiiZIbGA9oOEGhOaJ1MYddaVWUw1AoLH")
-        self.api_secret = os.getenv("AMADEUS_API_SECRET", "rS0AG10jrlo8zxmb")
-        self.base_url = os.getenv("AMADEUS_BASE_URL", "https://test.travel.api.amadeus.com")
-        self.token = None
-        self.token_expires_at = None
-
-    def _get_access_token(self) -> str:
-        """Get or refresh OAuth2 access token"""
-        # Check if token is still valid
-        if self.token and self.token_expires_at:
-            if datetime.now() < self.token_expires_at - timedelta(minutes=5):
-                return self.token
-
-        # Get new token
-        url = f"{self.base_url}/v1/security/oauth2/token"
-        headers = {"Content-Type": "application/x-www-form-urlencoded"}
-        data = {
-            "grant_type": "client_credentials",
-            "client_id": self.api_key,
-            "client_secret": self.api_secret
-        }
-
-        try:
-            print(f"🔐 Getting Amadeus access token from: {url}")
-            print(f"   API Key: {self.api_key[:10]}...")
-            
-            response = requests.post(url, headers=headers, data=data, timeout=10)
-            
-            print(f"   Token response status: {response.status_code}")
-            
-            response.raise_for_status()
-            token_data = response.json()
-            self.token = token_data.get("access_token")
-            expires_in = token_data.get("expires_in", 1800)  # Default 30 minutes
-            self.token_expires_at = datetime.now() + timedelta(seconds=expires_in)
-            
-            if self.token:
-                print(f"✅ Access token obtained successfully (expires in {expires_in}s)")
-            else:
-                print(f"⚠️  Warning: No access token in response")
-            
-            return self.token
-        except requests.exceptions.HTTPError as e:
-            error_text = response.text if hasattr(response, 'text') else str(e)
-            print(f"❌ Failed to get access token: {response.status_code}")
-            print(f"   Error: {error_text}")
-            raise Exception(f"Failed to get Amadeus access token: {response.status_code} - {error_text}")
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Request error getting token: {str(e)}")
-            raise Exception(f"Failed to get Amadeus access token: {str(e)}")
-
-    def search_flights(
-        self,
-        origin: str,
-        destination: str,
-        departure_date: str,
-        adults: int = 1,
-        children: int = 0,
-        infants: int = 0,
-        travel_class: str = "ECONOMY",
-        currency: str = "GBP",
-        return_date: Optional[str] = None,
-        direct_only: Optional[bool] = False,
-        max_stops: Optional[int] = None,
-        preferred_airlines: Optional[List[str]] = None,
-        excluded_airlines: Optional[List[str]] = None,
-        earliest_departure: Optional[str] = None,
-        latest_arrival: Optional[str] = None
-    ) -> Dict:
-        """
-        Search for flight offers using Amadeus Flight Offers Search v2.12
-        Uses POST request with JSON body according to Swagger specification
-        """
-        token = self._get_access_token()
-        url = f"{self.base_url}/v2/shopping/flight-offers"
-
-        # Build request body according to v2.12 specification
-        # Ensure we have at least one traveler before building request
-        if adults == 0 and children == 0:
-            raise Exception("At least one adult traveler is required")
-        
-        request_body = {
-            "currencyCode": currency.upper(),
-            "originDestinations": [
-                {
-                    "id": "1",
-                    "originLocationCode": origin.upper(),
-                    "destinationLocationCode": destination.upper(),
-                    "departureDateTimeRange": {
-                        "date": departure_date
-                    }
-                }
-            ],
-            "travelers": [],
-            "sources": ["GDS"],
-            "searchCriteria": {
-                "maxFlightOffers": 250  # Get maximum results for better categorization
-            }
-        }
-        
-        # Build flight filters
-        flight_filters = {}
-        
-        # Add cabin restrictions if not ECONOMY
-        if travel_class.upper() != "ECONOMY":
-            flight_filters["cabinRestrictions"] = [
-                {
-                    "cabin": travel_class.upper(),
-                    "coverage": "MOST_SEGMENTS",
-                    "originDestinationIds": ["1"]
-                }
-            ]
-        
-        # Add direct only filter
-        if direct_only:
-            flight_filters["connectionRestriction"] = {
-                "maxNumberOfConnections": 0
-            }
-        elif max_stops is not None:
-            flight_filters["connectionRestriction"] = {
-                "maxNumberOfConnections": max_stops
-            }
-        
-        # Add carrier restrictions
-        carrier_restrictions = {}
-        if preferred_airlines:
-            carrier_restrictions["includedCarrierCodes"] = [c.upper() for c in preferred_airlines]
-        if excluded_airlines:
-            carrier_restrictions["excludedCarrierCodes"] = [c.upper() for c in excluded_airlines]
-        if carrier_restrictions:
-            flight_filters["carrierRestrictions"] = carrier_restrictions
-        
-        # Add departure/arrival time restrictions
-        if earliest_departure or latest_arrival:
-            departure_time_range = {}
-            if earliest_departure:
-                departure_time_range["earliest"] = earliest_departure
-            if latest_arrival:
-                departure_time_range["latest"] = latest_arrival
-            if departure_time_range:
-                flight_filters["departureTime"] = departure_time_range
-        
-        if flight_filters:
-            request_body["searchCriteria"]["flightFilters"] = flight_filters
-
-        # Add travelers according to v2.12 spec
-        # CRITICAL: Must have at least one traveler
-        traveler_id = 1
-        
-        for i in range(adults):
-            request_body["travelers"].append({
-                "id": str(traveler_id),
-                "travelerType": "ADULT"
-            })
-            traveler_id += 1
-        
-        for i in range(children):
-            request_body["travelers"].append({
-                "id": str(traveler_id),
-                "travelerType": "CHILD"
-            })
-            traveler_id += 1
-        
-        for i in range(infants):
-            # Infants must be associated with an adult (use first adult)
-            adult_id = "1" if adults > 0 else str(traveler_id - children)
-            request_body["travelers"].append({
-                "id": str(traveler_id),
-                "travelerType": "HELD_INFANT",
-                "associatedAdultId": adult_id
-            })
-            traveler_id += 1
-        
-        # Verify travelers array is not empty
-        if not request_body["travelers"]:
-            raise Exception("At least one traveler must be specified")
-        
-        print(f"👥 Travelers added: {len(request_body['travelers'])} travelers")
-        print(f"   Travelers: {request_body['travelers']}")
-
-        # Add return date if provided
-        if return_date:
-            request_body["originDestinations"].append({
-                "id": "2",
-                "originLocationCode": destination.upper(),
-                "destinationLocationCode": origin.upper(),
-                "departureDateTimeRange": {
-                    "date": return_date
-                }
-            })
-            # Update cabin restrictions for return if they exist
-            if "flightFilters" in request_body["searchCriteria"] and "cabinRestrictions" in request_body["searchCriteria"]["flightFilters"]:
-                request_body["searchCriteria"]["flightFilters"]["cabinRestrictions"][0]["originDestinationIds"].append("2")
-
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-            # Removed Accept header - some Amadeus endpoints don't like it
-        }
-
-        try:
-            # Debug: Print request details for troubleshooting
-            print(f"🔍 Amadeus API Request: {url}")
-            print(f"📤 Request method: POST")
-            print(f"📤 Request body: {request_body}")
-            print(f"🔑 Authorization header: Bearer {token[:20]}...")
-            
-            response = requests.post(url, headers=headers, json=request_body, timeout=30)
-            
-            # Debug: Print response status
-            print(f"📥 Response status: {response.status_code}")
-            
-            if response.status_code != 200:
-                print(f"📥 Response headers: {dict(response.headers)}")
-                print(f"📥 Response body: {response.text[:500]}")
-            
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.HTTPError as e:
-            # Log error details
-            error_text = response.text if hasattr(response, 'text') else str(e)
-            print(f"❌ Amadeus API HTTP Error: {response.status_code}")
-            print(f"   Response: {error_text}")
-            
-            if response.status_code == 401:
-                # 401 could mean token issue or invalid request
-                print(f"   🔍 Checking token validity...")
-                print(f"   Token being used: {token[:20]}...")
-                
-                # Try refreshing token and retry
-                print(f"   🔄 Refreshing token and retrying...")
-                self.token = None
-                token = self._get_access_token()
-                headers["Authorization"] = f"Bearer {token}"
-                print(f"   🔑 New token: {token[:20]}...")
-                
-                response = requests.post(url, headers=headers, json=request_body, timeout=30)
-                print(f"   📥 Retry response status: {response.status_code}")
-                
-                if response.status_code == 401:
-                    # Still 401 after token refresh - likely request format issue
-                    print(f"   ⚠️  Still 401 after token refresh - checking request format...")
-                    print(f"   Request body keys: {list(request_body.keys())}")
-                    print(f"   OriginDestinations: {request_body.get('originDestinations')}")
-                    print(f"   Travelers: {request_body.get('travelers')}")
-                
-                response.raise_for_status()
-                return response.json()
-            raise Exception(f"Amadeus API error: {response.status_code} - {error_text}")
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Amadeus API Request Error: {str(e)}")
-            raise Exception(f"Failed to search flights: {str(e)}")
-
-    def search_airports(self, query: str) -> List[Dict]:
-        """Search for airports by keyword"""
-        token = self._get_access_token()
-        url = f"{self.base_url}/v1/reference-data/locations"
-
-        params = {
-            "subType": "AIRPORT",
-            "keyword": query,
-            "page[limit]": 10
-        }
-
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-
-        try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            airports = []
-            for location in data.get("data", []):
-                airports.append({
-                    "code": location.get("iataCode"),
-                    "name": location.get("name"),
-                    "city": location.get("address", {}).get("cityName"),
-                    "country": location.get("address", {}).get("countryName")
-                })
-            return airports
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Failed to search airports: {str(e)}")
-
-    def get_seatmap_for_offer(self, flight_offer: Dict) -> Dict:
-        """Call Amadeus SeatMap Display API for a given flight offer"""
-        token = self._get_access_token()
-        # Some environments expose seatmaps under shopping; try that first
-        shopping_url = f"{self.base_url}/v1/shopping/seatmaps"
-        booking_url = f"{self.base_url}/v1/booking/seatmaps"
-
-        # Build request body per Amadeus spec
-        # Ensure offer has a type as expected by API
-        offer_with_type = dict(flight_offer)
-        offer_with_type.setdefault("type", "flight-offer")
-
-        request_body = {
-            "data": [
-                {
-                    "type": "flight-offers",
-                    "flightOffers": [offer_with_type]
-                }
-            ]
-        }
-
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-
-        # Try shopping endpoint first, then booking as fallback
-        for url in (shopping_url, booking_url):
-            try:
-                print(f"🔍 Seatmap API Request: {url}")
-                response = requests.post(url, headers=headers, json=request_body, timeout=30)
-                print(f"📥 Seatmap response status: {response.status_code}")
-                if response.status_code != 200:
-                    print(f"📥 Seatmap response body: {response.text[:500]}")
-                response.raise_for_status()
-                return response.json()
-            except requests.exceptions.RequestException as e:
-                last_err = e
-        raise Exception(f"Failed to fetch seatmap: {str(last_err)}")
-
-    def price_flight_offer(self, flight_offer: Dict) -> Dict:
-        """Call Flight Offers Pricing to get a priced offer (some APIs require priced offers)"""
-        token = self._get_access_token()
-        url = f"{self.base_url}/v1/shopping/flight-offers/pricing"
-
-        offer_with_type = dict(flight_offer)
-        offer_with_type.setdefault("type", "flight-offer")
-
-        body = {
-            "data": {
-                "type": "flight-offers-pricing",
-                "flightOffers": [offer_with_type]
-            }
-        }
-
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-
-        print(f"🔍 Pricing API Request: {url}")
-        resp = requests.post(url, headers=headers, json=body, timeout=30)
-        print(f"📥 Pricing response status: {resp.status_code}")
-        if resp.status_code != 200:
-            print(f"📥 Pricing response body: {resp.text[:500]}")
-        resp.raise_for_status()
-        return resp.json()
-
+import requests
+import os
+import hashlib
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional, List, Tuple
+import time
+
+from utils.json_stream import JsonStreamError, iter_json_array
+from utils.upstream import UpstreamSession
+from utils.cache import SharedCache
+from utils.rate_limit import MIN_BURST, SharedTokenBucket
+from utils.tokens import SharedAccessToken
+from utils.metrics import UPSTREAM_AUTH_RETRIES, time_stage
+
+
+class AmadeusClient:
+    # Flight Offers Search accepts up to six originDestinations per request
+    MAX_LEGS = 6
+    # Bytes read from the socket at a time when streaming search results
+    STREAM_CHUNK_BYTES = 65536
+
+    def __init__(self):
+        self.api_key = os.getenv("AMADEUS_API_KEY", "RiiZIbGA9oOEGhOaJ1MYddaVWUw1AoLH")
+        self.api_secret = os.getenv("AMADEUS_API_SECRET", "rS0AG10jrlo8zxmb")
+        self.base_url = os.getenv("AMADEUS_BASE_URL", "https://test.travel.api.amadeus.com")
+        # One token per set of credentials, shared by all workers and refreshed before it expires
+        credentials = hashlib.sha256(f"{self.base_url}|{self.api_key}".encode()).hexdigest()[:16]
+        self.token = SharedAccessToken(f"amadeus:{credentials}", self._fetch_access_token)
+        # Shared by all workers: airports hardly change; a priced offer and its seat map
+        # are requested several times while a traveller looks at one flight
+        self.airport_cache = SharedCache("airports", ttl=float(os.getenv("AIRPORT_CACHE_TTL", "86400")))
+        self.pricing_cache = SharedCache("pricing", ttl=float(os.getenv("PRICING_CACHE_TTL", "60")))
+        self.seatmap_cache = SharedCache("seatmap", ttl=float(os.getenv("SEATMAP_CACHE_TTL", "60")))
+        # Amadeus enforces a per-key transaction rate; all workers share one bucket.
+        # The default burst is the rate, but never so small that batch or background
+        # calls have no capacity above their reserve.
+        rate = float(os.getenv("AMADEUS_RATE_LIMIT", "10"))
+        rate_limiter = SharedTokenBucket(
+            "amadeus", rate=rate, burst=float(os.getenv("AMADEUS_RATE_BURST", str(max(rate, MIN_BURST))))
+        ) if rate > 0 else None
+        self.http = UpstreamSession("amadeus", adaptive_timeouts=True, rate_limiter=rate_limiter)
+        # Parallel searches of one multi-airport search (see search_airport_pairs)
+        self.fanout_workers = int(os.getenv("METRO_FANOUT_WORKERS", "6"))
+        self._fanout: Optional[ThreadPoolExecutor] = None
+
+    def warm_up(self):
+        """
+        Load an access token and start refreshing it in the background, so the
+        first search does not pay for it (also opens the pooled connection)
+        """
+        self.token.start_refresher()
+        self._get_access_token()
+
+    def close(self):
+        """Stop the token refresher and release pooled connections"""
+        self.token.stop()
+        if self._fanout is not None:
+            self._fanout.shutdown(wait=False, cancel_futures=True)
+        self.http.close()
+
+    def _get_access_token(self) -> str:
+        """Get OAuth2 access token"""
+        return self.token.get()
+
+    def _fetch_access_token(self) -> Tuple[str, float]:
+        """Request a new OAuth2 access token; returns (token, expires_in seconds)"""
+        url = f"{self.base_url}/v1/security/oauth2/token"
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        data = {
+            "grant_type": "client_credentials",
+            "client_id": self.api_key,
+            "client_secret": self.api_secret
+        }
+
+        try:
+            print(f"🔐 Getting Amadeus access token from: {url}")
+            print(f"   API Key: {self.api_key[:10]}...")
+            
+            response = self.http.request("token", "POST", url, idempotent=True, headers=headers, data=data, timeout=10)
+            
+            print(f"   Token response status: {response.status_code}")
+            
+            response.raise_for_status()
+            token_data = response.json()
+            token = token_data.get("access_token")
+            expires_in = token_data.get("expires_in", 1800)  # Default 30 minutes
+            
+            if token:
+                print(f"✅ Access token obtained successfully (expires in {expires_in}s)")
+            else:
+                print(f"⚠️  Warning: No access token in response")
+            
+            return token, expires_in
+        except requests.exceptions.HTTPError as e:
+            error_text = response.text if hasattr(response, 'text') else str(e)
+            print(f"❌ Failed to get access token: {response.status_code}")
+            print(f"   Error: {error_text}")
+            raise Exception(f"Failed to get Amadeus access token: {response.status_code} - {error_text}")
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Request error getting token: {str(e)}")
+            raise Exception(f"Failed to get Amadeus access token: {str(e)}")
+
+    def search_flights(
+        self,
+        origin: str,
+        destination: str,
+        departure_date: str,
+        adults: int = 1,
+        children: int = 0,
+        infants: int = 0,
+        travel_class: str = "ECONOMY",
+        currency: str = "GBP",
+        return_date: Optional[str] = None,
+        direct_only: Optional[bool] = False,
+        max_stops: Optional[int] = None,
+        preferred_airlines: Optional[List[str]] = None,
+        excluded_airlines: Optional[List[str]] = None,
+        earliest_departure: Optional[str] = None,
+        latest_arrival: Optional[str] = None,
+        legs: Optional[List[Dict]] = None,
+        raw: bool = False,
+        consume: Optional[Callable[[Iterator[Dict]], Any]] = None
+    ):
+        """
+        Search for flight offers using Amadeus Flight Offers Search v2.12
+        Uses POST request with JSON body according to Swagger specification
+
+        legs: For multi-city trips, {"origin", "destination", "departure_date"} per leg
+        (at most MAX_LEGS), all searched in this one request; origin, destination and
+        return_date are then ignored. Each offer has one itinerary per leg.
+
+        Returns the decoded response, or with raw=True its undecoded body (bytes),
+        e.g. to decode it in an offload process.
+
+        consume: Stream the response instead: consume is called with an iterator
+        over its data[] offers, each decoded as soon as its bytes arrive, and its
+        result is returned. The body is never held whole. If the transfer breaks
+        off midway, the search is sent again unstreamed and consume runs over
+        the decoded offers.
+        """
+        token = self._get_access_token()
+        url = f"{self.base_url}/v2/shopping/flight-offers"
+
+        # Build request body according to v2.12 specification
+        # Ensure we have at least one traveler before building request
+        if adults == 0 and children == 0:
+            raise Exception("At least one adult traveler is required")
+        
+        if legs is None:
+            legs = [{"origin": origin, "destination": destination, "departure_date": departure_date}]
+            if return_date:
+                legs.append({"origin": destination, "destination": origin, "departure_date": return_date})
+        if not 1 <= len(legs) <= self.MAX_LEGS:
+            raise Exception(f"A search needs between 1 and {self.MAX_LEGS} legs, got {len(legs)}")
+        leg_ids = [str(n) for n in range(1, len(legs) + 1)]
+
+        request_body = {
+            "currencyCode": currency.upper(),
+            "originDestinations": [
+                {
+                    "id": leg_id,
+                    "originLocationCode": leg["origin"].upper(),
+                    "destinationLocationCode": leg["destination"].upper(),
+                    "departureDateTimeRange": {
+                        "date": leg["departure_date"]
+                    }
+                }
+                for leg_id, leg in zip(leg_ids, legs)
+            ],
+            "travelers": [],
+            "sources": ["GDS"],
+            "searchCriteria": {
+                "maxFlightOffers": 250  # Get maximum results for better categorization
+            }
+        }
+        
+        # Build flight filters
+        flight_filters = {}
+        
+        # Add cabin restrictions if not ECONOMY
+        if travel_class.upper() != "ECONOMY":
+            flight_filters["cabinRestrictions"] = [
+                {
+                    "cabin": travel_class.upper(),
+                    "coverage": "MOST_SEGMENTS",
+                    "originDestinationIds": leg_ids
+                }
+            ]
+        
+        # Add direct only filter
+        if direct_only:
+            flight_filters["connectionRestriction"] = {
+                "maxNumberOfConnections": 0
+            }
+        elif max_stops is not None:
+            flight_filters["connectionRestriction"] = {
+                "maxNumberOfConnections": max_stops
+            }
+        
+        # Add carrier restrictions
+        carrier_restrictions = {}
+        if preferred_airlines:
+            carrier_restrictions["includedCarrierCodes"] = [c.upper() for c in preferred_airlines]
+        if excluded_airlines:
+            carrier_restrictions["excludedCarrierCodes"] = [c.upper() for c in excluded_airlines]
+        if carrier_restrictions:
+            flight_filters["carrierRestrictions"] = carrier_restrictions
+        
+        # Add departure/arrival time restrictions
+        if earliest_departure or latest_arrival:
+            departure_time_range = {}
+            if earliest_departure:
+                departure_time_range["earliest"] = earliest_departure
+            if latest_arrival:
+                departure_time_range["latest"] = latest_arrival
+            if departure_time_range:
+                flight_filters["departureTime"] = departure_time_range
+        
+        if flight_filters:
+            request_body["searchCriteria"]["flightFilters"] = flight_filters
+
+        # Add travelers according to v2.12 spec
+        # CRITICAL: Must have at least one traveler
+        traveler_id = 1
+        
+        for i in range(adults):
+            request_body["travelers"].append({
+                "id": str(traveler_id),
+                "travelerType": "ADULT"
+            })
+            traveler_id += 1
+        
+        for i in range(children):
+            request_body["travelers"].append({
+                "id": str(traveler_id),
+                "travelerType": "CHILD"
+            })
+            traveler_id += 1
+        
+        for i in range(infants):
+            # Infants must be associated with an adult (use first adult)
+            adult_id = "1" if adults > 0 else str(traveler_id - children)
+            request_body["travelers"].append({
+                "id": str(traveler_id),
+                "travelerType": "HELD_INFANT",
+                "associatedAdultId": adult_id
+            })
+            traveler_id += 1
+        
+        # Verify travelers array is not empty
+        if not request_body["travelers"]:
+            raise Exception("At least one traveler must be specified")
+        
+        print(f"👥 Travelers added: {len(request_body['travelers'])} travelers")
+        print(f"   Travelers: {request_body['travelers']}")
+
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+            # Removed Accept header - some Amadeus endpoints don't like it
+        }
+
+        def resend() -> requests.Response:
+            # Unstreamed, with whatever token headers hold by then
+            return self.http.request("flight-offers", "POST", url, hedge=True, headers=headers, json=request_body,
+                                     timeout=30)
+
+        try:
+            # Debug: Print request details for troubleshooting
+            print(f"🔍 Amadeus API Request: {url}")
+            print(f"📤 Request method: POST")
+            print(f"📤 Request body: {request_body}")
+            print(f"🔑 Authorization header: Bearer {token[:20]}...")
+            
+            response = self.http.request("flight-offers", "POST", url, hedge=True, headers=headers, json=request_body,
+                                         timeout=30, stream=consume is not None)
+            
+            # Debug: Print response status
+            print(f"📥 Response status: {response.status_code}")
+            
+            if response.status_code != 200:
+                print(f"📥 Response headers: {dict(response.headers)}")
+                print(f"📥 Response body: {response.text[:500]}")
+            
+            response.raise_for_status()
+            return self._search_body(response, raw, consume, resend)
+        except requests.exceptions.HTTPError as e:
+            # Log error details
+            error_text = response.text if hasattr(response, 'text') else str(e)
+            print(f"❌ Amadeus API HTTP Error: {response.status_code}")
+            print(f"   Response: {error_text}")
+            
+            if response.status_code == 401:
+                # 401 could mean token issue or invalid request
+                print(f"   🔍 Checking token validity...")
+                print(f"   Token being used: {token[:20]}...")
+                
+                # Try refreshing token and retry
+                print(f"   🔄 Refreshing token and retrying...")
+                self.token.invalidate(token)
+                token = self._get_access_token()
+                headers["Authorization"] = f"Bearer {token}"
+                UPSTREAM_AUTH_RETRIES.labels("amadeus", "flight-offers").inc()
+                print(f"   🔑 New token: {token[:20]}...")
+                
+                response = self.http.request("flight-offers", "POST", url, hedge=True, headers=headers,
+                                             json=request_body, timeout=30, stream=consume is not None)
+                print(f"   📥 Retry response status: {response.status_code}")
+                
+                if response.status_code == 401:
+                    # Still 401 after token refresh - likely request format issue
+                    print(f"   ⚠️  Still 401 after token refresh - checking request format...")
+                    print(f"   Request body keys: {list(request_body.keys())}")
+                    print(f"   OriginDestinations: {request_body.get('originDestinations')}")
+                    print(f"   Travelers: {request_body.get('travelers')}")
+                
+                response.raise_for_status()
+                return self._search_body(response, raw, consume, resend)
+            raise Exception(f"Amadeus API error: {response.status_code} - {error_text}")
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Amadeus API Request Error: {str(e)}")
+            raise Exception(f"Failed to search flights: {str(e)}")
+
+    def search_airport_pairs(self, pairs: List[Tuple[str, str]], **search_args) -> List[Any]:
+        """
+        search_flights() for each (origin, destination) pair, in parallel (at
+        most METRO_FANOUT_WORKERS at a time), e.g. every airport pair of two
+        metro areas. search_args apply to every search (raw, consume, ...).
+
+        Returns the results of the searches that succeeded, in pair order;
+        raises the first error if none did.
+        """
+        if self._fanout is None:
+            self._fanout = ThreadPoolExecutor(max_workers=self.fanout_workers, thread_name_prefix="amadeus-fanout")
+        # Each search runs in a copy of the caller's context: priority, deadline and trace carry over
+        futures = [
+            self._fanout.submit(contextvars.copy_context().run, self.search_flights,
+                                origin=origin, destination=destination, **search_args)
+            for origin, destination in pairs
+        ]
+        results = []
+        errors = []
+        for (origin, destination), future in zip(pairs, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"⚠️  Search {origin}-{destination} failed: {e}")
+                errors.append(e)
+        if not results and errors:
+            raise errors[0]
+        return results
+
+    def _search_body(self, response: requests.Response, raw: bool,
+                     consume: Optional[Callable[[Iterator[Dict]], Any]], resend: Callable[[], requests.Response]):
+        if consume is not None:
+            try:
+                with response:
+                    return consume(iter_json_array(response.iter_content(self.STREAM_CHUNK_BYTES), "data"))
+            except (requests.exceptions.RequestException, JsonStreamError) as e:
+                # Past the point where UpstreamSession retries: the headers had arrived
+                print(f"⚠️  Flight offers stream broke off ({e}); searching again without streaming")
+                try:
+                    response = resend()
+                    response.raise_for_status()
+                except requests.exceptions.RequestException as retry_error:
+                    # Not HTTPError: the streamed response's body cannot be read again for the error handler
+                    raise Exception(f"Failed to search flights: {retry_error}") from retry_error
+                with time_stage("decode"):
+                    offers = response.json().get("data") or []
+                return consume(iter(offers))
+        if raw:
+            return response.content
+        with time_stage("decode"):
+            return response.json()
+
+    def search_airports(self, query: str) -> List[Dict]:
+        """Search for airports by keyword (cached for AIRPORT_CACHE_TTL seconds)"""
+        return self.airport_cache.get_or_load(query.strip().lower(), lambda: self._search_airports(query))
+
+    def _search_airports(self, query: str) -> List[Dict]:
+        token = self._get_access_token()
+        url = f"{self.base_url}/v1/reference-data/locations"
+
+        params = {
+            "subType": "AIRPORT",
+            "keyword": query,
+            "page[limit]": 10
+        }
+
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+        try:
+            response = self.http.request("locations", "GET", url, hedge=True, headers=headers, params=params, timeout=10)
+            response.raise_for_status()
+            data = response.json()
+            airports = []
+            for location in data.get("data", []):
+                airports.append({
+                    "code": location.get("iataCode"),
+                    "name": location.get("name"),
+                    "city": location.get("address", {}).get("cityName"),
+                    "country": location.get("address", {}).get("countryName")
+                })
+            return airports
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Failed to search airports: {str(e)}")
+
+    @staticmethod
+    def _offer_key(flight_offer: Dict) -> str:
+        return json.dumps(flight_offer, sort_keys=True, separators=(",", ":"))
+
+    def get_seatmap_for_offer(self, flight_offer: Dict) -> Dict:
+        """Call Amadeus SeatMap Display API for a given flight offer (cached for SEATMAP_CACHE_TTL seconds)"""
+        return self.seatmap_cache.get_or_load(
+            self._offer_key(flight_offer), lambda: self._get_seatmap_for_offer(flight_offer)
+        )
+
+    def _get_seatmap_for_offer(self, flight_offer: Dict) -> Dict:
+        token = self._get_access_token()
+        # Some environments expose seatmaps under shopping; try that first
+        shopping_url = f"{self.base_url}/v1/shopping/seatmaps"
+        booking_url = f"{self.base_url}/v1/booking/seatmaps"
+
+        # Build request body per Amadeus spec
+        # Ensure offer has a type as expected by API
+        offer_with_type = dict(flight_offer)
+        offer_with_type.setdefault("type", "flight-offer")
+
+        request_body = {
+            "data": [
+                {
+                    "type": "flight-offers",
+                    "flightOffers": [offer_with_type]
+                }
+            ]
+        }
+
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+        # Try shopping endpoint first, then booking as fallback
+        for url in (shopping_url, booking_url):
+            try:
+                print(f"🔍 Seatmap API Request: {url}")
+                response = self.http.request("seatmaps", "POST", url, hedge=True, headers=headers, json=request_body, timeout=30)
+                print(f"📥 Seatmap response status: {response.status_code}")
+                if response.status_code != 200:
+                    print(f"📥 Seatmap response body: {response.text[:500]}")
+                response.raise_for_status()
+                return response.json()
+            except requests.exceptions.RequestException as e:
+                last_err = e
+        raise Exception(f"Failed to fetch seatmap: {str(last_err)}")
+
+    def price_flight_offer(self, flight_offer: Dict) -> Dict:
+        """
+        Call Flight Offers Pricing to get a priced offer (some APIs require priced offers).
+        Cached for PRICING_CACHE_TTL seconds, so fare rules and the price check share one call.
+        """
+        return self.pricing_cache.get_or_load(
+            self._offer_key(flight_offer), lambda: self._price_flight_offer(flight_offer)
+        )
+
+    def _price_flight_offer(self, flight_offer: Dict) -> Dict:
+        token = self._get_access_token()
+        url = f"{self.base_url}/v1/shopping/flight-offers/pricing"
+
+        offer_with_type = dict(flight_offer)
+        offer_with_type.setdefault("type", "flight-offer")
+
+        body = {
+            "data": {
+                "type": "flight-offers-pricing",
+                "flightOffers": [offer_with_type]
+            }
+        }
+
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+        print(f"🔍 Pricing API Request: {url}")
+        resp = self.http.request("pricing", "POST", url, idempotent=True, headers=headers, json=body, timeout=30)
+        print(f"📥 Pricing response status: {resp.status_code}")
+        if resp.status_code != 200:
+            print(f"📥 Pricing response body: {resp.text[:500]}")
+        resp.raise_for_status()
+        return resp.json()
+
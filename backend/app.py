@@ -1,748 +1,1334 @@
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
-from datetime import datetime, timedelta
-import os
-import uuid
-from dotenv import load_dotenv
-from sqlalchemy.orm import Session
-
-from amadeus_client import AmadeusClient
-from utils.categorizer import FlightCategorizer
-from paypal_client import PayPalClient
-from database import get_db, init_db, Booking, Payment
-from email_service import EmailService
-
-load_dotenv()
-
-# Initialize database (with error handling for SSL/connection issues)
-try:
-    init_db()
-    print("✅ Database connection successful")
-except Exception as e:
-    print(f"⚠️  Database initialization warning: {e}")
-    print("   The app will continue but database features may not work.")
-    print("   This is normal if database is not accessible or SSL is misconfigured.")
-
-app = FastAPI(title="Flight Booking Bot API", version="1.0.0")
-
-# CORS middleware
-# Get allowed origins from environment or use defaults
-allowed_origins_str = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:5173,https://bookingbot.abovethewings.com")
-allowed_origins = [origin.strip() for origin in allowed_origins_str.split(",")]
-
-# Also allow localhost with different formats
-allowed_origins.extend([
-    "http://127.0.0.1:3000",
-    "http://127.0.0.1:5173",
-    "http://localhost:3000",
-    "http://localhost:5173",
-])
-
-# Remove duplicates
-allowed_origins = list(set(allowed_origins))
-
-print(f"🌐 CORS allowed origins: {allowed_origins}")
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=allowed_origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Initialize clients
-amadeus_client = AmadeusClient()
-categorizer = FlightCategorizer()
-paypal_client = PayPalClient()
-email_service = EmailService()
-
-
-class FlightSearchRequest(BaseModel):
-    origin: str
-    destination: str
-    departure_date: str
-    return_date: Optional[str] = None
-    adults: int = 1
-    children: int = 0
-    infants: int = 0
-    travel_class: str = "ECONOMY"
-    currency: str = "GBP"
-    flexibility: Optional[int] = None  # ±N days
-    trip_type: str = "one-way"  # one-way, round-trip, multi-city
-    direct_only: Optional[bool] = False
-    max_stops: Optional[int] = None
-    preferred_airlines: Optional[List[str]] = None
-    excluded_airlines: Optional[List[str]] = None
-    earliest_departure: Optional[str] = None
-    latest_arrival: Optional[str] = None
-
-
-class FlightOffer(BaseModel):
-    id: str
-    airline: str
-    airline_logo: Optional[str] = None
-    departure_airport: str
-    arrival_airport: str
-    departure_time: str
-    arrival_time: str
-    duration: str
-    stops: int
-    cabin_class: str
-    price: float
-    currency: str
-    category: str
-    segments: List[dict]
-
-
-class BookingRequest(BaseModel):
-    flight_id: str
-    customer_email: EmailStr
-    customer_name: str
-    customer_phone: Optional[str] = None
-    origin: str
-    destination: str
-    departure_date: str
-    departure_time: str
-    arrival_time: str
-    airline: str
-    cabin_class: str
-    duration: str
-    stops: int
-    total_price: float
-    currency: str = "GBP"
-    adults: int = 1
-    children: int = 0
-    infants: int = 0
-    passenger_details: Optional[dict] = None
-    flight_data: Optional[dict] = None
-    ssr_requests: Optional[List[dict]] = None  # Special service requests
-    seat_assignments: Optional[List[dict]] = None
-    ancillaries: Optional[List[dict]] = None  # Extra bags, lounge, etc.
-
-
-class PaymentCaptureRequest(BaseModel):
-    order_id: str
-    booking_reference: str
-
-
-class OfferPriceRequest(BaseModel):
-    flight_offer: dict  # Full flight offer from Amadeus
-
-
-class FareRulesRequest(BaseModel):
-    flight_offer: dict
-
-
-class SeatMapRequest(BaseModel):
-    flight_offer: dict
-
-
-class PNRCreateRequest(BaseModel):
-    booking_reference: str
-    flight_offer: dict
-    passengers: List[dict]
-    contacts: Optional[dict] = None
-    ssr: Optional[List[dict]] = None
-    osi: Optional[List[dict]] = None
-
-
-class ChangeBookingRequest(BaseModel):
-    booking_reference: str
-    new_flight_offer: dict
-    change_type: str  # date_change, route_change, etc.
-
-
-class CancelBookingRequest(BaseModel):
-    booking_reference: str
-    reason: Optional[str] = None
-
-
-@app.get("/")
-def root():
-    return {"message": "Flight Booking Bot API", "status": "running"}
-
-
-@app.get("/health")
-def health_check():
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
-
-
-@app.post("/api/search-flights", response_model=dict)
-async def search_flights(request: FlightSearchRequest):
-    """
-    Search flights and return 4 curated options:
-    1. Cheapest
-    2. Fastest/Direct
-    3. Most Comfortable
-    4. Best Future Deal (30 days later)
-    """
-    try:
-        # Validate date format
-        try:
-            departure_date = datetime.strptime(request.departure_date, "%Y-%m-%d")
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
-
-        # Get flight offers for requested date
-        try:
-            flight_offers = amadeus_client.search_flights(
-                origin=request.origin,
-                destination=request.destination,
-                departure_date=request.departure_date,
-                return_date=request.return_date,
-                adults=request.adults,
-                children=request.children,
-                infants=request.infants,
-                travel_class=request.travel_class,
-                currency=request.currency,
-                direct_only=request.direct_only,
-                max_stops=request.max_stops,
-                preferred_airlines=request.preferred_airlines,
-                excluded_airlines=request.excluded_airlines,
-                earliest_departure=request.earliest_departure,
-                latest_arrival=request.latest_arrival
-            )
-        except Exception as e:
-            print(f"❌ Amadeus API call failed: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Amadeus API error: {str(e)}")
-
-        if not flight_offers or "data" not in flight_offers or not flight_offers["data"]:
-            # Return empty result instead of error to allow frontend to handle gracefully
-            return {
-                "cheapest": None,
-                "fastest": None,
-                "most_comfortable": None,
-                "best_future_deal": None,
-                "search_params": {
-                    "origin": request.origin,
-                    "destination": request.destination,
-                    "departure_date": request.departure_date,
-                    "adults": request.adults,
-                    "children": request.children
-                },
-                "message": "No flights found for the specified criteria"
-            }
-
-        # Categorize flights
-        try:
-            categorized = categorizer.categorize_flights(flight_offers["data"])
-        except Exception as e:
-            print(f"❌ Error categorizing flights: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            raise HTTPException(status_code=500, detail=f"Error categorizing flights: {str(e)}")
-
-        # If best future deal is requested, search for 30 days later
-        future_deal = None
-        if categorized.get("best_future_deal") is None:
-            future_date = departure_date + timedelta(days=30)
-            try:
-                future_offers = amadeus_client.search_flights(
-                    origin=request.origin,
-                    destination=request.destination,
-                    departure_date=future_date.strftime("%Y-%m-%d"),
-                    adults=request.adults,
-                    children=request.children,
-                    infants=request.infants,
-                    travel_class=request.travel_class,
-                    currency=request.currency
-                )
-                if future_offers and "data" in future_offers and future_offers["data"]:
-                    future_deal = categorizer.get_best_future_deal(future_offers["data"])
-            except Exception as e:
-                print(f"Error fetching future deal: {e}")
-
-        # Get all parsed flights for scrolling/pagination
-        all_flights = []
-        try:
-            for offer in flight_offers["data"]:
-                parsed = categorizer._parse_flight_offer(offer)
-                if parsed:
-                    all_flights.append(parsed)
-            # Sort by price (cheapest first)
-            all_flights.sort(key=lambda x: x.get("price", float('inf')))
-        except Exception as e:
-            print(f"Warning: Error parsing all flights: {e}")
-        
-        # Build result, ensuring no None values cause issues
-        result = {
-            "cheapest": categorized.get("cheapest"),
-            "fastest": categorized.get("fastest"),
-            "most_comfortable": categorized.get("most_comfortable"),
-            "best_future_deal": future_deal if future_deal else categorized.get("best_future_deal"),
-            "all_flights": all_flights[:50],  # Limit to 50 for performance, sorted by price
-            "search_params": {
-                "origin": request.origin,
-                "destination": request.destination,
-                "departure_date": request.departure_date,
-                "adults": request.adults,
-                "children": request.children
-            }
-        }
-        
-        # Validate result has at least one flight category
-        if not result.get("cheapest") and not result.get("fastest") and not result.get("most_comfortable"):
-            print("⚠️  Warning: No flight categories found in result")
-            # Return result with message instead of error
-            result["message"] = "Failed to categorize flights - no valid categories returned"
-            return result
-        
-        print(f"✅ Returning result with {len([k for k in ['cheapest', 'fastest', 'most_comfortable'] if result.get(k)])} categories")
-        
-        # Clean result to ensure JSON serialization works
-        # Remove any None values that might cause issues
-        cleaned_result = {}
-        for key, value in result.items():
-            if value is not None:
-                cleaned_result[key] = value
-        
-        return cleaned_result
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"❌ Unhandled exception in search_flights:")
-        print(f"   Error: {str(e)}")
-        print(f"   Type: {type(e).__name__}")
-        print(f"   Traceback:\n{error_trace}")
-        raise HTTPException(status_code=500, detail=f"Error searching flights: {str(e)}")
-
-
-@app.get("/api/airports")
-async def get_airports(query: str):
-    """Search for airports by city or airport code"""
-    try:
-        airports = amadeus_client.search_airports(query)
-        return {"airports": airports}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error searching airports: {str(e)}")
-
-
-@app.post("/api/create-booking")
-async def create_booking(booking_request: BookingRequest, db: Session = Depends(get_db)):
-    """Create a booking and initiate PayPal payment"""
-    try:
-        # Generate unique booking reference
-        booking_reference = f"ATW-{uuid.uuid4().hex[:8].upper()}"
-
-        # Create booking record
-        booking = Booking(
-            booking_reference=booking_reference,
-            customer_email=booking_request.customer_email,
-            customer_name=booking_request.customer_name,
-            customer_phone=booking_request.customer_phone,
-            flight_id=booking_request.flight_id,
-            origin=booking_request.origin,
-            destination=booking_request.destination,
-            departure_date=booking_request.departure_date,
-            departure_time=booking_request.departure_time,
-            arrival_time=booking_request.arrival_time,
-            airline=booking_request.airline,
-            cabin_class=booking_request.cabin_class,
-            duration=booking_request.duration,
-            stops=booking_request.stops,
-            adults=booking_request.adults,
-            children=booking_request.children,
-            infants=booking_request.infants,
-            passenger_details=booking_request.passenger_details,
-            total_price=booking_request.total_price,
-            currency=booking_request.currency,
-            flight_data=booking_request.flight_data,
-            payment_status="pending",
-            booking_status="pending"
-        )
-
-        db.add(booking)
-        db.commit()
-        db.refresh(booking)
-
-        # Create PayPal order
-        try:
-            paypal_order = paypal_client.create_order(
-                amount=booking_request.total_price,
-                currency=booking_request.currency,
-                description=f"Flight Booking {booking_reference}: {booking_request.origin} to {booking_request.destination}",
-                return_url=f"{os.getenv('FRONTEND_URL', 'https://bookingbot.abovethewings.com/bookingbot')}/payment-success?booking={booking_reference}",
-                cancel_url=f"{os.getenv('FRONTEND_URL', 'https://bookingbot.abovethewings.com/bookingbot')}/payment-cancelled?booking={booking_reference}"
-            )
-        except Exception as paypal_error:
-            print(f"❌ PayPal order creation failed: {str(paypal_error)}")
-            # Still save the booking but mark payment as failed
-            booking.payment_status = "failed"
-            booking.booking_status = "payment_failed"
-            db.commit()
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to create PayPal payment: {str(paypal_error)}. Your booking has been saved but payment could not be processed. Please contact support."
-            )
-
-        # Store PayPal order ID
-        booking.paypal_order_id = paypal_order.get("id")
-        db.commit()
-
-        # Create payment record
-        payment = Payment(
-            booking_id=booking.id,
-            paypal_order_id=paypal_order.get("id"),
-            amount=booking_request.total_price,
-            currency=booking_request.currency,
-            status="pending",
-            paypal_response=paypal_order
-        )
-        db.add(payment)
-        db.commit()
-
-        # Return approval URL for redirect
-        approval_url = None
-        for link in paypal_order.get("links", []):
-            if link.get("rel") == "approve":
-                approval_url = link.get("href")
-                break
-
-        if not approval_url:
-            print(f"⚠️  Warning: No approval URL found in PayPal order response")
-            print(f"   PayPal order links: {paypal_order.get('links', [])}")
-            raise HTTPException(
-                status_code=500, 
-                detail="PayPal order created but no approval URL found. Please check PayPal order response."
-            )
-
-        print(f"✅ Booking created successfully")
-        print(f"   Booking Reference: {booking_reference}")
-        print(f"   PayPal Order ID: {paypal_order.get('id')}")
-        print(f"   Approval URL: {approval_url[:80]}...")
-
-        return {
-            "booking_reference": booking_reference,
-            "booking_id": booking.id,
-            "paypal_order_id": paypal_order.get("id"),
-            "approval_url": approval_url,
-            "status": "pending"
-        }
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error creating booking: {str(e)}")
-
-
-@app.post("/api/capture-payment")
-async def capture_payment(payment_request: PaymentCaptureRequest, db: Session = Depends(get_db)):
-    """Capture PayPal payment and confirm booking"""
-    try:
-        # Get booking - try by booking reference first, then by PayPal order ID
-        booking = db.query(Booking).filter(
-            Booking.booking_reference == payment_request.booking_reference
-        ).first()
-
-        if not booking:
-            # Try to find by PayPal order ID
-            booking = db.query(Booking).filter(
-                Booking.paypal_order_id == payment_request.order_id
-            ).first()
-
-        if not booking:
-            raise HTTPException(status_code=404, detail="Booking not found")
-        
-        # Use booking's PayPal order ID if available, otherwise use provided order_id
-        order_id_to_capture = booking.paypal_order_id or payment_request.order_id
-
-        # Capture PayPal payment
-        capture_result = paypal_client.capture_order(order_id_to_capture)
-
-        # Check if payment was successful
-        payment_status = capture_result.get("status", "FAILED")
-        if payment_status == "COMPLETED":
-            # Extract payment ID
-            payment_id = None
-            if "purchase_units" in capture_result:
-                for unit in capture_result["purchase_units"]:
-                    if "payments" in unit and "captures" in unit["payments"]:
-                        captures = unit["payments"]["captures"]
-                        if captures:
-                            payment_id = captures[0].get("id")
-
-            # Update booking
-            booking.payment_status = "completed"
-            booking.booking_status = "confirmed"
-            booking.paypal_payment_id = payment_id
-            booking.payment_amount = booking.total_price
-
-            # Update payment record
-            payment = db.query(Payment).filter(
-                Payment.paypal_order_id == payment_request.order_id
-            ).first()
-            if payment:
-                payment.status = "completed"
-                payment.paypal_payment_id = payment_id
-                payment.paypal_response = capture_result
-
-            db.commit()
-
-            # Send confirmation emails
-            flight_details = {
-                "origin": booking.origin,
-                "destination": booking.destination,
-                "departure_time": booking.departure_time,
-                "arrival_time": booking.arrival_time,
-                "airline": booking.airline,
-                "cabin_class": booking.cabin_class,
-                "duration": booking.duration
-            }
-
-            booking_details = {
-                "customer_name": booking.customer_name,
-                "customer_email": booking.customer_email,
-                "customer_phone": booking.customer_phone,
-                "departure_date": booking.departure_date,
-                "total_price": booking.total_price,
-                "currency": booking.currency,
-                "payment_status": booking.payment_status
-            }
-
-            email_sent = email_service.send_booking_confirmation(
-                customer_email=booking.customer_email,
-                booking_reference=booking.booking_reference,
-                booking_details=booking_details,
-                flight_details=flight_details
-            )
-
-            booking.confirmation_sent = email_sent
-            db.commit()
-
-            return {
-                "status": "success",
-                "booking_reference": booking.booking_reference,
-                "payment_status": "completed",
-                "email_sent": email_sent,
-                "message": "Payment captured and booking confirmed"
-            }
-        else:
-            # Payment failed
-            booking.payment_status = "failed"
-            db.commit()
-
-            return {
-                "status": "failed",
-                "message": "Payment capture failed",
-                "details": capture_result
-            }
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error capturing payment: {str(e)}")
-
-
-@app.get("/api/booking/{booking_reference}")
-async def get_booking(booking_reference: str, db: Session = Depends(get_db)):
-    """Get booking details by reference"""
-    booking = db.query(Booking).filter(
-        Booking.booking_reference == booking_reference
-    ).first()
-
-    if not booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
-
-    return booking.to_dict()
-
-
-@app.post("/api/price-offer")
-async def price_offer(request: OfferPriceRequest):
-    """Price a flight offer to get final pricing and fare rules"""
-    try:
-        priced_offer = amadeus_client.price_flight_offer(request.flight_offer)
-        return {"priced_offer": priced_offer}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error pricing offer: {str(e)}")
-
-
-@app.post("/api/fare-rules")
-async def get_fare_rules(request: FareRulesRequest):
-    """Get fare rules for a flight offer"""
-    try:
-        # Amadeus Quick Connect may have a specific fare rules endpoint
-        # For now, we'll extract from the priced offer
-        priced_offer = amadeus_client.price_flight_offer(request.flight_offer)
-        
-        # Extract fare rules from the response
-        fare_rules = {
-            "change_rules": {},
-            "refund_rules": {},
-            "baggage": {},
-            "penalties": {}
-        }
-        
-        # Parse fare rules from Amadeus response structure
-        if "data" in priced_offer:
-            offer_data = priced_offer["data"]
-            # Extract rules from travelerPricings
-            for traveler_pricing in offer_data.get("travelerPricings", []):
-                for fare_detail in traveler_pricing.get("fareDetailsBySegment", []):
-                    # Extract fare rules if available
-                    pass
-        
-        return {"fare_rules": fare_rules, "priced_offer": priced_offer}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error getting fare rules: {str(e)}")
-
-
-@app.post("/api/seatmap")
-async def get_seatmap(request: SeatMapRequest):
-    """Get seat map for a flight offer"""
-    try:
-        seatmap = amadeus_client.get_seatmap_for_offer(request.flight_offer)
-        return seatmap
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error getting seatmap: {str(e)}")
-
-
-@app.post("/api/calendar-prices")
-async def get_calendar_prices(request: FlightSearchRequest):
-    """Get price calendar for a month"""
-    try:
-        # Calculate date range for calendar
-        base_date = datetime.strptime(request.departure_date, "%Y-%m-%d")
-        calendar_prices = []
-        
-        # Get prices for ±15 days
-        for day_offset in range(-15, 16):
-            check_date = base_date + timedelta(days=day_offset)
-            try:
-                offers = amadeus_client.search_flights(
-                    origin=request.origin,
-                    destination=request.destination,
-                    departure_date=check_date.strftime("%Y-%m-%d"),
-                    adults=request.adults,
-                    children=request.children,
-                    infants=request.infants,
-                    travel_class=request.travel_class,
-                    currency=request.currency
-                )
-                if offers and "data" in offers and offers["data"]:
-                    cheapest = min(offers["data"], key=lambda x: float(x.get("price", {}).get("total", float('inf'))))
-                    price = float(cheapest.get("price", {}).get("total", 0))
-                    calendar_prices.append({
-                        "date": check_date.strftime("%Y-%m-%d"),
-                        "price": price,
-                        "currency": cheapest.get("price", {}).get("currency", "GBP")
-                    })
-            except Exception as e:
-                print(f"Error getting price for {check_date}: {e}")
-                continue
-        
-        return {"calendar_prices": calendar_prices}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error getting calendar prices: {str(e)}")
-
-
-@app.post("/api/create-pnr")
-async def create_pnr(request: PNRCreateRequest, db: Session = Depends(get_db)):
-    """Create PNR in Amadeus system"""
-    try:
-        # This would integrate with Amadeus PNR creation API
-        # For now, we'll create a booking record and mark it as PNR-ready
-        booking = db.query(Booking).filter(
-            Booking.booking_reference == request.booking_reference
-        ).first()
-        
-        if not booking:
-            raise HTTPException(status_code=404, detail="Booking not found")
-        
-        # Store PNR data
-        pnr_data = {
-            "passengers": request.passengers,
-            "contacts": request.contacts,
-            "ssr": request.ssr,
-            "osi": request.osi,
-            "flight_offer": request.flight_offer
-        }
-        
-        booking.passenger_details = pnr_data
-        booking.booking_status = "pnr_created"
-        db.commit()
-        
-        return {
-            "status": "success",
-            "booking_reference": request.booking_reference,
-            "message": "PNR created successfully"
-        }
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error creating PNR: {str(e)}")
-
-
-@app.post("/api/change-booking")
-async def change_booking(request: ChangeBookingRequest, db: Session = Depends(get_db)):
-    """Change an existing booking"""
-    try:
-        booking = db.query(Booking).filter(
-            Booking.booking_reference == request.booking_reference
-        ).first()
-        
-        if not booking:
-            raise HTTPException(status_code=404, detail="Booking not found")
-        
-        # Price the new offer
-        priced_offer = amadeus_client.price_flight_offer(request.new_flight_offer)
-        
-        # Calculate price difference
-        new_price = float(priced_offer.get("data", {}).get("price", {}).get("total", 0))
-        price_difference = new_price - booking.total_price
-        
-        return {
-            "status": "success",
-            "price_difference": price_difference,
-            "new_price": new_price,
-            "old_price": booking.total_price,
-            "currency": booking.currency,
-            "priced_offer": priced_offer
-        }
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error changing booking: {str(e)}")
-
-
-@app.post("/api/cancel-booking")
-async def cancel_booking(request: CancelBookingRequest, db: Session = Depends(get_db)):
-    """Cancel an existing booking"""
-    try:
-        booking = db.query(Booking).filter(
-            Booking.booking_reference == request.booking_reference
-        ).first()
-        
-        if not booking:
-            raise HTTPException(status_code=404, detail="Booking not found")
-        
-        # Update booking status
-        booking.booking_status = "cancelled"
-        booking.payment_status = "refunded"
-        db.commit()
-        
-        return {
-            "status": "success",
-            "booking_reference": request.booking_reference,
-            "message": "Booking cancelled successfully"
-        }
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error cancelling booking: {str(e)}")
-
-
-if __name__ == "__main__":
-    import uvicorn
-    # Run on all interfaces (0.0.0.0) to allow network access
-    # This suppresses the "use --host to expose" warning
-    uvicorn.run(
-        app, 
-        host="0.0.0.0", 
-        port=8000,
-        log_level="info"
-    )
-
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Query, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, EmailStr
+from typing import Dict, Iterable, Optional, List, Tuple
+from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+import asyncio
+import os
+import time
+import uuid
+from urllib.parse import urlencode
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.orm import Session, load_only
+
+from amadeus_client import AmadeusClient
+from utils.categorizer import merge_offers, summarize_offers, summarize_response, summarize_responses
+from paypal_client import PayPalClient
+from database import get_db, get_engine, dispose_engine, customer_bookings_page, Booking, Payment, PriceWatch, BOOKING_SUMMARY_COLUMNS
+from email_service import EmailService
+from email_queue import EmailDispatcher, enqueue_access_link, enqueue_booking_confirmation
+from watchlist import PriceWatchScheduler, watch_search_key
+from utils.metro_areas import airport_pairs
+from utils.email_access import check_access_secret, issue_access_token, verify_access_token
+from utils.pagination import encode_cursor, decode_cursor
+from utils.price_history import PriceHistory
+from utils.cache import SharedCache, StaleWhileRevalidateCache
+from utils.cache_backends import close_backend
+from utils.http_cache import CachePolicy, HttpCacheMiddleware, make_etag
+from utils.api_logger import get_api_logger
+from utils.offload import CpuOffload, PROCESS
+from utils.metrics import render_metrics, mark_worker_exit, time_stage
+from utils.rate_limit import priority, BACKGROUND, BATCH
+from utils.tracing import ServerTimingMiddleware, setup_tracing, flush_tracing, traced
+
+load_dotenv()
+
+
+def get_allowed_origins() -> List[str]:
+    """CORS origins from ALLOWED_ORIGINS plus the local development servers"""
+    allowed_origins_str = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:5173,https://bookingbot.abovethewings.com")
+    allowed_origins = [origin.strip() for origin in allowed_origins_str.split(",")]
+
+    # Also allow localhost with different formats
+    allowed_origins.extend([
+        "http://127.0.0.1:3000",
+        "http://127.0.0.1:5173",
+        "http://localhost:3000",
+        "http://localhost:5173",
+    ])
+
+    # Remove duplicates
+    return sorted(set(allowed_origins))
+
+
+def _warm_database():
+    with get_engine().connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+async def _warm_up(app: FastAPI) -> dict:
+    """
+    Pre-warm the DB pool and the upstream clients in parallel.
+
+    Each step runs in a worker thread and failures are reported, not raised, so a
+    slow or unreachable dependency never stops the worker from serving.
+    """
+    steps = {
+        "database": _warm_database,
+        "amadeus": app.state.amadeus_client.warm_up,
+        "paypal": app.state.paypal_client.warm_up,
+        "offload": search_offload.warm_up,
+    }
+    timeout = float(os.getenv("WARMUP_TIMEOUT", "10"))
+
+    async def run(name, func):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.to_thread(func), timeout)
+            return name, f"ok {time.perf_counter() - started:.2f}s"
+        except asyncio.TimeoutError:
+            return name, f"timeout after {timeout:.0f}s"
+        except Exception as e:
+            return name, f"failed: {e}"
+
+    # Tasks copy the current context, so warm-up calls run at background priority
+    with priority(BACKGROUND):
+        results = await asyncio.gather(*(run(name, func) for name, func in steps.items()))
+    return dict(results)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create this worker's clients and pools, warm them up, and release them on shutdown"""
+    started = time.perf_counter()
+
+    setup_tracing()
+    get_engine()
+    check_access_secret()
+    app.state.amadeus_client = AmadeusClient()
+    app.state.paypal_client = PayPalClient()
+    app.state.email_service = EmailService()
+    app.state.email_dispatcher = EmailDispatcher(app.state.email_service)
+    app.state.price_watch_scheduler = PriceWatchScheduler(
+        app.state.amadeus_client, app.state.email_service, app.state.email_dispatcher, price_history=price_history
+    )
+    app.state.batch_search_slots = asyncio.Semaphore(BATCH_SEARCH_CONCURRENCY)
+
+    warmup = {}
+    if os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes"):
+        warmup = await _warm_up(app)
+
+    # Confirmation emails are sent from the outbox in the background
+    app.state.email_dispatcher.start()
+    # Price watches are re-checked in the background; alerts go through the outbox
+    app.state.price_watch_scheduler.start()
+
+    app.state.startup_seconds = time.perf_counter() - started
+    summary = ", ".join(f"{name} {status}" for name, status in warmup.items()) or "warm-up skipped"
+    print(f"🚀 Worker {os.getpid()} ready in {app.state.startup_seconds:.2f}s ({summary})")
+
+    yield
+
+    app.state.price_watch_scheduler.stop()
+    app.state.email_dispatcher.stop()
+    app.state.amadeus_client.close()
+    app.state.paypal_client.close()
+    close_backend()
+    search_offload.close()
+    dispose_engine()
+    api_logger = get_api_logger()
+    if api_logger is not None:
+        api_logger.close()
+    flush_tracing()
+    mark_worker_exit(os.getpid())
+
+
+def create_app() -> FastAPI:
+    """
+    Build the FastAPI application.
+
+    Nothing here touches the network: the DB engine and API clients are created
+    per worker in lifespan(), and schema creation is a separate one-time step
+    (python init_db.py).
+    """
+    app = FastAPI(title="Flight Booking Bot API", version="1.0.0", lifespan=lifespan)
+
+    # Innermost, so CORS headers are added to its 304s too
+    app.add_middleware(HttpCacheMiddleware, policies=HTTP_CACHE_POLICIES)
+
+    # CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=get_allowed_origins(),
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Cache", "Age", "ETag", "Server-Timing"],
+    )
+    # Outermost, so the root span and Server-Timing total cover the whole request
+    app.add_middleware(ServerTimingMiddleware)
+
+    app.include_router(router)
+    return app
+
+
+def get_amadeus_client(request: Request) -> AmadeusClient:
+    return request.app.state.amadeus_client
+
+
+def get_paypal_client(request: Request) -> PayPalClient:
+    return request.app.state.paypal_client
+
+
+def get_email_service(request: Request) -> EmailService:
+    return request.app.state.email_service
+
+
+def get_batch_search_slots(request: Request) -> asyncio.Semaphore:
+    return request.app.state.batch_search_slots
+
+
+def get_email_dispatcher(request: Request) -> EmailDispatcher:
+    return request.app.state.email_dispatcher
+
+
+router = APIRouter()
+
+# Read-through cache of Booking.to_dict() keyed by booking reference, shared by
+# all workers. Every endpoint that writes a booking invalidates its entry; the
+# TTL only bounds staleness after writes made outside the API. Versioned, so a
+# lookup that read the booking just before a write cannot cache the old copy.
+booking_cache = SharedCache("booking", ttl=float(os.getenv("BOOKING_CACHE_TTL", "60")), versioned=True)
+
+# Rendered search and calendar responses keyed by the request body, shared by all
+# workers. Within the soft TTL an entry is served as is; between soft and hard
+# TTL it is served immediately and refreshed once in the background.
+search_cache = StaleWhileRevalidateCache(
+    soft_ttl=float(os.getenv("SEARCH_CACHE_SOFT_TTL", "120")),
+    hard_ttl=float(os.getenv("SEARCH_CACHE_HARD_TTL", "900")),
+    name="search"
+)
+calendar_cache = StaleWhileRevalidateCache(
+    soft_ttl=float(os.getenv("CALENDAR_CACHE_SOFT_TTL", "600")),
+    hard_ttl=float(os.getenv("CALENDAR_CACHE_HARD_TTL", "3600")),
+    name="calendar"
+)
+# Decoding and categorizing search responses; with CPU_OFFLOAD_MODE=process,
+# large ones run in helper processes instead of holding this worker's GIL
+search_offload = CpuOffload("search")
+# Otherwise search responses are streamed: offers are parsed while the rest downloads
+SEARCH_STREAMING = os.getenv("SEARCH_STREAMING", "true").lower() in ("1", "true", "yes")
+
+# Cheapest fares seen by every search, per route and date. The calendar and the
+# future-deal lookup use observations younger than these ages instead of searching.
+price_history = PriceHistory()
+CALENDAR_HISTORY_MAX_AGE = float(os.getenv("CALENDAR_HISTORY_MAX_AGE", "600"))
+FUTURE_DEAL_HISTORY_MAX_AGE = float(os.getenv("FUTURE_DEAL_HISTORY_MAX_AGE", "900"))
+
+# /api/search-flights/batch: searches per call, and searches a worker runs at once for all batch calls
+BATCH_SEARCH_MAX_ITEMS = int(os.getenv("BATCH_SEARCH_MAX_ITEMS", "10"))
+BATCH_SEARCH_CONCURRENCY = int(os.getenv("BATCH_SEARCH_CONCURRENCY", "4"))
+
+# Cache-Control per route, applied with an ETag by HttpCacheMiddleware. Airports
+# hardly change; searches and calendars are short-lived but identical for everyone
+# asking the same question (nginx caches these POSTs keyed by the body, and only
+# ETag and Cache-Control apply to them: POSTs never get a 304); bookings
+# are personal, so only the browser may keep them, and it must revalidate.
+HTTP_CACHE_POLICIES = [
+    CachePolicy(["GET"], r"/api/airports",
+                f"public, max-age={os.getenv('AIRPORTS_HTTP_MAX_AGE', '86400')}"),
+    CachePolicy(["POST"], r"/api/search-flights",
+                f"public, max-age={os.getenv('SEARCH_HTTP_MAX_AGE', '60')}"),
+    CachePolicy(["POST"], r"/api/calendar-prices",
+                f"public, max-age={os.getenv('CALENDAR_HTTP_MAX_AGE', '300')}"),
+    CachePolicy(["GET"], r"/api/bookings?(/[^/]+)?", "private, no-cache"),
+]
+CACHE_STATUS_HEADER = {
+    StaleWhileRevalidateCache.FRESH: "HIT",
+    StaleWhileRevalidateCache.STALE: "STALE",
+    StaleWhileRevalidateCache.MISS: "MISS",
+}
+
+
+class FlightLeg(BaseModel):
+    origin: str
+    destination: str
+    departure_date: str
+
+
+class FlightSearchRequest(BaseModel):
+    origin: str
+    destination: str
+    departure_date: str
+    return_date: Optional[str] = None
+    adults: int = 1
+    children: int = 0
+    infants: int = 0
+    travel_class: str = "ECONOMY"
+    currency: str = "GBP"
+    flexibility: Optional[int] = None  # ±N days
+    trip_type: str = "one-way"  # one-way, round-trip, multi-city
+    legs: Optional[List[FlightLeg]] = None  # multi-city: every leg, in order (origin/destination/departure_date = first leg)
+    direct_only: Optional[bool] = False
+    max_stops: Optional[int] = None
+    preferred_airlines: Optional[List[str]] = None
+    excluded_airlines: Optional[List[str]] = None
+    earliest_departure: Optional[str] = None
+    latest_arrival: Optional[str] = None
+    nearby_airports: bool = False  # also search the other airports of origin's and destination's metro areas
+
+
+class BatchSearchRequest(BaseModel):
+    searches: List[FlightSearchRequest]
+    stream: bool = False  # NDJSON, one line per search as soon as it finishes
+
+
+class FlightOffer(BaseModel):
+    id: str
+    airline: str
+    airline_logo: Optional[str] = None
+    departure_airport: str
+    arrival_airport: str
+    departure_time: str
+    arrival_time: str
+    duration: str
+    stops: int
+    cabin_class: str
+    price: float
+    currency: str
+    category: str
+    segments: List[dict]
+
+
+class BookingRequest(BaseModel):
+    flight_id: str
+    customer_email: EmailStr
+    customer_name: str
+    customer_phone: Optional[str] = None
+    origin: str
+    destination: str
+    departure_date: str
+    departure_time: str
+    arrival_time: str
+    airline: str
+    cabin_class: str
+    duration: str
+    stops: int
+    total_price: float
+    currency: str = "GBP"
+    adults: int = 1
+    children: int = 0
+    infants: int = 0
+    passenger_details: Optional[dict] = None
+    flight_data: Optional[dict] = None
+    ssr_requests: Optional[List[dict]] = None  # Special service requests
+    seat_assignments: Optional[List[dict]] = None
+    ancillaries: Optional[List[dict]] = None  # Extra bags, lounge, etc.
+
+
+class PriceWatchRequest(BaseModel):
+    customer_email: EmailStr
+    origin: str
+    destination: str
+    departure_date: str
+    adults: int = 1
+    children: int = 0
+    infants: int = 0
+    travel_class: str = "ECONOMY"
+    currency: str = "GBP"
+    target_price: float  # Alert when the cheapest one-way fare is at or below this
+
+
+class EmailAccessRequest(BaseModel):
+    email: EmailStr
+
+
+class PaymentCaptureRequest(BaseModel):
+    order_id: str
+    booking_reference: str
+
+
+class OfferPriceRequest(BaseModel):
+    flight_offer: dict  # Full flight offer from Amadeus
+
+
+class FareRulesRequest(BaseModel):
+    flight_offer: dict
+
+
+class SeatMapRequest(BaseModel):
+    flight_offer: dict
+
+
+class PNRCreateRequest(BaseModel):
+    booking_reference: str
+    flight_offer: dict
+    passengers: List[dict]
+    contacts: Optional[dict] = None
+    ssr: Optional[List[dict]] = None
+    osi: Optional[List[dict]] = None
+
+
+class ChangeBookingRequest(BaseModel):
+    booking_reference: str
+    new_flight_offer: dict
+    change_type: str  # date_change, route_change, etc.
+
+
+class CancelBookingRequest(BaseModel):
+    booking_reference: str
+    reason: Optional[str] = None
+
+
+@router.get("/")
+def root():
+    return {"message": "Flight Booking Bot API", "status": "running"}
+
+
+@router.get("/health")
+def health_check(request: Request):
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "startup_seconds": round(getattr(request.app.state, "startup_seconds", 0), 3),
+        "open_circuits": {
+            name: client.http.circuit_states()
+            for name, client in (("amadeus", getattr(request.app.state, "amadeus_client", None)),
+                                 ("paypal", getattr(request.app.state, "paypal_client", None)))
+            if client is not None and client.http.circuit_states()
+        }
+    }
+
+
+@router.get("/metrics")
+def metrics():
+    """Prometheus metrics, aggregated across workers when PROMETHEUS_MULTIPROC_DIR is set"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+def _render_json(result: dict) -> Tuple[bytes, str]:
+    """Serialize a response body once, so cached entries are stored ready to send (with their ETag)"""
+    with time_stage("serialize"):
+        body = JSONResponse(content=result).body
+        return body, make_etag(body)
+
+
+def _in_background(loader):
+    """Wrap a cache loader so background refreshes yield rate-limit capacity to live requests"""
+    def run():
+        with priority(BACKGROUND):
+            return loader()
+    return run
+
+
+def _cached_response(rendered: Tuple[bytes, str], status: str, age: float) -> Response:
+    body, etag = rendered
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"X-Cache": CACHE_STATUS_HEADER[status], "Age": str(int(age)), "ETag": etag}
+    )
+
+
+@router.post("/api/search-flights", response_model=dict)
+async def search_flights(request: FlightSearchRequest, amadeus_client: AmadeusClient = Depends(get_amadeus_client)):
+    """
+    Search flights and return 4 curated options:
+    1. Cheapest
+    2. Fastest/Direct
+    3. Most Comfortable
+    4. Best Future Deal (30 days later)
+
+    Results are served stale-while-revalidate from search_cache (X-Cache: HIT, STALE or MISS).
+    """
+    loader = lambda: _render_json(_search_flights(request, amadeus_client))
+    rendered, status, age = await asyncio.to_thread(
+        search_cache.get_or_load, request.model_dump_json(), loader, _in_background(loader)
+    )
+    return _cached_response(rendered, status, age)
+
+
+@router.post("/api/search-flights/batch")
+async def search_flights_batch(
+    request: BatchSearchRequest,
+    amadeus_client: AmadeusClient = Depends(get_amadeus_client),
+    slots: asyncio.Semaphore = Depends(get_batch_search_slots)
+):
+    """
+    Run several searches in one call, e.g. routes or dates to compare.
+
+    Identical searches run once. The others run concurrently, at most
+    BATCH_SEARCH_CONCURRENCY at a time across all batch calls on this worker,
+    through search_cache like /api/search-flights (so they share its entries).
+    Each item is {"index", "status": 200, "cache", "result"} or
+    {"index", "status", "error"}, where index points into searches and result is
+    what /api/search-flights returns. The response is {"results": [...]} in
+    request order, or with stream=true NDJSON: one item per line as soon as its
+    search finishes.
+    """
+    if not 1 <= len(request.searches) <= BATCH_SEARCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch takes 1 to {BATCH_SEARCH_MAX_ITEMS} searches")
+
+    indexes: Dict[str, List[int]] = {}
+    for index, search in enumerate(request.searches):
+        indexes.setdefault(search.model_dump_json(), []).append(index)
+    tasks = [
+        asyncio.create_task(_batch_search(key, request.searches[positions[0]], amadeus_client, slots))
+        for key, positions in indexes.items()
+    ]
+
+    if not request.stream:
+        items = {}
+        for key, fragment in await asyncio.gather(*tasks):
+            for index in indexes[key]:
+                items[index] = _batch_item(index, fragment)
+        body = b'{"results":[' + b",".join(items[index] for index in range(len(request.searches))) + b"]}"
+        return Response(content=body, media_type="application/json")
+
+    async def lines():
+        try:
+            for finished in asyncio.as_completed(tasks):
+                key, fragment = await finished
+                for index in indexes[key]:
+                    yield _batch_item(index, fragment) + b"\n"
+        finally:
+            # The client went away: searches still waiting for a slot need not run
+            for task in tasks:
+                task.cancel()
+
+    # X-Accel-Buffering: nginx passes each line on instead of buffering the response
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+
+async def _batch_search(key: str, search: FlightSearchRequest, amadeus_client: AmadeusClient,
+                        slots: asyncio.Semaphore) -> Tuple[str, bytes]:
+    """
+    One distinct search of a batch: (key, its item's JSON members after "index").
+    A result is spliced in as rendered for search_cache, not serialized again.
+    """
+    loader = lambda: _render_json(_search_flights(search, amadeus_client))
+    try:
+        async with slots:
+            (body, _), status, _ = await asyncio.to_thread(
+                search_cache.get_or_load, key, loader, _in_background(loader)
+            )
+    except HTTPException as e:
+        return key, JSONResponse(content={"status": e.status_code, "error": e.detail}).body[1:-1]
+    except Exception as e:
+        print(f"❌ Batch search failed: {e}")
+        return key, JSONResponse(content={"status": 500, "error": str(e)}).body[1:-1]
+    return key, b'"status":200,"cache":"' + CACHE_STATUS_HEADER[status].encode() + b'","result":' + body
+
+
+def _batch_item(index: int, fragment: bytes) -> bytes:
+    return b'{"index":' + str(index).encode() + b"," + fragment + b"}"
+
+
+def _fare_route(request: FlightSearchRequest) -> str:
+    """Price-history route of the request's one-way, unfiltered searches (calendar days, future deal)"""
+    return PriceHistory.route_key(request.origin, request.destination, request.adults, request.children,
+                                  request.infants, request.travel_class, request.currency)
+
+
+def _summarize_search(amadeus_client: AmadeusClient, pairs: List[Tuple[str, str]], categorize: bool = True,
+                      **search_args) -> Dict:
+    """
+    Search each (origin, destination) pair and summarize_offers() the result.
+    Streamed, each offer is parsed as soon as its bytes arrive, so parsing
+    overlaps the download and the body is never held whole. In offload process
+    mode (or with SEARCH_STREAMING off) the body is read whole and summarized
+    by search_offload. Several pairs (a metro-area search) are searched in
+    parallel and their offers merged, without duplicates, before summarizing.
+    """
+    streaming = SEARCH_STREAMING and search_offload.mode != PROCESS
+    if len(pairs) > 1:
+        if streaming:
+            offer_lists = amadeus_client.search_airport_pairs(pairs, consume=list, **search_args)
+            return summarize_offers(merge_offers(offer_lists), categorize=categorize)
+        bodies = amadeus_client.search_airport_pairs(pairs, raw=True, **search_args)
+        return search_offload.run(summarize_responses, bodies, categorize)
+
+    origin, destination = pairs[0]
+    if streaming:
+        def consume(offers: Iterable[Dict]) -> Dict:
+            return summarize_offers(offers, categorize=categorize, parse_stage="stream_parse")
+        return amadeus_client.search_flights(origin, destination, consume=consume, **search_args)
+    body = amadeus_client.search_flights(origin, destination, raw=True, **search_args)
+    return search_offload.run(summarize_response, body, categorize)
+
+
+def _cheapest_offer(offers: Iterable[Dict]) -> Optional[Dict]:
+    return min(offers, key=lambda x: float(x.get("price", {}).get("total", float('inf'))), default=None)
+
+
+def _search_flights(request: FlightSearchRequest, amadeus_client: AmadeusClient) -> dict:
+    """Run a search against Amadeus and build the curated result"""
+    try:
+        # Validate date format
+        try:
+            departure_date = datetime.strptime(request.departure_date, "%Y-%m-%d")
+            leg_dates = [datetime.strptime(leg.departure_date, "%Y-%m-%d") for leg in request.legs or []]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+
+        # Multi-city: all legs go to Amadeus in one request
+        legs = None
+        if request.legs:
+            if not 2 <= len(request.legs) <= AmadeusClient.MAX_LEGS:
+                raise HTTPException(status_code=400, detail=f"Multi-city trips need 2 to {AmadeusClient.MAX_LEGS} legs")
+            legs = [leg.model_dump() for leg in request.legs]
+
+        search_params = {
+            "origin": request.origin,
+            "destination": request.destination,
+            "departure_date": request.departure_date,
+            "adults": request.adults,
+            "children": request.children
+        }
+        if legs:
+            search_params["legs"] = legs
+
+        # With nearby_airports, every airport pair of the cities involved, in parallel
+        pairs = [(request.origin, request.destination)] if legs else airport_pairs(
+            request.origin, request.destination, request.nearby_airports
+        )
+        if len(pairs) > 1:
+            search_params["airport_pairs"] = [f"{origin}-{destination}" for origin, destination in pairs]
+        # Its fares are not the requested airport's, so they stay out of price history
+        nearby = request.nearby_airports and len(pairs) > 1
+
+        # Get flight offers for requested date, decoded, parsed and categorized in one pass
+        try:
+            with traced("search.main"):
+                summary = _summarize_search(
+                    amadeus_client,
+                    pairs,
+                    departure_date=request.departure_date,
+                    return_date=request.return_date,
+                    adults=request.adults,
+                    children=request.children,
+                    infants=request.infants,
+                    travel_class=request.travel_class,
+                    currency=request.currency,
+                    direct_only=request.direct_only,
+                    max_stops=request.max_stops,
+                    preferred_airlines=request.preferred_airlines,
+                    excluded_airlines=request.excluded_airlines,
+                    earliest_departure=request.earliest_departure,
+                    latest_arrival=request.latest_arrival,
+                    legs=legs
+                )
+        except Exception as e:
+            print(f"❌ Amadeus API call failed: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Amadeus API error: {str(e)}")
+
+        if not summary["offers"]:
+            # Return empty result instead of error to allow frontend to handle gracefully
+            return {
+                "cheapest": None,
+                "fastest": None,
+                "most_comfortable": None,
+                "best_future_deal": None,
+                "search_params": search_params,
+                "message": "No flights found for the specified criteria"
+            }
+
+        categorized = summary["categorized"]
+
+        # If best future deal is requested, search for 30 days later
+        future_deal = None
+        if categorized.get("best_future_deal") is None:
+            future_date = (departure_date + timedelta(days=30)).strftime("%Y-%m-%d")
+            # Multi-city: the whole trip, every leg 30 days later
+            future_legs = [
+                {**leg, "departure_date": (leg_date + timedelta(days=30)).strftime("%Y-%m-%d")}
+                for leg, leg_date in zip(legs, leg_dates)
+            ] if legs else None
+            # One-way: a recent search for that date may already have found it
+            if not legs and not nearby:
+                future_deal = price_history.deal(_fare_route(request), future_date, FUTURE_DEAL_HISTORY_MAX_AGE)
+            if future_deal is None:
+                try:
+                    with traced("search.future"), priority(BATCH):
+                        future = _summarize_search(
+                            amadeus_client,
+                            pairs,
+                            categorize=False,
+                            departure_date=future_date,
+                            adults=request.adults,
+                            children=request.children,
+                            infants=request.infants,
+                            travel_class=request.travel_class,
+                            currency=request.currency,
+                            legs=future_legs
+                        )
+                    future_deal = future["future_deal"]
+                    if future_deal and not legs and not nearby and future["cheapest_total"] is not None:
+                        price_history.record(_fare_route(request), future_date, future["cheapest_total"],
+                                             deal=future_deal)
+                except Exception as e:
+                    print(f"Error fetching future deal: {e}")
+
+        # All parsed flights for scrolling/pagination, cheapest first
+        all_flights = summary["all_flights"]
+
+        # A one-way search without filters is what the calendar and future-deal
+        # lookups run, so its cheapest fare (and deal card) can answer them later
+        unfiltered = not (request.return_date or legs or nearby or request.direct_only or request.max_stops is not None
+                          or request.preferred_airlines or request.excluded_airlines
+                          or request.earliest_departure or request.latest_arrival)
+        if unfiltered and summary["cheapest_total"] is not None:
+            price_history.record(_fare_route(request), departure_date.date().isoformat(), summary["cheapest_total"],
+                                 deal=summary["future_deal"])
+        
+        # Build result, ensuring no None values cause issues
+        result = {
+            "cheapest": categorized.get("cheapest"),
+            "fastest": categorized.get("fastest"),
+            "most_comfortable": categorized.get("most_comfortable"),
+            "best_future_deal": future_deal if future_deal else categorized.get("best_future_deal"),
+            "all_flights": all_flights,  # Limited to 50 for performance, sorted by price
+            "search_params": search_params
+        }
+        
+        # Validate result has at least one flight category
+        if not result.get("cheapest") and not result.get("fastest") and not result.get("most_comfortable"):
+            print("⚠️  Warning: No flight categories found in result")
+            # Return result with message instead of error
+            result["message"] = "Failed to categorize flights - no valid categories returned"
+            return result
+        
+        print(f"✅ Returning result with {len([k for k in ['cheapest', 'fastest', 'most_comfortable'] if result.get(k)])} categories")
+        
+        # Clean result to ensure JSON serialization works
+        # Remove any None values that might cause issues
+        cleaned_result = {}
+        for key, value in result.items():
+            if value is not None:
+                cleaned_result[key] = value
+        
+        return cleaned_result
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        error_trace = traceback.format_exc()
+        print(f"❌ Unhandled exception in search_flights:")
+        print(f"   Error: {str(e)}")
+        print(f"   Type: {type(e).__name__}")
+        print(f"   Traceback:\n{error_trace}")
+        raise HTTPException(status_code=500, detail=f"Error searching flights: {str(e)}")
+
+
+@router.get("/api/airports")
+async def get_airports(query: str, amadeus_client: AmadeusClient = Depends(get_amadeus_client)):
+    """Search for airports by city or airport code"""
+    try:
+        airports = await asyncio.to_thread(amadeus_client.search_airports, query)
+        return {"airports": airports}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching airports: {str(e)}")
+
+
+@router.post("/api/create-booking")
+async def create_booking(
+    booking_request: BookingRequest,
+    db: Session = Depends(get_db),
+    paypal_client: PayPalClient = Depends(get_paypal_client)
+):
+    """Create a booking and initiate PayPal payment"""
+    try:
+        # Generate unique booking reference
+        booking_reference = f"ATW-{uuid.uuid4().hex[:8].upper()}"
+
+        # Create booking record
+        booking = Booking(
+            booking_reference=booking_reference,
+            customer_email=booking_request.customer_email,
+            customer_name=booking_request.customer_name,
+            customer_phone=booking_request.customer_phone,
+            flight_id=booking_request.flight_id,
+            origin=booking_request.origin,
+            destination=booking_request.destination,
+            departure_date=booking_request.departure_date,
+            departure_time=booking_request.departure_time,
+            arrival_time=booking_request.arrival_time,
+            airline=booking_request.airline,
+            cabin_class=booking_request.cabin_class,
+            duration=booking_request.duration,
+            stops=booking_request.stops,
+            adults=booking_request.adults,
+            children=booking_request.children,
+            infants=booking_request.infants,
+            passenger_details=booking_request.passenger_details,
+            total_price=booking_request.total_price,
+            currency=booking_request.currency,
+            flight_data=booking_request.flight_data,
+            payment_status="pending",
+            booking_status="pending"
+        )
+
+        db.add(booking)
+        db.commit()
+        db.refresh(booking)
+
+        # Create PayPal order
+        try:
+            paypal_order = await asyncio.to_thread(
+                paypal_client.create_order,
+                amount=booking_request.total_price,
+                currency=booking_request.currency,
+                description=f"Flight Booking {booking_reference}: {booking_request.origin} to {booking_request.destination}",
+                return_url=f"{os.getenv('FRONTEND_URL', 'https://bookingbot.abovethewings.com/bookingbot')}/payment-success?booking={booking_reference}",
+                cancel_url=f"{os.getenv('FRONTEND_URL', 'https://bookingbot.abovethewings.com/bookingbot')}/payment-cancelled?booking={booking_reference}"
+            )
+        except Exception as paypal_error:
+            print(f"❌ PayPal order creation failed: {str(paypal_error)}")
+            # Still save the booking but mark payment as failed
+            booking.payment_status = "failed"
+            booking.booking_status = "payment_failed"
+            db.commit()
+            booking_cache.invalidate(booking_reference)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to create PayPal payment: {str(paypal_error)}. Your booking has been saved but payment could not be processed. Please contact support."
+            )
+
+        # Store PayPal order ID
+        booking.paypal_order_id = paypal_order.get("id")
+        db.commit()
+
+        # Create payment record
+        payment = Payment(
+            booking_id=booking.id,
+            paypal_order_id=paypal_order.get("id"),
+            amount=booking_request.total_price,
+            currency=booking_request.currency,
+            status="pending",
+            paypal_response=paypal_order
+        )
+        db.add(payment)
+        db.commit()
+        booking_cache.invalidate(booking_reference)
+
+        # Return approval URL for redirect
+        approval_url = None
+        for link in paypal_order.get("links", []):
+            if link.get("rel") == "approve":
+                approval_url = link.get("href")
+                break
+
+        if not approval_url:
+            print(f"⚠️  Warning: No approval URL found in PayPal order response")
+            print(f"   PayPal order links: {paypal_order.get('links', [])}")
+            raise HTTPException(
+                status_code=500, 
+                detail="PayPal order created but no approval URL found. Please check PayPal order response."
+            )
+
+        print(f"✅ Booking created successfully")
+        print(f"   Booking Reference: {booking_reference}")
+        print(f"   PayPal Order ID: {paypal_order.get('id')}")
+        print(f"   Approval URL: {approval_url[:80]}...")
+
+        return {
+            "booking_reference": booking_reference,
+            "booking_id": booking.id,
+            "paypal_order_id": paypal_order.get("id"),
+            "approval_url": approval_url,
+            "status": "pending"
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating booking: {str(e)}")
+
+
+@router.post("/api/capture-payment")
+async def capture_payment(
+    payment_request: PaymentCaptureRequest,
+    db: Session = Depends(get_db),
+    paypal_client: PayPalClient = Depends(get_paypal_client),
+    email_service: EmailService = Depends(get_email_service),
+    email_dispatcher: EmailDispatcher = Depends(get_email_dispatcher)
+):
+    """Capture PayPal payment and confirm booking"""
+    try:
+        # Get booking - try by booking reference first, then by PayPal order ID
+        booking = db.query(Booking).filter(
+            Booking.booking_reference == payment_request.booking_reference
+        ).first()
+
+        if not booking:
+            # Try to find by PayPal order ID
+            booking = db.query(Booking).filter(
+                Booking.paypal_order_id == payment_request.order_id
+            ).first()
+
+        if not booking:
+            raise HTTPException(status_code=404, detail="Booking not found")
+        
+        # Use booking's PayPal order ID if available, otherwise use provided order_id
+        order_id_to_capture = booking.paypal_order_id or payment_request.order_id
+
+        # Capture PayPal payment
+        capture_result = await asyncio.to_thread(paypal_client.capture_order, order_id_to_capture)
+
+        # Check if payment was successful
+        payment_status = capture_result.get("status", "FAILED")
+        if payment_status == "COMPLETED":
+            # Extract payment ID
+            payment_id = None
+            if "purchase_units" in capture_result:
+                for unit in capture_result["purchase_units"]:
+                    if "payments" in unit and "captures" in unit["payments"]:
+                        captures = unit["payments"]["captures"]
+                        if captures:
+                            payment_id = captures[0].get("id")
+
+            # Update booking
+            booking.payment_status = "completed"
+            booking.booking_status = "confirmed"
+            booking.paypal_payment_id = payment_id
+            booking.payment_amount = booking.total_price
+
+            # Update payment record
+            payment = db.query(Payment).filter(
+                Payment.paypal_order_id == payment_request.order_id
+            ).first()
+            if payment:
+                payment.status = "completed"
+                payment.paypal_payment_id = payment_id
+                payment.paypal_response = capture_result
+
+            # Queue confirmation emails in the same transaction; the dispatcher
+            # sends them and sets booking.confirmation_sent once delivered
+            enqueue_booking_confirmation(db, email_service, booking)
+            db.commit()
+            booking_cache.invalidate(booking.booking_reference)
+            email_dispatcher.wake()
+
+            return {
+                "status": "success",
+                "booking_reference": booking.booking_reference,
+                "payment_status": "completed",
+                "email_sent": False,
+                "email_queued": True,
+                "message": "Payment captured and booking confirmed"
+            }
+        else:
+            # Payment failed
+            booking.payment_status = "failed"
+            db.commit()
+            booking_cache.invalidate(booking.booking_reference)
+
+            return {
+                "status": "failed",
+                "message": "Payment capture failed",
+                "details": capture_result
+            }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error capturing payment: {str(e)}")
+
+
+@router.get("/api/booking/{booking_reference}")
+async def get_booking(booking_reference: str, db: Session = Depends(get_db)):
+    """Get booking details by reference"""
+    def load_booking():
+        booking = db.query(Booking).options(load_only(*BOOKING_SUMMARY_COLUMNS)).filter(
+            Booking.booking_reference == booking_reference
+        ).first()
+        return booking.to_dict() if booking else None
+
+    # Cache backend round trips and, on a miss, the query block: keep them off the event loop
+    booking = await asyncio.to_thread(booking_cache.get_or_load, booking_reference, load_booking)
+
+    if not booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+
+    return booking
+
+
+def require_email_access(email: str, token: Optional[str]):
+    """Reject the call unless token is a valid access token for email (see /api/email-access)"""
+    if not verify_access_token(token, email):
+        raise HTTPException(status_code=403, detail="A valid access token for this email is required")
+
+
+@router.post("/api/email-access")
+async def request_email_access(
+    access_request: EmailAccessRequest,
+    db: Session = Depends(get_db),
+    email_service: EmailService = Depends(get_email_service),
+    email_dispatcher: EmailDispatcher = Depends(get_email_dispatcher)
+):
+    """
+    Email the address a signed link for its booking history and price watches.
+    The token is only ever sent to the inbox, so the response is the same
+    whether or not the address has any bookings.
+    """
+    email = access_request.email
+    token = issue_access_token(email)
+    frontend_url = os.getenv("FRONTEND_URL", "https://bookingbot.abovethewings.com/bookingbot")
+    link = f"{frontend_url}/my-bookings?{urlencode({'email': email, 'token': token})}"
+    if enqueue_access_link(db, email_service, email, link) is not None:
+        db.commit()
+        email_dispatcher.wake()
+    return {"status": "success", "message": "If the address can receive email, an access link is on its way"}
+
+
+@router.get("/api/bookings")
+async def get_customer_bookings(
+    email: EmailStr,
+    token: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get a customer's booking history, newest first. Pass next_cursor back to get
+    the next page. Booking references authorize changes, so token must be an
+    access token for email.
+    """
+    require_email_access(email, token)
+    try:
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    bookings, next_key = customer_bookings_page(db, email, limit=limit, before=before)
+
+    return {
+        "bookings": [booking.to_dict() for booking in bookings],
+        "next_cursor": encode_cursor(next_key)
+    }
+
+
+@router.post("/api/price-watches")
+async def create_price_watch(
+    watch_request: PriceWatchRequest,
+    token: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Watch a one-way search and email the customer when its cheapest fare reaches
+    target_price. A customer has one watch per search: watching it again updates
+    the target and re-arms the alert. token must be an access token for
+    customer_email, so nobody can sign up someone else's inbox for alerts.
+    """
+    require_email_access(watch_request.customer_email, token)
+    try:
+        departure = datetime.strptime(watch_request.departure_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="departure_date must be YYYY-MM-DD")
+    if departure < datetime.utcnow().date():
+        raise HTTPException(status_code=400, detail="departure_date is in the past")
+    if watch_request.target_price <= 0:
+        raise HTTPException(status_code=400, detail="target_price must be positive")
+
+    origin = watch_request.origin.strip().upper()
+    destination = watch_request.destination.strip().upper()
+    travel_class = watch_request.travel_class.upper()
+    currency = watch_request.currency.upper()
+    # Stored zero-padded, as the scheduler compares and records it as an ISO date
+    departure_date = departure.isoformat()
+    search_key = watch_search_key(origin, destination, departure_date, watch_request.adults,
+                                  watch_request.children, watch_request.infants, travel_class, currency)
+
+    watch = db.query(PriceWatch).filter(
+        PriceWatch.customer_email == watch_request.customer_email,
+        PriceWatch.search_key == search_key,
+        PriceWatch.active.is_(True)
+    ).first()
+    if watch is None:
+        watch = PriceWatch(
+            customer_email=watch_request.customer_email,
+            origin=origin,
+            destination=destination,
+            departure_date=departure_date,
+            adults=watch_request.adults,
+            children=watch_request.children,
+            infants=watch_request.infants,
+            travel_class=travel_class,
+            currency=currency,
+            search_key=search_key,
+            active=True
+        )
+        db.add(watch)
+    watch.target_price = watch_request.target_price
+    watch.notified_price = None
+    watch.notified_at = None
+    db.commit()
+    db.refresh(watch)
+    return watch.to_dict()
+
+
+@router.get("/api/price-watches")
+async def get_price_watches(email: EmailStr, token: Optional[str] = None, db: Session = Depends(get_db)):
+    """Get a customer's active price watches, newest first. token must be an access token for email."""
+    require_email_access(email, token)
+    watches = db.query(PriceWatch).filter(
+        PriceWatch.customer_email == email,
+        PriceWatch.active.is_(True)
+    ).order_by(PriceWatch.created_at.desc(), PriceWatch.id.desc()).all()
+    return {"price_watches": [watch.to_dict() for watch in watches]}
+
+
+@router.delete("/api/price-watches/{watch_id}")
+async def delete_price_watch(
+    watch_id: int,
+    email: EmailStr,
+    token: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Stop a price watch. The email must match the watch's customer and token must be an access token for it."""
+    require_email_access(email, token)
+    watch = db.query(PriceWatch).filter(
+        PriceWatch.id == watch_id,
+        PriceWatch.customer_email == email,
+        PriceWatch.active.is_(True)
+    ).first()
+    if not watch:
+        raise HTTPException(status_code=404, detail="Price watch not found")
+    watch.active = False
+    db.commit()
+    return {"status": "success", "message": "Price watch stopped"}
+
+
+@router.post("/api/price-offer")
+async def price_offer(request: OfferPriceRequest, amadeus_client: AmadeusClient = Depends(get_amadeus_client)):
+    """Price a flight offer to get final pricing and fare rules"""
+    try:
+        priced_offer = await asyncio.to_thread(amadeus_client.price_flight_offer, request.flight_offer)
+        return {"priced_offer": priced_offer}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error pricing offer: {str(e)}")
+
+
+@router.post("/api/fare-rules")
+async def get_fare_rules(request: FareRulesRequest, amadeus_client: AmadeusClient = Depends(get_amadeus_client)):
+    """Get fare rules for a flight offer"""
+    try:
+        # Amadeus Quick Connect may have a specific fare rules endpoint
+        # For now, we'll extract from the priced offer
+        priced_offer = await asyncio.to_thread(amadeus_client.price_flight_offer, request.flight_offer)
+        
+        # Extract fare rules from the response
+        fare_rules = {
+            "change_rules": {},
+            "refund_rules": {},
+            "baggage": {},
+            "penalties": {}
+        }
+        
+        # Parse fare rules from Amadeus response structure
+        if "data" in priced_offer:
+            offer_data = priced_offer["data"]
+            # Extract rules from travelerPricings
+            for traveler_pricing in offer_data.get("travelerPricings", []):
+                for fare_detail in traveler_pricing.get("fareDetailsBySegment", []):
+                    # Extract fare rules if available
+                    pass
+        
+        return {"fare_rules": fare_rules, "priced_offer": priced_offer}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting fare rules: {str(e)}")
+
+
+@router.post("/api/seatmap")
+async def get_seatmap(request: SeatMapRequest, amadeus_client: AmadeusClient = Depends(get_amadeus_client)):
+    """Get seat map for a flight offer"""
+    try:
+        seatmap = await asyncio.to_thread(amadeus_client.get_seatmap_for_offer, request.flight_offer)
+        return seatmap
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting seatmap: {str(e)}")
+
+
+@router.post("/api/calendar-prices")
+async def get_calendar_prices(request: FlightSearchRequest, amadeus_client: AmadeusClient = Depends(get_amadeus_client)):
+    """Get price calendar for a month, served stale-while-revalidate from calendar_cache"""
+    loader = lambda: _render_json(_calendar_prices(request, amadeus_client))
+    rendered, status, age = await asyncio.to_thread(
+        calendar_cache.get_or_load, request.model_dump_json(), loader, _in_background(loader)
+    )
+    return _cached_response(rendered, status, age)
+
+
+def _calendar_prices(request: FlightSearchRequest, amadeus_client: AmadeusClient) -> dict:
+    """
+    Cheapest fare for each day within ±15 days of the requested departure. Days
+    with a price-history observation younger than CALENDAR_HISTORY_MAX_AGE are
+    answered from it; only the others are searched (and recorded).
+    """
+    try:
+        # Calculate date range for calendar
+        base_date = datetime.strptime(request.departure_date, "%Y-%m-%d")
+        route = _fare_route(request)
+        known = price_history.latest(
+            route,
+            (base_date - timedelta(days=15)).strftime("%Y-%m-%d"),
+            (base_date + timedelta(days=15)).strftime("%Y-%m-%d"),
+            CALENDAR_HISTORY_MAX_AGE
+        )
+        calendar_prices = []
+        failed_days = 0
+        
+        # Get prices for ±15 days, behind interactive searches for rate-limit capacity
+        for day_offset in range(-15, 16):
+            check_date = base_date + timedelta(days=day_offset)
+            day = check_date.strftime("%Y-%m-%d")
+            if day in known:
+                calendar_prices.append({"date": day, "price": known[day], "currency": request.currency.upper()})
+                continue
+            try:
+                day_search = {
+                    "origin": request.origin,
+                    "destination": request.destination,
+                    "departure_date": day,
+                    "adults": request.adults,
+                    "children": request.children,
+                    "infants": request.infants,
+                    "travel_class": request.travel_class,
+                    "currency": request.currency
+                }
+                with priority(BATCH):
+                    if SEARCH_STREAMING:
+                        cheapest = amadeus_client.search_flights(consume=_cheapest_offer, **day_search)
+                    else:
+                        cheapest = _cheapest_offer(amadeus_client.search_flights(**day_search).get("data") or [])
+                if cheapest is not None:
+                    price = float(cheapest.get("price", {}).get("total", 0))
+                    price_history.record(route, day, price)
+                    calendar_prices.append({
+                        "date": day,
+                        "price": price,
+                        "currency": cheapest.get("price", {}).get("currency", "GBP")
+                    })
+            except Exception as e:
+                print(f"Error getting price for {check_date}: {e}")
+                failed_days += 1
+                continue
+        
+        # Every day failed: an upstream outage, not an empty calendar. Raise so
+        # the cache keeps serving the previous calendar instead of this one.
+        if failed_days and not calendar_prices:
+            raise RuntimeError(f"all {failed_days} date searches failed")
+        return {"calendar_prices": calendar_prices}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting calendar prices: {str(e)}")
+
+
+@router.post("/api/create-pnr")
+async def create_pnr(request: PNRCreateRequest, db: Session = Depends(get_db)):
+    """Create PNR in Amadeus system"""
+    try:
+        # This would integrate with Amadeus PNR creation API
+        # For now, we'll create a booking record and mark it as PNR-ready
+        booking = db.query(Booking).filter(
+            Booking.booking_reference == request.booking_reference
+        ).first()
+        
+        if not booking:
+            raise HTTPException(status_code=404, detail="Booking not found")
+        
+        # Store PNR data
+        pnr_data = {
+            "passengers": request.passengers,
+            "contacts": request.contacts,
+            "ssr": request.ssr,
+            "osi": request.osi,
+            "flight_offer": request.flight_offer
+        }
+        
+        booking.passenger_details = pnr_data
+        booking.booking_status = "pnr_created"
+        db.commit()
+        booking_cache.invalidate(booking.booking_reference)
+        
+        return {
+            "status": "success",
+            "booking_reference": request.booking_reference,
+            "message": "PNR created successfully"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating PNR: {str(e)}")
+
+
+@router.post("/api/change-booking")
+async def change_booking(
+    request: ChangeBookingRequest,
+    db: Session = Depends(get_db),
+    amadeus_client: AmadeusClient = Depends(get_amadeus_client)
+):
+    """Change an existing booking"""
+    try:
+        booking = db.query(Booking).filter(
+            Booking.booking_reference == request.booking_reference
+        ).first()
+        
+        if not booking:
+            raise HTTPException(status_code=404, detail="Booking not found")
+        
+        # Price the new offer
+        priced_offer = await asyncio.to_thread(amadeus_client.price_flight_offer, request.new_flight_offer)
+        
+        # Calculate price difference
+        new_price = float(priced_offer.get("data", {}).get("price", {}).get("total", 0))
+        price_difference = new_price - booking.total_price
+        
+        return {
+            "status": "success",
+            "price_difference": price_difference,
+            "new_price": new_price,
+            "old_price": booking.total_price,
+            "currency": booking.currency,
+            "priced_offer": priced_offer
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error changing booking: {str(e)}")
+
+
+@router.post("/api/cancel-booking")
+async def cancel_booking(request: CancelBookingRequest, db: Session = Depends(get_db)):
+    """Cancel an existing booking"""
+    try:
+        booking = db.query(Booking).filter(
+            Booking.booking_reference == request.booking_reference
+        ).first()
+        
+        if not booking:
+            raise HTTPException(status_code=404, detail="Booking not found")
+        
+        # Update booking status
+        booking.booking_status = "cancelled"
+        booking.payment_status = "refunded"
+        db.commit()
+        booking_cache.invalidate(booking.booking_reference)
+        
+        return {
+            "status": "success",
+            "booking_reference": request.booking_reference,
+            "message": "Booking cancelled successfully"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error cancelling booking: {str(e)}")
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    # Run on all interfaces (0.0.0.0) to allow network access
+    # This suppresses the "use --host to expose" warning
+    uvicorn.run(
+        app, 
+        host="0.0.0.0", 
+        port=8000,
+        log_level="info"
+    )
+
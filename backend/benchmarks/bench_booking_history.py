@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the customer booking history query (GET /api/bookings).
+
+Seeds the bookings table in steps up to a few million rows and times the
+keyset-paginated history query at each size: the first page, and a page
+several pages deep. With the (customer_email, created_at, id) index both
+should stay flat as the table grows. The paypal_order_id lookup used by
+capture_payment is timed as well.
+
+Runs against a local SQLite file by default. Pass --database-url to point it
+at a scratch MySQL database instead (never the production one: it inserts rows).
+
+Usage (from backend/):
+    python -m benchmarks.bench_booking_history
+    python -m benchmarks.bench_booking_history --sizes 100000,1000000,3000000
+    python -m benchmarks.bench_booking_history --no-indexes   # baseline without the new indexes
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, Booking, customer_bookings_page
+
+CUSTOMERS = 50000
+INSERT_CHUNK = 50000
+
+
+def seed(engine, start: int, stop: int):
+    """Insert bookings with ids in [start, stop) spread over CUSTOMERS customers"""
+    base_time = datetime(2024, 1, 1)
+    rng = random.Random(start)
+    with engine.begin() as conn:
+        for chunk_start in range(start, stop, INSERT_CHUNK):
+            rows = []
+            for i in range(chunk_start, min(chunk_start + INSERT_CHUNK, stop)):
+                rows.append({
+                    "booking_reference": f"ATW-{i:010d}",
+                    "customer_email": f"customer{rng.randrange(CUSTOMERS)}@example.com",
+                    "customer_name": "Bench Customer",
+                    "origin": "LHR",
+                    "destination": "JFK",
+                    "departure_date": "2025-06-01",
+                    "airline": "BA",
+                    "total_price": 400 + (i % 500),
+                    "currency": "GBP",
+                    "payment_status": "completed",
+                    "booking_status": "confirmed",
+                    "paypal_order_id": f"PAYPAL{i:012d}",
+                    "created_at": base_time + timedelta(seconds=i * 7),
+                    "updated_at": base_time + timedelta(seconds=i * 7),
+                })
+            conn.execute(insert(Booking.__table__), rows)
+
+
+def time_call(fn, repeat: int) -> float:
+    """Median wall time of fn() in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def measure(Session, total_rows: int, repeat: int):
+    rng = random.Random(total_rows)
+    emails = [f"customer{rng.randrange(CUSTOMERS)}@example.com" for _ in range(repeat)]
+    order_ids = [f"PAYPAL{rng.randrange(total_rows):012d}" for _ in range(repeat)]
+    db = Session()
+    try:
+        email_iter = iter(emails)
+
+        def first_page():
+            customer_bookings_page(db, next(email_iter), limit=20)
+
+        # Cursor positions five pages deep, resolved up front so only the
+        # sixth page query itself is timed
+        deep_keys = []
+        for email in emails[:repeat // 2]:
+            key = None
+            for _ in range(5):
+                rows, next_key = customer_bookings_page(db, email, limit=5, before=key)
+                if next_key is None:
+                    break
+                key = next_key
+            deep_keys.append((email, key))
+        deep_iter = iter(deep_keys)
+
+        def deep_page():
+            email, key = next(deep_iter)
+            customer_bookings_page(db, email, limit=5, before=key)
+
+        order_iter = iter(order_ids)
+
+        def by_order_id():
+            db.query(Booking.id).filter(Booking.paypal_order_id == next(order_iter)).first()
+
+        return (
+            time_call(first_page, repeat),
+            time_call(deep_page, repeat // 2),
+            time_call(by_order_id, repeat),
+        )
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="SQLAlchemy URL of a scratch database (default: temporary SQLite file)")
+    parser.add_argument("--sizes", default="250000,500000,1000000,2000000,3000000",
+                        help="Comma-separated table sizes to measure at")
+    parser.add_argument("--repeat", type=int, default=200, help="Queries per measurement")
+    parser.add_argument("--no-indexes", action="store_true",
+                        help="Drop the history and paypal_order_id indexes to measure the old behaviour")
+    args = parser.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    db_path = None
+    url = args.database_url
+    if not url:
+        fd, db_path = tempfile.mkstemp(suffix=".sqlite", prefix="bench_bookings_")
+        os.close(fd)
+        url = f"sqlite:///{db_path}"
+
+    engine = create_engine(url)
+    if engine.dialect.name == "sqlite":
+        # Give SQLite a page cache comparable to a MySQL buffer pool so the
+        # numbers reflect index behaviour rather than disk reads
+        @event.listens_for(engine, "connect")
+        def _set_cache_size(dbapi_connection, connection_record):
+            dbapi_connection.execute("PRAGMA cache_size = -262144")
+    Base.metadata.drop_all(engine, tables=[Booking.__table__])
+    Base.metadata.create_all(engine, tables=[Booking.__table__])
+    if args.no_indexes:
+        for index in list(Booking.__table__.indexes):
+            if index.name in ("ix_bookings_customer_email_created_at_id", "ix_bookings_paypal_order_id"):
+                index.drop(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    print(f"Database: {engine.url.render_as_string(hide_password=True)}")
+    print(f"Indexes:  {'dropped (baseline)' if args.no_indexes else 'enabled'}")
+    print()
+    print(f"{'rows':>10} | {'seed s':>7} | {'first page ms':>13} | {'6th page ms':>11} | {'by order id ms':>14}")
+    print("-" * 68)
+
+    seeded = 0
+    try:
+        for size in sizes:
+            start = time.perf_counter()
+            seed(engine, seeded, size)
+            seeded = size
+            seed_time = time.perf_counter() - start
+            first, deep, order = measure(Session, size, args.repeat)
+            print(f"{size:>10,} | {seed_time:>7.1f} | {first:>13.3f} | {deep:>11.3f} | {order:>14.3f}")
+            sys.stdout.flush()
+    finally:
+        engine.dispose()
+        if db_path:
+            os.remove(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Before/after benchmark for DateParser.
+
+"before" is the original parse_date, copied below unchanged: strptime, then up
+to eight re.search calls in turn, reading the clock for every yearless date.
+"after" is utils/date_parser.py: one compiled whole-string match that
+dispatches on the format, a bounded LRU cache on the normalized input, and
+parse_many() for batches.
+
+The corpus is bench_hot_paths.date_corpus() plus chat transcript messages
+(dates inside free text, and messages with no date at all). Every string is
+parsed by both implementations before anything is timed; the run exits with
+status 1 if any result differs.
+
+Usage (from backend/):
+    python -m benchmarks.bench_date_parser
+    python -m benchmarks.bench_date_parser --size 5000 --rounds 7
+"""
+import argparse
+import random
+import re
+import sys
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from benchmarks.bench_hot_paths import MONTHS, date_corpus, format_time, time_case
+from utils.date_parser import DateParser, MONTH_NAMES
+
+TRANSCRIPT_TEMPLATES = [
+    "Hi, I'd like to fly from London to New York",
+    "leaving on {day} {month} please",
+    "we want to go out {month} {day}, {year} and come back a week later",
+    "departure {dd}/{mm}/{year}, returning {dd2}/{mm2}",
+    "Can you check {dd}.{mm}.{year}?",
+    "2 adults and 1 child",
+    "what about the {day}th of {month}",
+    "any date around {iso} works",
+    "cheapest option is fine, budget about 600 pounds",
+    "{day} {mon}",
+    "ok thanks!",
+]
+
+
+def transcript_corpus(size: int = 1000, seed: int = 7) -> List[str]:
+    """Messages as they arrive in the chat: some carry a date, many do not"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        d = date(2025, 1, 1) + timedelta(days=rng.randrange(0, 730))
+        back = d + timedelta(days=rng.randrange(3, 21))
+        month = MONTHS[d.month - 1]
+        corpus.append(rng.choice(TRANSCRIPT_TEMPLATES).format(
+            day=d.day, month=rng.choice([month, month.lower()]), mon=month[:3], year=d.year,
+            dd=f"{d.day:02d}", mm=f"{d.month:02d}", dd2=f"{back.day:02d}", mm2=f"{back.month:02d}",
+            iso=d.isoformat()
+        ))
+    return corpus
+
+
+def check_identical(corpus: List[str]) -> List[tuple]:
+    """(input, before, after) for every string the two implementations disagree on"""
+    DateParser.clear_cache()
+    after = DateParser.parse_many(corpus)
+    return [(s, legacy_parse_date(s), a) for s, a in zip(corpus, after) if legacy_parse_date(s) != a]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1000, help="Strings from each corpus")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed rounds per case")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Target seconds per round")
+    args = parser.parse_args()
+
+    corpus = date_corpus(args.size) + transcript_corpus(args.size)
+    mismatches = check_identical(corpus)
+    if mismatches:
+        print(f"{len(mismatches)} of {len(corpus)} strings parse differently:")
+        for text, before, after in mismatches[:20]:
+            print(f"  {text!r}: before {before!r}, after {after!r}")
+        sys.exit(1)
+    print(f"Identical results on all {len(corpus)} strings ({len(set(corpus))} distinct)\n")
+
+    def uncached(func):
+        def run():
+            DateParser.clear_cache()
+            return func()
+        return run
+
+    cases = [
+        ("before: parse_date", lambda: [legacy_parse_date(s) for s in corpus]),
+        ("after: parse_date, cold cache", uncached(lambda: [DateParser.parse_date(s) for s in corpus])),
+        ("after: parse_many, cold cache", uncached(lambda: DateParser.parse_many(corpus))),
+        ("after: parse_date, warm cache", lambda: [DateParser.parse_date(s) for s in corpus]),
+        ("after: parse_many, warm cache", lambda: DateParser.parse_many(corpus)),
+    ]
+    print(f"{'case':<32} | {'per string':>11} | {'speedup':>7}")
+    print("-" * 58)
+    before = None
+    for name, func in cases:
+        seconds = time_case(func, len(corpus), args.rounds, args.min_time)
+        before = before or seconds
+        print(f"{name:<32} | {format_time(seconds):>11} | {before / seconds:>6.1f}x")
+
+
+def legacy_parse_date(date_string: str) -> Optional[str]:
+    """DateParser.parse_date before the rewrite, unchanged apart from MONTH_NAMES being module level"""
+    if not date_string:
+        return None
+    
+    date_string = date_string.strip()
+    
+    # Try ISO format first (YYYY-MM-DD)
+    try:
+        datetime.strptime(date_string, "%Y-%m-%d")
+        return date_string
+    except ValueError:
+        pass
+    
+    # Try DD/MM/YYYY or MM/DD/YYYY
+    slash_pattern = r'(\d{1,2})[/-](\d{1,2})[/-](\d{4})'
+    match = re.search(slash_pattern, date_string)
+    if match:
+        part1, part2, year = match.groups()
+        # Try DD/MM/YYYY first (European format)
+        try:
+            day, month = int(part1), int(part2)
+            if 1 <= day <= 31 and 1 <= month <= 12:
+                date_obj = datetime(int(year), month, day)
+                return date_obj.strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+        
+        # Try MM/DD/YYYY (American format)
+        try:
+            month, day = int(part1), int(part2)
+            if 1 <= month <= 12 and 1 <= day <= 31:
+                date_obj = datetime(int(year), month, day)
+                return date_obj.strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    
+    # Try DD.MM.YYYY or MM.DD.YYYY
+    dot_pattern = r'(\d{1,2})\.(\d{1,2})\.(\d{4})'
+    match = re.search(dot_pattern, date_string)
+    if match:
+        part1, part2, year = match.groups()
+        # Try DD.MM.YYYY first
+        try:
+            day, month = int(part1), int(part2)
+            if 1 <= day <= 31 and 1 <= month <= 12:
+                date_obj = datetime(int(year), month, day)
+                return date_obj.strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+        
+        # Try MM.DD.YYYY
+        try:
+            month, day = int(part1), int(part2)
+            if 1 <= month <= 12 and 1 <= day <= 31:
+                date_obj = datetime(int(year), month, day)
+                return date_obj.strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    
+    # Try "15th June 2024" or "15 June 2024"
+    ordinal_pattern = r'(\d{1,2})(?:st|nd|rd|th)?\s+([a-z]+)\s+(\d{4})'
+    match = re.search(ordinal_pattern, date_string, re.IGNORECASE)
+    if match:
+        day_str, month_str, year_str = match.groups()
+        month_name = month_str.lower()
+        if month_name in MONTH_NAMES:
+            try:
+                day = int(day_str)
+                month = MONTH_NAMES[month_name]
+                year = int(year_str)
+                date_obj = datetime(year, month, day)
+                return date_obj.strftime("%Y-%m-%d")
+            except ValueError:
+                pass
+    
+    # Try "June 15, 2024" or "Jun 15, 2024"
+    month_first_pattern = r'([a-z]+)\s+(\d{1,2}),?\s+(\d{4})'
+    match = re.search(month_first_pattern, date_string, re.IGNORECASE)
+    if match:
+        month_str, day_str, year_str = match.groups()
+        month_name = month_str.lower()
+        if month_name in MONTH_NAMES:
+            try:
+                month = MONTH_NAMES[month_name]
+                day = int(day_str)
+                year = int(year_str)
+                date_obj = datetime(year, month, day)
+                return date_obj.strftime("%Y-%m-%d")
+            except ValueError:
+                pass
+    
+    # Try "15th June" or "15 June" (no year, assume current or next year)
+    ordinal_no_year_pattern = r'(\d{1,2})(?:st|nd|rd|th)?\s+([a-z]+)'
+    match = re.search(ordinal_no_year_pattern, date_string, re.IGNORECASE)
+    if match:
+        day_str, month_str = match.groups()
+        month_name = month_str.lower()
+        if month_name in MONTH_NAMES:
+            try:
+                day = int(day_str)
+                month = MONTH_NAMES[month_name]
+                now = datetime.now()
+                year = now.year
+                # If the date has already passed this year, use next year
+                try:
+                    date_obj = datetime(year, month, day)
+                    if date_obj < now:
+                        year = year + 1
+                    date_obj = datetime(year, month, day)
+                    return date_obj.strftime("%Y-%m-%d")
+                except ValueError:
+                    pass
+            except ValueError:
+                pass
+    
+    # Try "June 15" (no year, assume current or next year)
+    month_first_no_year_pattern = r'([a-z]+)\s+(\d{1,2})'
+    match = re.search(month_first_no_year_pattern, date_string, re.IGNORECASE)
+    if match:
+        month_str, day_str = match.groups()
+        month_name = month_str.lower()
+        if month_name in MONTH_NAMES:
+            try:
+                month = MONTH_NAMES[month_name]
+                day = int(day_str)
+                now = datetime.now()
+                year = now.year
+                # If the date has already passed this year, use next year
+                try:
+                    date_obj = datetime(year, month, day)
+                    if date_obj < now:
+                        year = year + 1
+                    date_obj = datetime(year, month, day)
+                    return date_obj.strftime("%Y-%m-%d")
+                except ValueError:
+                    pass
+            except ValueError:
+                pass
+    
+    # Try DD/MM or MM/DD (no year, assume current or next year)
+    short_pattern = r'(\d{1,2})[/-](\d{1,2})'
+    match = re.search(short_pattern, date_string)
+    if match:
+        part1, part2 = match.groups()
+        now = datetime.now()
+        year = now.year
+        
+        # Try DD/MM first (European format)
+        try:
+            day, month = int(part1), int(part2)
+            if 1 <= day <= 31 and 1 <= month <= 12:
+                try:
+                    date_obj = datetime(year, month, day)
+                    if date_obj < now:
+                        year = year + 1
+                    date_obj = datetime(year, month, day)
+                    return date_obj.strftime("%Y-%m-%d")
+                except ValueError:
+                    pass
+        except ValueError:
+            pass
+        
+        # Try MM/DD (American format)
+        try:
+            month, day = int(part1), int(part2)
+            if 1 <= month <= 12 and 1 <= day <= 31:
+                try:
+                    date_obj = datetime(year, month, day)
+                    if date_obj < now:
+                        year = year + 1
+                    date_obj = datetime(year, month, day)
+                    return date_obj.strftime("%Y-%m-%d")
+                except ValueError:
+                    pass
+        except ValueError:
+            pass
+    
+    return None
+
+
+if __name__ == "__main__":
+    main()
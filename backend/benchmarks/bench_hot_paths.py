@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the CPU hot paths of a search.
+
+Cases cover FlightCategorizer.categorize_flights, _parse_flight_offer and
+get_best_future_deal on synthetic offers (benchmarks/offer_generator.py) from
+10 to 10,000 per search, and DateParser.parse_date / parse_many on a fixed
+corpus of every supported format plus unparseable input (the "cold" case
+clears the parser's cache before each pass).
+
+Each case is calibrated to run for about --min-time seconds per round; the
+median time per call over --rounds rounds is reported and compared with the
+saved baseline. --check exits with status 1 if any case is slower than its
+baseline by more than --threshold (default 25%). Baselines are machine
+specific: save your own before comparing (--save-baseline).
+
+Usage (from backend/):
+    python -m benchmarks.bench_hot_paths
+    python -m benchmarks.bench_hot_paths --save-baseline
+    python -m benchmarks.bench_hot_paths --check --threshold 0.2
+    python -m benchmarks.bench_hot_paths --filter categorize
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.offer_generator import generate_offers
+from utils.categorizer import FlightCategorizer
+from utils.date_parser import DateParser
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "hot_paths.json")
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August",
+          "September", "October", "November", "December"]
+
+
+def date_corpus(size: int = 1000, seed: int = 3) -> List[str]:
+    """
+    Date strings as users type them, in every format DateParser supports, plus
+    a share of strings it cannot parse (which walk every pattern).
+    """
+    rng = random.Random(seed)
+    ordinal = {1: "st", 2: "nd", 3: "rd", 21: "st", 22: "nd", 23: "rd", 31: "st"}
+    formats = [
+        lambda d: d.strftime("%Y-%m-%d"),
+        lambda d: d.strftime("%d/%m/%Y"),
+        lambda d: d.strftime("%m/%d/%Y"),
+        lambda d: d.strftime("%d-%m-%Y"),
+        lambda d: d.strftime("%d.%m.%Y"),
+        lambda d: f"{d.day}{ordinal.get(d.day, 'th')} {MONTHS[d.month - 1]} {d.year}",
+        lambda d: f"{d.day} {MONTHS[d.month - 1][:3]} {d.year}",
+        lambda d: f"{MONTHS[d.month - 1]} {d.day}, {d.year}",
+        lambda d: f"{MONTHS[d.month - 1][:3]} {d.day} {d.year}",
+        lambda d: f"{d.day}{ordinal.get(d.day, 'th')} {MONTHS[d.month - 1]}",
+        lambda d: f"{MONTHS[d.month - 1]} {d.day}",
+        lambda d: d.strftime("%d/%m"),
+        lambda d: f"flying out on {d.day} {MONTHS[d.month - 1].lower()} please",
+    ]
+    invalid = ["next friday", "asap", "", "sometime in summer", "32/13/2025", "tomorrow morning", "the 5th"]
+    corpus = []
+    start = date(2025, 1, 1)
+    for _ in range(size):
+        if rng.random() < 0.1:
+            corpus.append(rng.choice(invalid))
+        else:
+            corpus.append(rng.choice(formats)(start + timedelta(days=rng.randrange(0, 730))))
+    return corpus
+
+
+def build_cases() -> List[Tuple[str, Callable[[], object], int]]:
+    """(name, function, items per call); per-item cases report time per offer or string"""
+    categorizer = FlightCategorizer()
+    departure = "2025-06-01"
+    cases = []
+
+    for size in (10, 100, 1000, 10000):
+        offers = generate_offers(size, departure_date=departure, seed=size)
+        cases.append((f"categorize_flights[{size} one-way]", lambda o=offers: categorizer.categorize_flights(o), 1))
+    round_trip = generate_offers(1000, departure_date=departure, return_date="2025-06-15", seed=1)
+    cases.append(("categorize_flights[1000 round-trip]", lambda: categorizer.categorize_flights(round_trip), 1))
+
+    cases.append(("_parse_flight_offer[per offer]",
+                  lambda: [categorizer._parse_flight_offer(o) for o in round_trip], len(round_trip)))
+
+    for size in (100, 1000):
+        offers = generate_offers(size, departure_date="2025-07-01", seed=size + 1)
+        cases.append((f"get_best_future_deal[{size}]", lambda o=offers: categorizer.get_best_future_deal(o), 1))
+
+    corpus = date_corpus()
+
+    def parse_cold():
+        DateParser.clear_cache()
+        return [DateParser.parse_date(s) for s in corpus]
+
+    cases.append(("DateParser.parse_date[per string]", lambda: [DateParser.parse_date(s) for s in corpus], len(corpus)))
+    cases.append(("DateParser.parse_date[per string cold]", parse_cold, len(corpus)))
+    cases.append(("DateParser.parse_many[per string]", lambda: DateParser.parse_many(corpus), len(corpus)))
+    return cases
+
+
+def time_case(func: Callable[[], object], per_call: int, rounds: int, min_time: float) -> float:
+    """Median seconds per item"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()  # warm up
+        loops = 1
+        while True:
+            started = time.perf_counter()
+            for _ in range(loops):
+                func()
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_time or loops >= 1_000_000:
+                break
+            loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9)))
+
+        samples = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            for _ in range(loops):
+                func()
+            samples.append((time.perf_counter() - started) / loops / per_call)
+    return statistics.median(samples)
+
+
+def format_time(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.2f} us"
+
+
+def load_baseline(path: str) -> Dict[str, float]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get("results", {})
+
+
+def save_baseline(path: str, results: Dict[str, float]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()}",
+            "saved": date.today().isoformat(),
+            "unit": "seconds per call (per item for [per ...] cases)",
+            "results": results,
+        }, f, indent=2)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5, help="Timed rounds per case")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Target seconds per round")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write these results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if any case regressed past --threshold")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline)
+    results = {}
+    regressions = []
+    print(f"{'case':<38} | {'time':>11} | {'baseline':>11} | {'change':>7}")
+    print("-" * 76)
+    for name, func, per_call in build_cases():
+        if args.filter not in name:
+            continue
+        seconds = time_case(func, per_call, args.rounds, args.min_time)
+        results[name] = seconds
+        base = baseline.get(name)
+        change = ""
+        if base:
+            ratio = seconds / base - 1
+            change = f"{ratio:+.0%}"
+            if ratio > args.threshold:
+                regressions.append(name)
+                change += " !"
+        print(f"{name:<38} | {format_time(seconds):>11} | {format_time(base) if base else '-':>11} | {change:>7}")
+
+    if args.save_baseline:
+        save_baseline(args.baseline, {**baseline, **results})
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}: "
+              f"{', '.join(regressions)}")
+        if args.check:
+            sys.exit(1)
+    elif args.check:
+        print(f"\nNo regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Worker latency under mixed load, with search processing inline or offloaded.
+
+Simulates one uvicorn worker: an asyncio event loop serving a steady stream
+of light requests (a small JSON response after a short await, like a cached
+booking lookup) while a few clients keep searches in flight. Each search
+decodes and categorizes a synthetic Flight Offers Search body
+(utils.categorizer.summarize_response) in a thread, as the app does, with:
+
+    inline   the work runs in the handler thread, holding the worker's GIL
+    process  CpuOffload sends the body to its helper processes
+
+For each mode, the p50/p99/max latency of the light requests and of the
+searches is reported, with search throughput. Light requests alone are
+measured first as the floor. Results depend on the machine: with fewer cores
+than helpers + 1, offloading mostly trades GIL waits for OS scheduling.
+
+Usage (from backend/):
+    python -m benchmarks.bench_offload
+    python -m benchmarks.bench_offload --offers 250 --searches 3 --duration 5
+    python -m benchmarks.bench_offload --offers 50 --modes inline process
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.offer_generator import generate_offers
+from utils.categorizer import summarize_response
+from utils.offload import INLINE, PROCESS, CpuOffload
+
+LIGHT_INTERVAL = 0.005   # A light request arrives every 5 ms
+LIGHT_AWAIT = 0.001      # ...and awaits 1 ms of simulated I/O
+
+_DEVNULL = open(os.devnull, "w")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def quiet_summarize(body: bytes):
+    """
+    summarize_response without its per-search log line (module level, so it can
+    be offloaded). Swapping stdout per call is not thread-safe, so it is silenced
+    for good and the report is written to sys.__stdout__.
+    """
+    sys.stdout = _DEVNULL
+    return summarize_response(body)
+
+
+def report(line: str):
+    print(line, file=sys.__stdout__, flush=True)
+
+
+async def light_request(booking: Dict) -> None:
+    await asyncio.sleep(LIGHT_AWAIT)
+    json.dumps(booking)
+
+
+async def run_load(body: bytes, offload: Optional[CpuOffload], searches: int, duration: float) -> Dict:
+    booking = {"booking_reference": "ABC123", "status": "CONFIRMED", "price": 412.5,
+               "passengers": [{"name": f"Traveller {i}"} for i in range(3)]}
+    light: List[float] = []
+    heavy: List[float] = []
+    stop_at = time.perf_counter() + duration
+
+    async def light_client():
+        next_at = time.perf_counter()
+        while next_at < stop_at:
+            # Open loop: latency counts from when the request was due, so loop stalls show up
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            await light_request(booking)
+            light.append(time.perf_counter() - next_at)
+            next_at += LIGHT_INTERVAL
+
+    async def search_client():
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            await asyncio.to_thread(offload.run, quiet_summarize, body)
+            heavy.append(time.perf_counter() - started)
+
+    clients = [light_client()] + ([search_client() for _ in range(searches)] if offload else [])
+    await asyncio.gather(*clients)
+    return {"light": light, "heavy": heavy}
+
+
+def row(name: str, values: List[float]) -> str:
+    if not values:
+        return f"  {name:<10} -"
+    ms = [v * 1000 for v in values]
+    return (f"  {name:<10} p50 {statistics.median(ms):8.2f} ms   p99 {percentile(ms, 99):8.2f} ms"
+            f"   max {max(ms):8.2f} ms   n={len(ms)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--offers", type=int, default=250, help="Offers per search response")
+    parser.add_argument("--searches", type=int, default=2, help="Searches kept in flight")
+    parser.add_argument("--duration", type=float, default=4.0, help="Seconds per mode")
+    parser.add_argument("--workers", type=int, default=2, help="Offload helper processes")
+    parser.add_argument("--modes", nargs="+", default=[INLINE, PROCESS], choices=[INLINE, PROCESS])
+    args = parser.parse_args()
+
+    body = json.dumps({"data": generate_offers(args.offers, seed=11)}).encode()
+    report(f"{args.offers} offers per search ({len(body) / 1024:.0f} KiB), {args.searches} searches in flight, "
+           f"light request every {LIGHT_INTERVAL * 1000:.0f} ms, {os.cpu_count()} CPUs")
+
+    result = asyncio.run(run_load(body, None, 0, args.duration))
+    report("light only")
+    report(row("light", result["light"]))
+
+    for mode in args.modes:
+        offload = CpuOffload("bench", mode=mode, min_bytes=0, workers=args.workers)
+        offload.warm_up()
+        # Untimed pass so helpers have imported the categorizer
+        offload.run(quiet_summarize, body)
+        result = asyncio.run(run_load(body, offload, args.searches, args.duration))
+        offload.close()
+        report(f"{mode}  ({len(result['heavy']) / args.duration:.1f} searches/s)")
+        report(row("light", result["light"]))
+        report(row("search", result["heavy"]))
+
+
+if __name__ == "__main__":
+    main()
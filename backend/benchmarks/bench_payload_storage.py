@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Before/after benchmark for the bookings and payments payload columns.
+
+"before" mirrors the old mapping: flight_data, passenger_details and
+paypal_response as plain JSON columns loaded with every row. "after" is the
+current mapping from database.py: deferred CompressedJSON columns.
+
+For each mapping it seeds the same rows and reports the stored payload size,
+and the bytes returned by the database and wall time for the hot lookups:
+a booking by reference, a page of bookings by status, and a payment by
+PayPal order id.
+
+Usage (from backend/):
+    python -m benchmarks.bench_payload_storage
+    python -m benchmarks.bench_payload_storage --rows 50000 --repeat 500
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, JSON
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+import database
+
+LegacyBase = declarative_base()
+
+
+class LegacyBooking(LegacyBase):
+    """bookings as mapped before payload columns were deferred and compressed"""
+    __tablename__ = "bookings"
+
+    id = Column(Integer, primary_key=True)
+    booking_reference = Column(String(50), unique=True, index=True, nullable=False)
+    customer_email = Column(String(255), nullable=False)
+    customer_name = Column(String(255))
+    origin = Column(String(10), nullable=False)
+    destination = Column(String(10), nullable=False)
+    departure_date = Column(String(20), nullable=False)
+    airline = Column(String(100))
+    passenger_details = Column(JSON)
+    total_price = Column(Float, nullable=False)
+    currency = Column(String(10))
+    payment_status = Column(String(50))
+    booking_status = Column(String(50))
+    confirmation_sent = Column(Boolean, default=False)
+    paypal_order_id = Column(String(255))
+    flight_data = Column(JSON)
+    created_at = Column(DateTime)
+
+
+class LegacyPayment(LegacyBase):
+    __tablename__ = "payments"
+
+    id = Column(Integer, primary_key=True)
+    booking_id = Column(Integer, index=True)
+    paypal_order_id = Column(String(255), unique=True, index=True)
+    amount = Column(Float, nullable=False)
+    status = Column(String(50))
+    paypal_response = Column(JSON)
+
+
+def sample_offer(rng: random.Random, offer_id: int) -> dict:
+    """A round-trip Amadeus flight offer of typical size"""
+    def segment(n, origin, destination, day):
+        return {
+            "departure": {"iataCode": origin, "terminal": "5", "at": f"2025-06-{day:02d}T{8 + n:02d}:15:00"},
+            "arrival": {"iataCode": destination, "terminal": "1", "at": f"2025-06-{day:02d}T{12 + n:02d}:40:00"},
+            "carrierCode": rng.choice(["BA", "AA", "VS", "DL"]),
+            "number": str(rng.randrange(100, 9999)),
+            "aircraft": {"code": rng.choice(["777", "789", "388"])},
+            "operating": {"carrierCode": "BA"},
+            "duration": "PT7H25M",
+            "id": str(n),
+            "numberOfStops": 0,
+            "blacklistedInEU": False,
+        }
+
+    itineraries = [
+        {"duration": "PT9H40M", "segments": [segment(1, "LHR", "DUB", 1), segment(2, "DUB", "JFK", 1)]},
+        {"duration": "PT8H05M", "segments": [segment(3, "JFK", "LHR", 15)]},
+    ]
+    fare_details = [
+        {"segmentId": str(n), "cabin": "ECONOMY", "fareBasis": "OLN0Z9M4", "brandedFare": "BASIC",
+         "class": "O", "includedCheckedBags": {"quantity": 1},
+         "amenities": [{"description": "PRE RESERVED SEAT ASSIGNMENT", "isChargeable": True,
+                        "amenityType": "PRE_RESERVED_SEAT"}] * 4}
+        for n in range(1, 4)
+    ]
+    price = round(rng.uniform(300, 900), 2)
+    return {
+        "type": "flight-offer",
+        "id": str(offer_id),
+        "source": "GDS",
+        "instantTicketingRequired": False,
+        "nonHomogeneous": False,
+        "oneWay": False,
+        "lastTicketingDate": "2025-05-20",
+        "numberOfBookableSeats": 9,
+        "itineraries": itineraries,
+        "price": {"currency": "GBP", "total": str(price), "base": str(round(price * 0.6, 2)),
+                  "fees": [{"amount": "0.00", "type": "SUPPLIER"}, {"amount": "0.00", "type": "TICKETING"}],
+                  "grandTotal": str(price)},
+        "pricingOptions": {"fareType": ["PUBLISHED"], "includedCheckedBagsOnly": True},
+        "validatingAirlineCodes": ["BA"],
+        "travelerPricings": [
+            {"travelerId": str(t), "fareOption": "STANDARD", "travelerType": "ADULT",
+             "price": {"currency": "GBP", "total": str(price), "base": str(round(price * 0.6, 2))},
+             "fareDetailsBySegment": fare_details}
+            for t in range(1, 3)
+        ],
+    }
+
+
+def sample_rows(rng: random.Random, i: int) -> tuple:
+    order_id = f"PAYPAL{i:012d}"
+    booking = {
+        "id": i + 1,
+        "booking_reference": f"ATW-{i:08X}",
+        "customer_email": f"customer{i % 5000}@example.com",
+        "customer_name": "Bench Customer",
+        "origin": "LHR",
+        "destination": "JFK",
+        "departure_date": "2025-06-01",
+        "airline": "BA",
+        "passenger_details": {
+            "passengers": [{"id": str(t), "name": {"firstName": "ALEX", "lastName": "TRAVELLER"},
+                            "dateOfBirth": "1990-01-01", "gender": "FEMALE",
+                            "documents": [{"documentType": "PASSPORT", "number": "00000000",
+                                           "expiryDate": "2030-01-01", "nationality": "GB"}]}
+                           for t in range(1, 3)],
+            "contacts": {"emailAddress": "customer@example.com", "phones": [{"number": "7000000000"}]},
+        },
+        "total_price": 500.0,
+        "currency": "GBP",
+        "payment_status": rng.choice(["completed", "pending", "failed"]),
+        "booking_status": rng.choice(["confirmed", "pending", "cancelled", "pnr_created"]),
+        "paypal_order_id": order_id,
+        "flight_data": sample_offer(rng, i),
+        "created_at": datetime(2024, 1, 1) + timedelta(minutes=i),
+    }
+    payment = {
+        "id": i + 1,
+        "booking_id": i + 1,
+        "paypal_order_id": order_id,
+        "amount": 500.0,
+        "status": "completed",
+        "paypal_response": {
+            "id": order_id, "status": "COMPLETED",
+            "payer": {"name": {"given_name": "Alex", "surname": "Traveller"}, "email_address": "buyer@example.com",
+                      "payer_id": "ABCDEFGHIJKLM", "address": {"country_code": "GB"}},
+            "purchase_units": [{"reference_id": f"BOOKING-{i:016x}", "payments": {"captures": [{
+                "id": f"CAP{i:014d}", "status": "COMPLETED",
+                "amount": {"currency_code": "GBP", "value": "500.00"},
+                "seller_protection": {"status": "ELIGIBLE",
+                                      "dispute_categories": ["ITEM_NOT_RECEIVED", "UNAUTHORIZED_TRANSACTION"]},
+                "links": [{"href": f"https://api.sandbox.paypal.com/v2/payments/captures/CAP{i:014d}",
+                           "rel": rel, "method": "GET"} for rel in ("self", "refund", "up")],
+                "create_time": "2025-05-01T10:00:00Z", "update_time": "2025-05-01T10:00:00Z"}]}}],
+            "links": [{"href": f"https://api.sandbox.paypal.com/v2/checkout/orders/{order_id}",
+                       "rel": "self", "method": "GET"}],
+        },
+    }
+    return booking, payment
+
+
+def raw_bytes(engine, query) -> int:
+    """Bytes the database returns for an ORM query, before any result processing"""
+    compiled = query.statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    total = 0
+    with engine.connect() as conn:
+        for row in conn.exec_driver_sql(str(compiled)).fetchall():
+            for value in row:
+                if isinstance(value, (bytes, str)):
+                    total += len(value)
+                elif value is not None:
+                    total += 8
+    return total
+
+
+def measure(booking_model, payment_model, rows, repeat):
+    fd, path = tempfile.mkstemp(suffix=".sqlite", prefix="bench_payload_")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        booking_model.metadata.create_all(engine, tables=[booking_model.__table__, payment_model.__table__])
+        Session = sessionmaker(bind=engine)
+        rng = random.Random(7)
+        db = Session()
+        for start in range(0, rows, 1000):
+            for i in range(start, min(start + 1000, rows)):
+                booking, payment = sample_rows(rng, i)
+                db.add(booking_model(**{k: v for k, v in booking.items() if hasattr(booking_model, k)}))
+                db.add(payment_model(**{k: v for k, v in payment.items() if hasattr(payment_model, k)}))
+            db.commit()
+        db.close()
+
+        with engine.connect() as conn:
+            stored = conn.exec_driver_sql(
+                "SELECT SUM(LENGTH(flight_data) + LENGTH(passenger_details)) FROM bookings"
+            ).scalar() + conn.exec_driver_sql("SELECT SUM(LENGTH(paypal_response)) FROM payments").scalar()
+
+        db = Session()
+        lookups = {
+            "by reference": lambda i: db.query(booking_model).filter(
+                booking_model.booking_reference == f"ATW-{i:08X}"),
+            "by status (50)": lambda i: db.query(booking_model).filter(
+                booking_model.booking_status == "confirmed").order_by(booking_model.id).offset(i % 1000).limit(50),
+            "payment by order": lambda i: db.query(payment_model).filter(
+                payment_model.paypal_order_id == f"PAYPAL{i:012d}"),
+        }
+        results = {}
+        for name, build in lookups.items():
+            sample = build(rows // 2)
+            bytes_per_lookup = raw_bytes(engine, sample)
+            timings = []
+            for n in range(repeat):
+                query = build(rng.randrange(rows))
+                db.expunge_all()
+                start = time.perf_counter()
+                query.all()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = (bytes_per_lookup, statistics.median(timings))
+        db.close()
+        return stored / rows, results
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="Bookings (and payments) to seed")
+    parser.add_argument("--repeat", type=int, default=300, help="Queries per lookup")
+    args = parser.parse_args()
+
+    runs = [
+        ("before", LegacyBooking, LegacyPayment),
+        ("after", database.Booking, database.Payment),
+    ]
+    summary = {}
+    for label, booking_model, payment_model in runs:
+        summary[label] = measure(booking_model, payment_model, args.rows, args.repeat)
+
+    print(f"Rows seeded: {args.rows:,}")
+    print()
+    print(f"Stored payload bytes per booking+payment: before {summary['before'][0]:,.0f}, "
+          f"after {summary['after'][0]:,.0f} ({summary['after'][0] / summary['before'][0]:.0%})")
+    print()
+    print(f"{'lookup':<18} | {'bytes before':>12} | {'bytes after':>11} | {'ms before':>9} | {'ms after':>8}")
+    print("-" * 72)
+    for name in summary["before"][1]:
+        b_bytes, b_ms = summary["before"][1][name]
+        a_bytes, a_ms = summary["after"][1][name]
+        print(f"{name:<18} | {b_bytes:>12,} | {a_bytes:>11,} | {b_ms:>9.3f} | {a_ms:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
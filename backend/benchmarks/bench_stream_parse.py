@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Search summary latency and peak memory, with the response read whole or streamed.
+
+A synthetic Flight Offers Search body is delivered in 64 KiB chunks at a
+simulated link speed, as requests' iter_content would hand it over, and
+summarized (utils.categorizer.summarize_offers) in one of two ways:
+
+    whole    join the chunks, then json.loads and summarize (the raw=True path)
+    stream   utils.json_stream.iter_json_array over the chunks, each offer
+             parsed while later chunks are still arriving (the consume= path)
+
+For each, the time from the first byte to the finished summary and the peak
+Python heap (tracemalloc) are reported, and the two summaries are checked to
+be identical. With --mbps 0 the chunks arrive instantly, isolating the parse
+cost itself.
+
+Usage (from backend/):
+    python -m benchmarks.bench_stream_parse
+    python -m benchmarks.bench_stream_parse --offers 250 500 1000 --mbps 40
+    python -m benchmarks.bench_stream_parse --mbps 0 --repeat 10
+"""
+import argparse
+import io
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from benchmarks.offer_generator import generate_offers
+from utils.categorizer import summarize_offers
+from utils.json_stream import iter_json_array
+
+CHUNK_BYTES = 65536
+
+
+def deliver(body: bytes, mbps: float) -> Iterator[bytes]:
+    """body in CHUNK_BYTES chunks, each released when it would have arrived at mbps megabits/s"""
+    started = time.perf_counter()
+    for offset in range(0, len(body), CHUNK_BYTES):
+        chunk = body[offset:offset + CHUNK_BYTES]
+        if mbps:
+            due = started + (offset + len(chunk)) * 8 / (mbps * 1e6)
+            time.sleep(max(0.0, due - time.perf_counter()))
+        yield chunk
+
+
+def whole(chunks: Iterator[bytes]) -> Dict:
+    body = b"".join(chunks)
+    return summarize_offers(json.loads(body).get("data") or [])
+
+
+def stream(chunks: Iterator[bytes]) -> Dict:
+    return summarize_offers(iter_json_array(chunks, "data"))
+
+
+def measure(method: Callable[[Iterator[bytes]], Dict], body: bytes, mbps: float, repeat: int) -> Tuple[Dict, List[float], int]:
+    """(summary, seconds per run, peak traced bytes of one run)"""
+    seconds = []
+    with redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            started = time.perf_counter()
+            summary = method(deliver(body, mbps))
+            seconds.append(time.perf_counter() - started)
+        tracemalloc.start()
+        method(deliver(body, mbps))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return summary, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--offers", type=int, nargs="+", default=[50, 250, 1000], help="Offers per response")
+    parser.add_argument("--mbps", type=float, default=20, help="Simulated link speed in megabits/s (0: instant)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per method")
+    args = parser.parse_args()
+
+    print(f"link {args.mbps:g} Mbit/s, {CHUNK_BYTES // 1024} KiB chunks, median of {args.repeat} runs")
+    for count in args.offers:
+        body = json.dumps({"meta": {"count": count}, "data": generate_offers(count, seed=5)}).encode()
+        transfer = len(body) * 8 / (args.mbps * 1e6) if args.mbps else 0.0
+        print(f"{count} offers ({len(body) / 1024:.0f} KiB, transfer {transfer * 1000:.1f} ms)")
+        summaries = []
+        for name, method in (("whole", whole), ("stream", stream)):
+            summary, seconds, peak = measure(method, body, args.mbps, args.repeat)
+            summaries.append(summary)
+            print(f"  {name:<7} {statistics.median(seconds) * 1000:8.2f} ms to summary   "
+                  f"peak heap {peak / 1024 / 1024:6.2f} MiB")
+        if summaries[0] != summaries[1]:
+            print("  ❌ summaries differ", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
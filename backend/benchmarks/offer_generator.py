@@ -0,0 +1,173 @@
+"""
+Synthetic Amadeus Flight Offers Search v2 payloads.
+
+Offers are deterministic for a given seed and shaped like real
+/v2/shopping/flight-offers responses: one itinerary per direction (or per
+leg of a multi-city trip), 0-2 stops
+through real hubs, layovers, per-segment cabins (long-haul legs of a mixed
+itinerary may be in a higher cabin than the connections), fare details for
+every traveler and segment, and the response "dictionaries" block.
+
+Used by the CPU benchmarks and by the load-test stand-in (loadtest/standin.py).
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+CARRIERS = ["BA", "AA", "VS", "DL", "UA", "LH", "AF", "KL", "EK", "QR", "IB", "EI"]
+HUBS = ["DUB", "AMS", "CDG", "FRA", "KEF", "DXB", "DOH", "BOS", "ORD", "MAD", "MUC", "ZRH"]
+AIRCRAFT = ["320", "321", "333", "359", "388", "744", "777", "789"]
+CABINS = ["ECONOMY", "PREMIUM_ECONOMY", "BUSINESS", "FIRST"]
+CABIN_WEIGHTS = [70, 12, 14, 4]
+CABIN_PRICE_FACTOR = {"ECONOMY": 1.0, "PREMIUM_ECONOMY": 1.6, "BUSINESS": 3.2, "FIRST": 5.5}
+STOP_WEIGHTS = [5, 4, 1]
+
+
+def iso_duration(minutes: int) -> str:
+    """Minutes as an ISO 8601 duration as Amadeus writes it (PT7H5M, PT45M)"""
+    hours, mins = divmod(minutes, 60)
+    if hours and mins:
+        return f"PT{hours}H{mins}M"
+    if hours:
+        return f"PT{hours}H"
+    return f"PT{mins}M"
+
+
+def _itinerary(rng: random.Random, first_segment_id: int, origin: str, destination: str,
+               day: str, carrier: str, max_stops: int) -> Dict:
+    stops = rng.choices(range(max_stops + 1), weights=STOP_WEIGHTS[:max_stops + 1])[0]
+    points = [origin] + rng.sample([h for h in HUBS if h not in (origin, destination)], stops) + [destination]
+    at = datetime.strptime(day, "%Y-%m-%d") + timedelta(hours=rng.randrange(6, 22), minutes=rng.choice([0, 15, 30, 45]))
+    started = at
+    segments = []
+    for n in range(len(points) - 1):
+        flight_minutes = rng.randrange(55, 540)
+        arrive = at + timedelta(minutes=flight_minutes)
+        operating = carrier if rng.random() < 0.85 else rng.choice(CARRIERS)
+        segments.append({
+            "departure": {"iataCode": points[n], "terminal": str(rng.randrange(1, 6)),
+                          "at": at.strftime("%Y-%m-%dT%H:%M:%S")},
+            "arrival": {"iataCode": points[n + 1], "terminal": str(rng.randrange(1, 6)),
+                        "at": arrive.strftime("%Y-%m-%dT%H:%M:%S")},
+            "carrierCode": carrier,
+            "number": str(rng.randrange(10, 9999)),
+            "aircraft": {"code": rng.choice(AIRCRAFT)},
+            "operating": {"carrierCode": operating},
+            "duration": iso_duration(flight_minutes),
+            "id": str(first_segment_id + n),
+            "numberOfStops": 0,
+            "blacklistedInEU": False,
+        })
+        at = arrive + timedelta(minutes=rng.randrange(45, 300))
+    return {"duration": iso_duration(int((arrive - started).total_seconds() // 60)), "segments": segments}
+
+
+def generate_offer(rng: random.Random, offer_id: int, origin: str, destination: str, departure_date: str,
+                   return_date: Optional[str] = None, currency: str = "GBP", cabin: Optional[str] = None,
+                   travelers: int = 1, max_stops: int = 2,
+                   legs: Optional[Sequence[Tuple[str, str, str]]] = None) -> Dict:
+    """
+    One flight offer.
+
+    Args:
+        cabin: Cabin for every segment; None picks a cabin per offer (mostly economy)
+            and may put single long legs of a multi-segment itinerary in a higher cabin
+        travelers: Adults priced on the offer
+        max_stops: Upper bound on stops per itinerary (0-2)
+        legs: (origin, destination, date) per itinerary of a multi-city trip;
+            replaces origin, destination, departure_date and return_date
+    """
+    carrier = rng.choice(CARRIERS)
+    if legs is None:
+        legs = [(origin, destination, departure_date)] + ([(destination, origin, return_date)] if return_date else [])
+    itineraries = []
+    for leg_origin, leg_destination, day in legs:
+        next_id = sum(len(itinerary["segments"]) for itinerary in itineraries) + 1
+        itineraries.append(_itinerary(rng, next_id, leg_origin, leg_destination, day, carrier, max_stops))
+    segments = [segment for itinerary in itineraries for segment in itinerary["segments"]]
+
+    offer_cabin = cabin or rng.choices(CABINS, weights=CABIN_WEIGHTS)[0]
+    segment_cabins = []
+    for segment in segments:
+        segment_cabin = offer_cabin
+        if cabin is None and offer_cabin == "ECONOMY" and len(segments) > 1 and rng.random() < 0.1:
+            segment_cabin = rng.choice(["PREMIUM_ECONOMY", "BUSINESS"])
+        segment_cabins.append(segment_cabin)
+
+    per_traveler = rng.uniform(60, 900) * (1 + 0.6 * (len(legs) - 1)) * CABIN_PRICE_FACTOR[offer_cabin]
+    base = per_traveler * 0.62
+    total = round(per_traveler * travelers, 2)
+    fare_basis = f"{rng.choice('OKLQVYBJ')}{rng.choice(['LN', 'HX', 'KW'])}{rng.randrange(0, 9)}Z{rng.randrange(1, 9)}M{rng.randrange(1, 9)}"
+    return {
+        "type": "flight-offer",
+        "id": str(offer_id),
+        "source": "GDS",
+        "instantTicketingRequired": False,
+        "nonHomogeneous": False,
+        "oneWay": False,
+        "isUpsellOffer": False,
+        "lastTicketingDate": legs[0][2],
+        "lastTicketingDateTime": legs[0][2],
+        "numberOfBookableSeats": rng.randrange(1, 10),
+        "itineraries": itineraries,
+        "price": {
+            "currency": currency,
+            "total": f"{total:.2f}",
+            "base": f"{base * travelers:.2f}",
+            "fees": [{"amount": "0.00", "type": "SUPPLIER"}, {"amount": "0.00", "type": "TICKETING"}],
+            "grandTotal": f"{total:.2f}",
+        },
+        "pricingOptions": {"fareType": ["PUBLISHED"], "includedCheckedBagsOnly": offer_cabin != "ECONOMY"},
+        "validatingAirlineCodes": [carrier],
+        "travelerPricings": [
+            {
+                "travelerId": str(t),
+                "fareOption": "STANDARD",
+                "travelerType": "ADULT",
+                "price": {"currency": currency, "total": f"{per_traveler:.2f}", "base": f"{base:.2f}"},
+                "fareDetailsBySegment": [
+                    {
+                        "segmentId": segment["id"],
+                        "cabin": segment_cabin,
+                        "fareBasis": fare_basis,
+                        "brandedFare": "BASIC" if segment_cabin == "ECONOMY" else "FLEX",
+                        "class": fare_basis[0],
+                        "includedCheckedBags": {"quantity": 0 if segment_cabin == "ECONOMY" else 2},
+                    }
+                    for segment, segment_cabin in zip(segments, segment_cabins)
+                ],
+            }
+            for t in range(1, travelers + 1)
+        ],
+    }
+
+
+def generate_offers(count: int, origin: str = "LHR", destination: str = "JFK", departure_date: str = "2025-06-01",
+                    return_date: Optional[str] = None, currency: str = "GBP", cabin: Optional[str] = None,
+                    travelers: int = 1, seed: int = 0,
+                    legs: Optional[Sequence[Tuple[str, str, str]]] = None) -> List[Dict]:
+    """count offers for one search (legs: see generate_offer)"""
+    rng = random.Random(seed)
+    return [
+        generate_offer(rng, n + 1, origin, destination, departure_date, return_date, currency, cabin, travelers,
+                       legs=legs)
+        for n in range(count)
+    ]
+
+
+def generate_search_response(count: int, **kwargs) -> Dict:
+    """A full flight-offers response body: meta, data and dictionaries"""
+    offers = generate_offers(count, **kwargs)
+    carriers = sorted({segment["carrierCode"] for offer in offers
+                       for itinerary in offer["itineraries"] for segment in itinerary["segments"]})
+    aircraft = sorted({segment["aircraft"]["code"] for offer in offers
+                       for itinerary in offer["itineraries"] for segment in itinerary["segments"]})
+    return {
+        "meta": {"count": len(offers)},
+        "data": offers,
+        "dictionaries": {
+            "carriers": {code: code for code in carriers},
+            "aircraft": {code: code for code in aircraft},
+            "currencies": {kwargs.get("currency", "GBP"): kwargs.get("currency", "GBP")},
+        },
+    }
@@ -1,138 +1,432 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean, JSON
-from sqlalchemy.orm import sessionmaker, declarative_base
-from datetime import datetime
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# Database configuration
-DB_HOST = os.getenv("DB_HOST", "atw-db-dev.mysql.database.azure.com")
-DB_NAME = os.getenv("DB_NAME", "atw_dev")
-DB_USER = os.getenv("DB_USER", "atwdevdbadmin")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "Zw5QHqjWDV-D!ag")
-DB_PORT = os.getenv("DB_PORT", "3306")
-
-# Azure MySQL requires SSL/TLS connections
-# Create connection string (SSL will be configured via connect_args)
-DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4"
-
-# Create engine with SSL configuration for Azure MySQL
-# Azure MySQL requires SSL connections - PyMySQL SSL configuration
-connect_args = {
-    "ssl": {
-        "ca": None,  # Azure MySQL uses server-side certificates
-        "check_hostname": False,  # Azure MySQL uses server-side validation
-    }
-}
-
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    echo=False,  # Set to True for SQL query logging
-    connect_args=connect_args
-)
-
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# Base class for models
-Base = declarative_base()
-
-
-class Booking(Base):
-    __tablename__ = "bookings"
-
-    id = Column(Integer, primary_key=True, index=True)
-    booking_reference = Column(String(50), unique=True, index=True, nullable=False)
-    customer_email = Column(String(255), nullable=False)
-    customer_name = Column(String(255))
-    customer_phone = Column(String(50))
-    
-    # Flight details
-    flight_id = Column(String(100))  # Amadeus flight offer ID
-    origin = Column(String(10), nullable=False)
-    destination = Column(String(10), nullable=False)
-    departure_date = Column(String(20), nullable=False)
-    departure_time = Column(String(20))
-    arrival_time = Column(String(20))
-    airline = Column(String(100))
-    cabin_class = Column(String(50))
-    duration = Column(String(20))
-    stops = Column(Integer, default=0)
-    
-    # Passenger details
-    adults = Column(Integer, default=1)
-    children = Column(Integer, default=0)
-    infants = Column(Integer, default=0)
-    passenger_details = Column(JSON)  # Store full passenger info
-    
-    # Pricing
-    total_price = Column(Float, nullable=False)
-    currency = Column(String(10), default="GBP")
-    
-    # Payment details
-    payment_status = Column(String(50), default="pending")  # pending, completed, failed, refunded
-    paypal_order_id = Column(String(255))
-    paypal_payment_id = Column(String(255))
-    payment_amount = Column(Float)
-    
-    # Flight data (raw JSON from Amadeus)
-    flight_data = Column(JSON)
-    
-    # Status
-    booking_status = Column(String(50), default="pending")  # pending, confirmed, cancelled
-    confirmation_sent = Column(Boolean, default=False)
-    
-    # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "booking_reference": self.booking_reference,
-            "customer_email": self.customer_email,
-            "customer_name": self.customer_name,
-            "origin": self.origin,
-            "destination": self.destination,
-            "departure_date": self.departure_date,
-            "airline": self.airline,
-            "total_price": self.total_price,
-            "currency": self.currency,
-            "payment_status": self.payment_status,
-            "booking_status": self.booking_status,
-            "created_at": self.created_at.isoformat() if self.created_at else None
-        }
-
-
-class Payment(Base):
-    __tablename__ = "payments"
-
-    id = Column(Integer, primary_key=True, index=True)
-    booking_id = Column(Integer, index=True)
-    paypal_order_id = Column(String(255), unique=True, index=True)
-    paypal_payment_id = Column(String(255))
-    amount = Column(Float, nullable=False)
-    currency = Column(String(10), default="GBP")
-    status = Column(String(50), default="pending")  # pending, completed, failed, refunded
-    paypal_response = Column(JSON)  # Store full PayPal response
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-
-# Create tables
-def init_db():
-    """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
-
-
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
+from sqlalchemy import create_engine, inspect, text, Column, Integer, String, Float, DateTime, Text, Boolean, Index, LargeBinary, or_, and_
+from sqlalchemy.dialects.mysql import LONGBLOB
+from sqlalchemy.orm import sessionmaker, declarative_base, deferred, load_only, Session
+from sqlalchemy.types import TypeDecorator
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+import json
+import os
+import threading
+import zlib
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Database configuration
+DB_HOST = os.getenv("DB_HOST", "atw-db-dev.mysql.database.azure.com")
+DB_NAME = os.getenv("DB_NAME", "atw_dev")
+DB_USER = os.getenv("DB_USER", "atwdevdbadmin")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "Zw5QHqjWDV-D!ag")
+DB_PORT = os.getenv("DB_PORT", "3306")
+
+# Azure MySQL requires SSL/TLS connections
+# Create connection string (SSL will be configured via connect_args)
+# DATABASE_URL overrides the DB_* settings, e.g. sqlite:///loadtest.db for local load tests
+DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4"
+)
+
+# Create engine with SSL configuration for Azure MySQL
+# Azure MySQL requires SSL connections - PyMySQL SSL configuration
+if DATABASE_URL.startswith("mysql"):
+    connect_args = {
+        "ssl": {
+            "ca": None,  # Azure MySQL uses server-side certificates
+            "check_hostname": False,  # Azure MySQL uses server-side validation
+        }
+    }
+elif DATABASE_URL.startswith("sqlite"):
+    connect_args = {"check_same_thread": False}
+else:
+    connect_args = {}
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Return this process's engine, creating it on first use.
+
+    The engine is created lazily so that importing this module never opens
+    connections, and each uvicorn worker builds its own pool after it starts.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(
+                    DATABASE_URL,
+                    pool_pre_ping=True,
+                    pool_recycle=3600,
+                    echo=False,  # Set to True for SQL query logging
+                    connect_args=connect_args
+                )
+                SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+def dispose_engine():
+    """Close all pooled connections of this process's engine"""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+
+class _LazySessionFactory(sessionmaker):
+    """sessionmaker that binds to get_engine() the first time a session is created"""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None and "bind" not in local_kw:
+            get_engine()
+        return super().__call__(**local_kw)
+
+
+# Create session factory
+SessionLocal = _LazySessionFactory(autocommit=False, autoflush=False)
+
+
+def __getattr__(name):
+    # Keep `from database import engine` working for scripts
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Base class for models
+Base = declarative_base()
+
+
+class CompressedJSON(TypeDecorator):
+    """
+    JSON payload stored as zlib-compressed bytes.
+
+    Reads also accept uncompressed JSON text, which is what rows written before
+    the column was converted from MySQL JSON to LONGBLOB contain.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "mysql":
+            return dialect.type_descriptor(LONGBLOB())
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value: Any, dialect) -> Optional[bytes]:
+        if value is None:
+            return None
+        raw = json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+        return zlib.compress(raw.encode("utf-8"), 6)
+
+    def process_result_value(self, value, dialect) -> Any:
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        if value[:1] == b"\x78":  # zlib header; legacy JSON text never starts with "x"
+            value = zlib.decompress(value)
+        return json.loads(value)
+
+
+class Booking(Base):
+    __tablename__ = "bookings"
+
+    id = Column(Integer, primary_key=True, index=True)
+    booking_reference = Column(String(50), unique=True, index=True, nullable=False)
+    customer_email = Column(String(255), nullable=False)
+    customer_name = Column(String(255))
+    customer_phone = Column(String(50))
+    
+    # Flight details
+    flight_id = Column(String(100))  # Amadeus flight offer ID
+    origin = Column(String(10), nullable=False)
+    destination = Column(String(10), nullable=False)
+    departure_date = Column(String(20), nullable=False)
+    departure_time = Column(String(20))
+    arrival_time = Column(String(20))
+    airline = Column(String(100))
+    cabin_class = Column(String(50))
+    duration = Column(String(20))
+    stops = Column(Integer, default=0)
+    
+    # Passenger details
+    adults = Column(Integer, default=1)
+    children = Column(Integer, default=0)
+    infants = Column(Integer, default=0)
+    passenger_details = deferred(Column(CompressedJSON))  # Store full passenger info (loaded on access)
+    
+    # Pricing
+    total_price = Column(Float, nullable=False)
+    currency = Column(String(10), default="GBP")
+    
+    # Payment details
+    payment_status = Column(String(50), default="pending")  # pending, completed, failed, refunded
+    paypal_order_id = Column(String(255), index=True)  # capture_payment falls back to this lookup
+    paypal_payment_id = Column(String(255))
+    payment_amount = Column(Float)
+    
+    # Flight data (raw JSON from Amadeus, loaded on access)
+    flight_data = deferred(Column(CompressedJSON))
+    
+    # Status
+    booking_status = Column(String(50), default="pending")  # pending, confirmed, cancelled
+    confirmation_sent = Column(Boolean, default=False)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Booking history: WHERE customer_email = ? ORDER BY created_at DESC, id DESC
+        Index("ix_bookings_customer_email_created_at_id", "customer_email", "created_at", "id"),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "booking_reference": self.booking_reference,
+            "customer_email": self.customer_email,
+            "customer_name": self.customer_name,
+            "origin": self.origin,
+            "destination": self.destination,
+            "departure_date": self.departure_date,
+            "airline": self.airline,
+            "total_price": self.total_price,
+            "currency": self.currency,
+            "payment_status": self.payment_status,
+            "booking_status": self.booking_status,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+
+# Columns read by Booking.to_dict(); load only these for list and lookup endpoints
+BOOKING_SUMMARY_COLUMNS = (
+    Booking.id,
+    Booking.booking_reference,
+    Booking.customer_email,
+    Booking.customer_name,
+    Booking.origin,
+    Booking.destination,
+    Booking.departure_date,
+    Booking.airline,
+    Booking.total_price,
+    Booking.currency,
+    Booking.payment_status,
+    Booking.booking_status,
+    Booking.created_at,
+)
+
+
+def customer_bookings_page(
+    db: Session,
+    customer_email: str,
+    limit: int = 20,
+    before: Optional[Tuple[datetime, int]] = None
+) -> Tuple[List[Booking], Optional[Tuple[datetime, int]]]:
+    """
+    Fetch one page of a customer's bookings, newest first, using keyset pagination.
+
+    Args:
+        db: Database session
+        customer_email: Customer whose bookings to list
+        limit: Page size
+        before: (created_at, id) of the last booking on the previous page
+
+    Returns:
+        The bookings on this page and the (created_at, id) key for the next page,
+        or None when there are no more bookings
+    """
+    query = db.query(Booking).options(load_only(*BOOKING_SUMMARY_COLUMNS)).filter(
+        Booking.customer_email == customer_email
+    )
+    if before is not None:
+        created_at, booking_id = before
+        query = query.filter(or_(
+            Booking.created_at < created_at,
+            and_(Booking.created_at == created_at, Booking.id < booking_id)
+        ))
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(Booking.created_at.desc(), Booking.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1].created_at, rows[-1].id)
+
+
+class Payment(Base):
+    __tablename__ = "payments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    booking_id = Column(Integer, index=True)
+    paypal_order_id = Column(String(255), unique=True, index=True)
+    paypal_payment_id = Column(String(255))
+    amount = Column(Float, nullable=False)
+    currency = Column(String(10), default="GBP")
+    status = Column(String(50), default="pending")  # pending, completed, failed, refunded
+    paypal_response = deferred(Column(CompressedJSON))  # Store full PayPal response (loaded on access)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class PriceWatch(Base):
+    __tablename__ = "price_watches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    customer_email = Column(String(255), nullable=False, index=True)
+
+    # The one-way search being watched
+    origin = Column(String(10), nullable=False)
+    destination = Column(String(10), nullable=False)
+    departure_date = Column(String(20), nullable=False)
+    adults = Column(Integer, default=1)
+    children = Column(Integer, default=0)
+    infants = Column(Integer, default=0)
+    travel_class = Column(String(50), default="ECONOMY")
+    currency = Column(String(10), default="GBP")
+    # Route, passengers, cabin, currency and date; watches with the same key share one upstream search
+    search_key = Column(String(255), nullable=False)
+
+    # Alert when the cheapest fare is at or below this price
+    target_price = Column(Float, nullable=False)
+
+    # Check state
+    active = Column(Boolean, default=True)
+    last_price = Column(Float)
+    last_checked_at = Column(DateTime)  # Also set when a scheduler claims the watch's search
+    notified_price = Column(Float)  # Price of the last alert; only a lower price alerts again
+    notified_at = Column(DateTime)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Scheduler: WHERE active AND last_checked_at < ? GROUP BY search_key
+        Index("ix_price_watches_active_search_key", "active", "search_key", "last_checked_at"),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "customer_email": self.customer_email,
+            "origin": self.origin,
+            "destination": self.destination,
+            "departure_date": self.departure_date,
+            "adults": self.adults,
+            "children": self.children,
+            "infants": self.infants,
+            "travel_class": self.travel_class,
+            "currency": self.currency,
+            "target_price": self.target_price,
+            "active": self.active,
+            "last_price": self.last_price,
+            "last_checked_at": self.last_checked_at.isoformat() if self.last_checked_at else None,
+            "notified_price": self.notified_price,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    booking_id = Column(Integer, index=True)  # Booking the email belongs to, if any
+    to_email = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    is_html = Column(Boolean, default=True)
+
+    # Delivery state
+    status = Column(String(20), default="pending", index=True)  # pending, sending, sent, failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)
+    locked_at = Column(DateTime)  # Set while a dispatcher owns the row
+    last_error = Column(Text)
+    sent_at = Column(DateTime)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# Create tables
+def init_db():
+    """Initialize database tables"""
+    Base.metadata.create_all(bind=get_engine())
+    ensure_indexes()
+    migrate_payload_columns()
+
+
+def ensure_indexes(bind=None):
+    """Create indexes that were added to existing tables after they were first created"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind or get_engine(), checkfirst=True)
+
+
+# Dependency to get DB session
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+
+# Payload columns that used to be MySQL JSON and are now CompressedJSON
+PAYLOAD_COLUMNS = {
+    "bookings": ("flight_data", "passenger_details"),
+    "payments": ("paypal_response",),
+}
+
+
+def migrate_payload_columns(bind=None):
+    """
+    Convert legacy MySQL JSON payload columns to LONGBLOB in place.
+
+    Existing rows keep their JSON text, which CompressedJSON still reads; run
+    recompress_payloads() afterwards to compress them.
+    """
+    bind = bind or get_engine()
+    if bind.dialect.name != "mysql":
+        return
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table, columns in PAYLOAD_COLUMNS.items():
+            existing = {col["name"]: col for col in inspector.get_columns(table)}
+            for column in columns:
+                if column in existing and "JSON" in str(existing[column]["type"]).upper():
+                    print(f"Converting {table}.{column} from JSON to LONGBLOB")
+                    conn.execute(text(f"ALTER TABLE {table} MODIFY {column} LONGBLOB NULL"))
+
+
+def recompress_payloads(bind=None, batch_size: int = 500) -> int:
+    """Rewrite payload columns that still hold uncompressed JSON text. Returns rows updated."""
+    bind = bind or get_engine()
+    payload_type = CompressedJSON()
+    updated = 0
+    for table, columns in PAYLOAD_COLUMNS.items():
+        for column in columns:
+            last_id = 0
+            while True:
+                with bind.begin() as conn:
+                    # Compressed values start with the zlib header byte 0x78
+                    rows = conn.execute(text(
+                        f"SELECT id, {column} FROM {table} "
+                        f"WHERE id > :last_id AND {column} IS NOT NULL AND HEX(SUBSTR({column}, 1, 1)) <> '78' "
+                        f"ORDER BY id LIMIT :limit"
+                    ), {"last_id": last_id, "limit": batch_size}).fetchall()
+                    if not rows:
+                        break
+                    params = [
+                        {"id": row_id, "value": payload_type.process_bind_param(
+                            payload_type.process_result_value(value, bind.dialect), bind.dialect)}
+                        for row_id, value in rows
+                    ]
+                    conn.execute(text(f"UPDATE {table} SET {column} = :value WHERE id = :id"), params)
+                    updated += len(params)
+                    last_id = rows[-1][0]
+    return updated
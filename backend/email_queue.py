@@ -0,0 +1,299 @@
+"""Durable email outbox and the background dispatcher that drains it"""
+import os
+import random
+import smtplib
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, Booking, EmailOutbox
+from email_service import EmailService
+
+
+def enqueue_email(
+    db: Session,
+    to_email: str,
+    subject: str,
+    body: str,
+    is_html: bool = True,
+    booking_id: Optional[int] = None
+) -> EmailOutbox:
+    """Add an email to the outbox. The caller owns the transaction and commits it."""
+    item = EmailOutbox(
+        booking_id=booking_id,
+        to_email=to_email,
+        subject=subject,
+        body=body,
+        is_html=is_html,
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.add(item)
+    return item
+
+
+def enqueue_booking_confirmation(db: Session, email_service: EmailService, booking: Booking) -> List[EmailOutbox]:
+    """Queue the customer and admin confirmation emails for a confirmed booking"""
+    flight_details = {
+        "origin": booking.origin,
+        "destination": booking.destination,
+        "departure_time": booking.departure_time,
+        "arrival_time": booking.arrival_time,
+        "airline": booking.airline,
+        "cabin_class": booking.cabin_class,
+        "duration": booking.duration
+    }
+
+    booking_details = {
+        "customer_name": booking.customer_name,
+        "customer_email": booking.customer_email,
+        "customer_phone": booking.customer_phone,
+        "departure_date": booking.departure_date,
+        "total_price": booking.total_price,
+        "currency": booking.currency,
+        "payment_status": booking.payment_status
+    }
+
+    messages = email_service.build_booking_confirmation_messages(
+        customer_email=booking.customer_email,
+        booking_reference=booking.booking_reference,
+        booking_details=booking_details,
+        flight_details=flight_details
+    )
+    return [enqueue_email(db, booking_id=booking.id, **message) for message in messages]
+
+
+def enqueue_access_link(db: Session, email_service: EmailService, customer_email: str, link: str,
+                        resend_after: float = None) -> Optional[EmailOutbox]:
+    """
+    Queue a customer's access link, unless one was queued for the address within
+    resend_after seconds (default EMAIL_ACCESS_RESEND_SECONDS or 60), so the
+    endpoint cannot be used to flood an inbox. The caller commits.
+    """
+    resend_after = resend_after if resend_after is not None else float(os.getenv("EMAIL_ACCESS_RESEND_SECONDS", "60"))
+    message = email_service.build_access_link_message(customer_email, link)
+    recent = db.query(EmailOutbox.id).filter(
+        EmailOutbox.to_email == customer_email,
+        EmailOutbox.subject == message["subject"],
+        EmailOutbox.created_at > datetime.utcnow() - timedelta(seconds=resend_after)
+    ).first()
+    if recent is not None:
+        return None
+    return enqueue_email(db, **message)
+
+
+class EmailDispatcher:
+    """
+    Background worker that sends queued emails over one long-lived SMTP connection.
+
+    Every uvicorn worker may run a dispatcher; rows are claimed with a conditional
+    UPDATE so each email is sent by exactly one of them. Failed sends are retried
+    with exponential backoff until max_attempts is reached.
+    """
+
+    def __init__(
+        self,
+        email_service: EmailService,
+        session_factory=SessionLocal,
+        batch_size: int = None,
+        poll_interval: float = None,
+        max_attempts: int = None,
+        backoff_base: float = 30,
+        backoff_max: float = 3600,
+        idle_timeout: float = 60,
+        lock_timeout: float = 600
+    ):
+        """
+        Args:
+            email_service: Service used to build messages and open SMTP connections
+            session_factory: Callable returning a new DB session
+            batch_size: Maximum emails claimed per round
+            poll_interval: Seconds between outbox polls when idle
+            max_attempts: Attempts before an email is marked failed
+            backoff_base: Delay in seconds after the first failure, doubled per attempt
+            backoff_max: Upper bound for the retry delay in seconds
+            idle_timeout: Seconds without traffic before the SMTP connection is closed
+            lock_timeout: Seconds after which a row stuck in "sending" is reclaimed
+        """
+        self.email_service = email_service
+        self.session_factory = session_factory
+        self.batch_size = batch_size or int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+        self.poll_interval = poll_interval or float(os.getenv("EMAIL_POLL_INTERVAL", "2"))
+        self.max_attempts = max_attempts or int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.idle_timeout = idle_timeout
+        self.lock_timeout = lock_timeout
+
+        self._connection: Optional[smtplib.SMTP] = None
+        self._last_used: Optional[datetime] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """Start the dispatcher thread. Returns False if SMTP is not configured."""
+        if not self.email_service.is_configured:
+            print("SMTP credentials not configured. Email dispatcher not started; emails stay queued.")
+            return False
+        if self._thread and self._thread.is_alive():
+            return True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="email-dispatcher", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout: float = 10):
+        """Stop the dispatcher thread and close the SMTP connection"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self._close_connection()
+
+    def wake(self):
+        """Ask the dispatcher to poll the outbox now instead of waiting for the next interval"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sent = self.run_once()
+            except Exception as e:
+                print(f"Email dispatcher error: {e}")
+                sent = 0
+            # Keep draining while full batches are coming back
+            if sent >= self.batch_size:
+                continue
+            if self._connection and self._last_used and \
+                    datetime.utcnow() - self._last_used > timedelta(seconds=self.idle_timeout):
+                self._close_connection()
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def run_once(self) -> int:
+        """Claim and send one batch of due emails. Returns the number processed."""
+        db = self.session_factory()
+        try:
+            batch = self._claim_batch(db)
+            if not batch:
+                return 0
+
+            booking_ids = set()
+            for item in batch:
+                error = self._deliver(item)
+                if error is None:
+                    item.status = "sent"
+                    item.sent_at = datetime.utcnow()
+                    item.last_error = None
+                else:
+                    item.attempts = (item.attempts or 0) + 1
+                    item.last_error = error[:1000]
+                    if item.attempts >= self.max_attempts:
+                        item.status = "failed"
+                        print(f"Giving up on email {item.id} to {item.to_email} after {item.attempts} attempts: {error}")
+                    else:
+                        item.status = "pending"
+                        item.next_attempt_at = datetime.utcnow() + timedelta(seconds=self._backoff(item.attempts))
+                item.locked_at = None
+                if item.booking_id:
+                    booking_ids.add(item.booking_id)
+                db.commit()
+
+            self._mark_confirmations(db, booking_ids)
+            return len(batch)
+        finally:
+            db.close()
+
+    def _claim_batch(self, db: Session) -> List[EmailOutbox]:
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=self.lock_timeout)
+        candidates = db.query(EmailOutbox.id).filter(
+            ((EmailOutbox.status == "pending") & (EmailOutbox.next_attempt_at <= now)) |
+            ((EmailOutbox.status == "sending") & (EmailOutbox.locked_at < stale))
+        ).order_by(EmailOutbox.next_attempt_at).limit(self.batch_size).all()
+
+        claimed = []
+        for (item_id,) in candidates:
+            result = db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id == item_id)
+                .where(
+                    (EmailOutbox.status == "pending") |
+                    ((EmailOutbox.status == "sending") & (EmailOutbox.locked_at < stale))
+                )
+                .values(status="sending", locked_at=now)
+            )
+            if result.rowcount == 1:
+                claimed.append(item_id)
+        db.commit()
+
+        if not claimed:
+            return []
+        return db.query(EmailOutbox).filter(EmailOutbox.id.in_(claimed)).all()
+
+    def _deliver(self, item: EmailOutbox) -> Optional[str]:
+        """Send one email, reconnecting once if the server dropped the connection"""
+        msg = self.email_service.build_message(item.to_email, item.subject, item.body, item.is_html)
+        for attempt in range(2):
+            try:
+                connection = self._get_connection()
+                connection.send_message(msg)
+                self._last_used = datetime.utcnow()
+                return None
+            except smtplib.SMTPServerDisconnected as e:
+                self._close_connection()
+                if attempt == 1:
+                    return f"{type(e).__name__}: {e}"
+            except smtplib.SMTPException as e:
+                # The connection is still usable; the message itself was rejected
+                return f"{type(e).__name__}: {e}"
+            except OSError as e:
+                self._close_connection()
+                if attempt == 1:
+                    return f"{type(e).__name__}: {e}"
+        return None
+
+    def _get_connection(self) -> smtplib.SMTP:
+        if self._connection is None:
+            self._connection = self.email_service.open_connection()
+        return self._connection
+
+    def _close_connection(self):
+        if self._connection is not None:
+            try:
+                self._connection.quit()
+            except Exception:
+                pass
+            self._connection = None
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+        return delay * random.uniform(0.8, 1.2)
+
+    def _mark_confirmations(self, db: Session, booking_ids):
+        """Set Booking.confirmation_sent once every queued email for a booking went out"""
+        for booking_id in booking_ids:
+            outstanding = db.query(EmailOutbox).filter(
+                EmailOutbox.booking_id == booking_id,
+                EmailOutbox.status != "sent"
+            ).count()
+            if outstanding == 0:
+                booking = db.query(Booking).filter(Booking.id == booking_id).first()
+                if booking and not booking.confirmation_sent:
+                    booking.confirmation_sent = True
+        db.commit()
+
+    def stats(self) -> Dict:
+        """Outbox counts by status, for diagnostics"""
+        db = self.session_factory()
+        try:
+            rows = db.query(EmailOutbox.status, func.count(EmailOutbox.id)).group_by(EmailOutbox.status).all()
+            return {status: count for status, count in rows}
+        finally:
+            db.close()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+One-time database setup: create tables, add missing indexes and migrate
+payload columns. Run this once per deployment before starting the workers,
+instead of every uvicorn worker doing it on import.
+
+Usage:
+    python init_db.py
+    python init_db.py --recompress   # also compress payloads written before the migration
+"""
+import argparse
+import sys
+import time
+
+from database import get_engine, init_db, recompress_payloads
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create and migrate the database schema")
+    parser.add_argument("--recompress", action="store_true",
+                        help="Compress payload columns that still hold plain JSON")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        # The URL actually in use: DATABASE_URL overrides the DB_* settings
+        print(f"Initializing database {get_engine().url.render_as_string(hide_password=True)}...")
+        init_db()
+        print(f"✅ Schema ready in {time.perf_counter() - started:.2f}s")
+        if args.recompress:
+            updated = recompress_payloads()
+            print(f"✅ Recompressed {updated} payload values")
+    except Exception as e:
+        print(f"❌ Database initialization failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for a Redis server, for exercising CACHE_BACKEND=redis.
+
+Speaks RESP2 and implements the commands utils/cache_backends.RedisBackend
+sends, plus a few for poking at it by hand:
+
+    PING, AUTH, SELECT, GET, SET (EX/PX/NX/XX), DEL, EXISTS, PTTL,
+    SCAN (MATCH/COUNT), DBSIZE, FLUSHDB, INFO, QUIT
+
+Keys expire lazily when read and on every SCAN. Everything is in memory and
+lost on exit; databases selected with SELECT are independent.
+
+Usage (from backend/):
+    python -m loadtest.redis_standin --port 6390
+    CACHE_BACKEND=redis CACHE_REDIS_URL=redis://127.0.0.1:6390/0 uvicorn app:app --workers 4
+"""
+import argparse
+import asyncio
+import fnmatch
+import time
+from typing import Dict, List, Optional, Tuple
+
+Store = Dict[bytes, Tuple[bytes, Optional[float]]]
+
+
+class RespError(Exception):
+    pass
+
+
+def encode(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, RespError):
+        return b"-%s\r\n" % str(value).encode()
+    if isinstance(value, bool):
+        return b":%d\r\n" % int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode()
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(encode(item) for item in value)
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Inline command, as typed into telnet
+        return line.split()
+    args = []
+    for _ in range(int(line[1:-2])):
+        header = await reader.readline()
+        length = int(header[1:-2])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+class RedisStandIn:
+    def __init__(self, password: Optional[str] = None):
+        self.password = password
+        self.databases: Dict[int, Store] = {}
+        self.commands = 0
+
+    def _live(self, db: Store, key: bytes) -> Optional[Tuple[bytes, Optional[float]]]:
+        entry = db.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del db[key]
+            return None
+        return entry
+
+    def execute(self, session: dict, args: List[bytes]):
+        self.commands += 1
+        name = args[0].upper().decode()
+        if name == "AUTH":
+            if self.password is None or args[-1].decode() != self.password:
+                return RespError("WRONGPASS invalid password")
+            session["authenticated"] = True
+            return "OK"
+        if self.password is not None and not session.get("authenticated"):
+            return RespError("NOAUTH Authentication required.")
+        db = self.databases.setdefault(session.get("db", 0), {})
+
+        if name == "PING":
+            return "PONG"
+        if name == "SELECT":
+            session["db"] = int(args[1])
+            return "OK"
+        if name == "GET":
+            entry = self._live(db, args[1])
+            return entry[0] if entry else None
+        if name == "SET":
+            return self._set(db, args[1], args[2], [a.upper() for a in args[3:]], args[3:])
+        if name == "DEL":
+            return sum(1 for key in args[1:] if self._live(db, key) is not None and db.pop(key, None) is not None)
+        if name == "EXISTS":
+            return sum(1 for key in args[1:] if self._live(db, key) is not None)
+        if name == "PTTL":
+            entry = self._live(db, args[1])
+            if entry is None:
+                return -2
+            return -1 if entry[1] is None else int((entry[1] - time.monotonic()) * 1000)
+        if name == "SCAN":
+            return self._scan(db, args[1:])
+        if name == "DBSIZE":
+            return len(db)
+        if name == "FLUSHDB":
+            db.clear()
+            return "OK"
+        if name == "INFO":
+            keys = sum(len(d) for d in self.databases.values())
+            return f"# Stand-in\r\ncommands_processed:{self.commands}\r\nkeys:{keys}\r\n".encode()
+        return RespError(f"ERR unknown command '{name}'")
+
+    def _set(self, db: Store, key: bytes, value: bytes, options: List[bytes], raw: List[bytes]):
+        expires_at = None
+        i = 0
+        while i < len(options):
+            option = options[i]
+            if option in (b"EX", b"PX"):
+                amount = int(raw[i + 1])
+                expires_at = time.monotonic() + (amount if option == b"EX" else amount / 1000)
+                i += 2
+                continue
+            if option not in (b"NX", b"XX"):
+                return RespError("ERR syntax error")
+            i += 1
+        exists = self._live(db, key) is not None
+        if (b"NX" in options and exists) or (b"XX" in options and not exists):
+            return None
+        db[key] = (value, expires_at)
+        return "OK"
+
+    def _scan(self, db: Store, args: List[bytes]):
+        # One pass returns everything: cursor 0 means the scan is complete
+        pattern = None
+        upper = [a.upper() for a in args]
+        if b"MATCH" in upper:
+            pattern = args[upper.index(b"MATCH") + 1].decode()
+        keys = [key for key in list(db) if self._live(db, key) is not None
+                and (pattern is None or fnmatch.fnmatchcase(key.decode(errors="replace"), pattern))]
+        return [b"0", keys]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        session: dict = {}
+        try:
+            while True:
+                args = await read_command(reader)
+                if not args:
+                    break
+                if args[0].upper() == b"QUIT":
+                    writer.write(encode("OK"))
+                    break
+                try:
+                    reply = self.execute(session, args)
+                except (IndexError, ValueError):
+                    reply = RespError("ERR wrong number or type of arguments")
+                writer.write(encode(reply))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host: str, port: int, password: Optional[str]):
+    standin = RedisStandIn(password)
+    server = await asyncio.start_server(standin.handle, host, port)
+    print(f"Redis stand-in listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--password", default=None, help="Require AUTH with this password")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.password))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Load test for the Flight Booking API.
+
+Drives /api/search-flights, /api/calendar-prices and the booking flow
+(create-booking -> capture-payment -> GET booking) from concurrent clients and
+reports throughput and p50/p95/p99 latency per route.
+
+With --spawn it runs everything offline: it starts the Amadeus/PayPal stand-in
+(loadtest/standin.py), creates a throwaway SQLite database with init_db.py,
+and starts the API with uvicorn pointed at both. Without --spawn it targets an
+already running API (--target), which must itself be configured to use the
+stand-in unless you mean to load the sandbox APIs.
+
+Usage (from backend/):
+    python -m loadtest.run --spawn
+    python -m loadtest.run --spawn --concurrency 32 --duration 60 --workers 4 --upstream-latency-ms 300
+    python -m loadtest.run --target http://127.0.0.1:8000 --mix search=1 --json results.json
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUTES = [("LHR", "JFK"), ("LGW", "DXB"), ("MAN", "CDG"), ("LHR", "AMS"), ("EWR", "LHR"), ("JFK", "CDG")]
+SCENARIOS = ("search", "calendar", "booking")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    """Thread-safe latency samples per route, ignoring anything before the warm-up ends"""
+
+    def __init__(self, measure_from: float):
+        self.measure_from = measure_from
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, route: str, started: float, ok: bool):
+        if started < self.measure_from:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.samples[route].append(elapsed_ms)
+            if not ok:
+                self.errors[route] += 1
+
+    def summary(self, seconds: float) -> Dict[str, Dict]:
+        results = {}
+        for route, values in sorted(self.samples.items()):
+            values = sorted(values)
+            results[route] = {
+                "requests": len(values),
+                "errors": self.errors.get(route, 0),
+                "throughput_rps": round(len(values) / seconds, 2),
+                "p50_ms": round(percentile(values, 50), 1),
+                "p95_ms": round(percentile(values, 95), 1),
+                "p99_ms": round(percentile(values, 99), 1),
+                "max_ms": round(values[-1], 1),
+            }
+        return results
+
+
+class Client:
+    """One simulated user with its own keep-alive session"""
+
+    def __init__(self, base_url: str, recorder: Recorder, rng: random.Random, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.rng = rng
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def call(self, route: str, method: str, path: str, **kwargs) -> Optional[requests.Response]:
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        except requests.exceptions.RequestException:
+            self.recorder.record(route, started, ok=False)
+            return None
+        self.recorder.record(route, started, ok=response.status_code < 400)
+        return response
+
+    def search_params(self) -> Dict:
+        origin, destination = self.rng.choice(ROUTES)
+        departure = date.today() + timedelta(days=self.rng.randrange(14, 180))
+        params = {"origin": origin, "destination": destination,
+                  "departure_date": departure.isoformat(), "adults": self.rng.choice([1, 1, 2])}
+        if self.rng.random() < 0.4:
+            params["return_date"] = (departure + timedelta(days=self.rng.randrange(3, 21))).isoformat()
+        return params
+
+    def search(self):
+        self.call("POST /api/search-flights", "POST", "/api/search-flights", json=self.search_params())
+
+    def calendar(self):
+        self.call("POST /api/calendar-prices", "POST", "/api/calendar-prices", json=self.search_params())
+
+    def booking(self):
+        params = self.search_params()
+        booking_request = {
+            "flight_id": str(self.rng.randrange(1, 250)),
+            "customer_email": f"loadtest{self.rng.randrange(10000)}@example.com",
+            "customer_name": "Load Test",
+            "origin": params["origin"],
+            "destination": params["destination"],
+            "departure_date": params["departure_date"],
+            "departure_time": f"{params['departure_date']}T09:30",
+            "arrival_time": f"{params['departure_date']}T17:05",
+            "airline": "BA",
+            "cabin_class": "ECONOMY",
+            "duration": "7h35m",
+            "stops": 0,
+            "total_price": round(self.rng.uniform(80, 1400), 2),
+            "currency": "GBP",
+            "passenger_details": {"passengers": [{"firstName": "LOAD", "lastName": "TEST"}]},
+        }
+        response = self.call("POST /api/create-booking", "POST", "/api/create-booking", json=booking_request)
+        if response is None or response.status_code != 200:
+            return
+        created = response.json()
+        reference = created["booking_reference"]
+        self.call("POST /api/capture-payment", "POST", "/api/capture-payment",
+                  json={"order_id": created["paypal_order_id"], "booking_reference": reference})
+        self.call("GET /api/booking/{ref}", "GET", f"/api/booking/{reference}")
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r} (choose from {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def run_load(base_url: str, mix: Dict[str, float], concurrency: int, duration: float,
+             warmup: float, timeout: float, seed: int) -> Tuple[Dict[str, Dict], float]:
+    start = time.perf_counter()
+    recorder = Recorder(measure_from=start + warmup)
+    deadline = start + warmup + duration
+    names, weights = zip(*mix.items())
+
+    def user(n: int):
+        client = Client(base_url, recorder, random.Random(seed + n), timeout)
+        while time.perf_counter() < deadline:
+            getattr(client, client.rng.choices(names, weights)[0])()
+
+    threads = [threading.Thread(target=user, args=(n,), daemon=True) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Requests still in flight at the deadline are counted, so measure to the last one
+    measured = time.perf_counter() - (start + warmup)
+    return recorder.summary(measured), measured
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=2).status_code == 200:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout:.0f}s")
+
+
+@contextmanager
+def spawned_stack(args):
+    """Start the stand-in and the API on free ports; yield the API base URL"""
+    workdir = tempfile.mkdtemp(prefix="flightbooking_loadtest_")
+    standin_port, api_port = free_port(), free_port()
+    standin_url = f"http://127.0.0.1:{standin_port}"
+    env = dict(
+        os.environ,
+        AMADEUS_BASE_URL=standin_url,
+        PAYPAL_BASE_URL=standin_url,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'loadtest.db')}",
+        API_LOG_DIR=os.path.join(workdir, "api_logs"),
+        TRACE_EXPORT_DIR=os.path.join(workdir, "traces"),
+        RATE_LIMIT_DB=os.path.join(workdir, "ratelimit.sqlite"),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, "metrics"),
+        SMTP_USER="",
+        SMTP_PASSWORD="",
+    )
+    os.makedirs(env["PROMETHEUS_MULTIPROC_DIR"])
+    log = open(os.path.join(workdir, "servers.log"), "w")
+    processes = []
+    try:
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "loadtest.standin", "--port", str(standin_port),
+             "--latency-ms", str(args.upstream_latency_ms), "--jitter-ms", str(args.upstream_jitter_ms),
+             "--error-rate", str(args.upstream_error_rate), "--offers", str(args.offers)],
+            cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+        ))
+        wait_for(f"{standin_url}/_stats")
+        subprocess.run([sys.executable, "init_db.py"], cwd=BACKEND_DIR, env=env, stdout=log,
+                       stderr=subprocess.STDOUT, check=True)
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(api_port),
+             "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+            cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+        ))
+        api_url = f"http://127.0.0.1:{api_port}"
+        wait_for(f"{api_url}/health")
+        print(f"Stand-in on {standin_url}, API on {api_url} ({args.workers} worker(s)); logs in {workdir}")
+        yield api_url
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in reversed(processes):
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        log.close()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_report(results: Dict[str, Dict], seconds: float, concurrency: int):
+    print()
+    print(f"Measured {seconds:.1f}s with {concurrency} concurrent clients")
+    print()
+    header = f"{'route':<28} | {'reqs':>6} | {'errors':>6} | {'req/s':>7} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'max ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for route, r in results.items():
+        print(f"{route:<28} | {r['requests']:>6} | {r['errors']:>6} | {r['throughput_rps']:>7.2f} | "
+              f"{r['p50_ms']:>8.1f} | {r['p95_ms']:>8.1f} | {r['p99_ms']:>8.1f} | {r['max_ms']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="API base URL (ignored with --spawn)")
+    parser.add_argument("--spawn", action="store_true", help="Start the stand-in and the API locally")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("search=6,calendar=1,booking=3"),
+                        help="Scenario weights (default search=6,calendar=1,booking=3)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent simulated clients")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds of load before measuring")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    spawn = parser.add_argument_group("--spawn options")
+    spawn.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    spawn.add_argument("--upstream-latency-ms", type=float, default=150)
+    spawn.add_argument("--upstream-jitter-ms", type=float, default=50)
+    spawn.add_argument("--upstream-error-rate", type=float, default=0.0)
+    spawn.add_argument("--offers", type=int, default=50, help="Offers per upstream search response")
+    spawn.add_argument("--keep", action="store_true", help="Keep the temporary database and logs")
+    args = parser.parse_args()
+
+    def load(base_url):
+        return run_load(base_url, args.mix, args.concurrency, args.duration, args.warmup, args.timeout, args.seed)
+
+    if args.spawn:
+        with spawned_stack(args) as base_url:
+            results, seconds = load(base_url)
+    else:
+        results, seconds = load(args.target)
+
+    print_report(results, seconds, args.concurrency)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"concurrency": args.concurrency, "seconds": round(seconds, 2), "mix": args.mix,
+                       "routes": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
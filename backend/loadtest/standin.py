@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the Amadeus and PayPal APIs.
+
+Serves the endpoints AmadeusClient and PayPalClient call, so the backend can
+be exercised end to end without sandbox credentials or network access:
+
+    Amadeus  POST /v1/security/oauth2/token
+             POST /v2/shopping/flight-offers
+             POST /v1/shopping/flight-offers/pricing
+             POST /v1/shopping/seatmaps, /v1/booking/seatmaps
+             GET  /v1/reference-data/locations
+    PayPal   POST /v1/oauth2/token
+             POST /v2/checkout/orders
+             POST /v2/checkout/orders/{id}/capture
+             GET  /v2/checkout/orders/{id}
+
+Point the backend at it with AMADEUS_BASE_URL and PAYPAL_BASE_URL. Flight
+offers come from benchmarks/offer_generator.py, seeded by the search so
+repeating a search returns the same offers.
+
+Usage (from backend/):
+    python -m loadtest.standin --port 8081
+    python -m loadtest.standin --latency-ms 250 --jitter-ms 100 --error-rate 0.02 --offers 120
+    python -m loadtest.standin --endpoint-latency flight-offers=900 --endpoint-latency token=40
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from benchmarks.offer_generator import CARRIERS, generate_offers
+
+AIRPORTS = [
+    ("LHR", "HEATHROW", "LONDON", "UNITED KINGDOM"),
+    ("LGW", "GATWICK", "LONDON", "UNITED KINGDOM"),
+    ("MAN", "MANCHESTER AIRPORT", "MANCHESTER", "UNITED KINGDOM"),
+    ("JFK", "JOHN F KENNEDY INTL", "NEW YORK", "UNITED STATES OF AMERICA"),
+    ("EWR", "NEWARK LIBERTY INTL", "NEW YORK", "UNITED STATES OF AMERICA"),
+    ("CDG", "CHARLES DE GAULLE", "PARIS", "FRANCE"),
+    ("DXB", "DUBAI INTERNATIONAL", "DUBAI", "UNITED ARAB EMIRATES"),
+    ("AMS", "SCHIPHOL", "AMSTERDAM", "NETHERLANDS"),
+]
+
+
+@dataclass
+class StandInConfig:
+    """Behaviour of the stand-in; latencies are per response, in milliseconds"""
+    latency_ms: float = 150
+    jitter_ms: float = 50
+    error_rate: float = 0.0
+    offers: int = 50
+    endpoint_latency_ms: Dict[str, float] = field(default_factory=dict)
+    seed: int = 7
+
+
+def create_standin_app(config: Optional[StandInConfig] = None) -> FastAPI:
+    """Build the stand-in app; counters are served at GET /_stats"""
+    config = config or StandInConfig()
+    app = FastAPI(title="Amadeus/PayPal stand-in")
+    app.state.config = config
+    app.state.stats = {}
+    orders: Dict[str, Dict] = {}
+    rng = random.Random(config.seed)
+
+    async def respond(endpoint: str, body: Dict, status_code: int = 200) -> JSONResponse:
+        """Apply the configured latency and error rate, then return body"""
+        app.state.stats[endpoint] = app.state.stats.get(endpoint, 0) + 1
+        latency = config.endpoint_latency_ms.get(endpoint, config.latency_ms)
+        delay = max(0.0, latency + rng.uniform(-config.jitter_ms, config.jitter_ms)) / 1000
+        if delay:
+            await asyncio.sleep(delay)
+        if config.error_rate and rng.random() < config.error_rate:
+            app.state.stats["errors"] = app.state.stats.get("errors", 0) + 1
+            return JSONResponse(status_code=500, content={"errors": [{
+                "status": 500, "code": 141, "title": "SYSTEM ERROR HAS OCCURRED", "detail": "Injected by stand-in"
+            }]})
+        return JSONResponse(status_code=status_code, content=body)
+
+    @app.post("/v1/security/oauth2/token")
+    async def amadeus_token():
+        return await respond("token", {
+            "type": "amadeusOAuth2Token", "token_type": "Bearer", "state": "approved",
+            "access_token": uuid.uuid4().hex + uuid.uuid4().hex, "expires_in": 1799,
+        })
+
+    @app.post("/v2/shopping/flight-offers")
+    async def flight_offers(request: Request):
+        body = await request.json()
+        legs = [
+            (leg.get("originLocationCode", "LHR"), leg.get("destinationLocationCode", "JFK"),
+             leg.get("departureDateTimeRange", {}).get("date", datetime.now().strftime("%Y-%m-%d")))
+            for leg in body.get("originDestinations", [])
+        ] or [("LHR", "JFK", datetime.now().strftime("%Y-%m-%d"))]
+        criteria = body.get("searchCriteria", {})
+        restrictions = criteria.get("flightFilters", {}).get("cabinRestrictions", [])
+        cabin = restrictions[0].get("cabin") if restrictions else None
+        count = min(config.offers, criteria.get("maxFlightOffers", config.offers))
+
+        # Same search, same offers: seed from the search key
+        seed = int(hashlib.md5(f"{legs}{cabin}".encode()).hexdigest()[:8], 16)
+        offers = generate_offers(
+            count, currency=body.get("currencyCode", "GBP"), cabin=cabin,
+            travelers=max(1, len(body.get("travelers", []))), seed=seed, legs=legs
+        )
+        return await respond("flight-offers", {"meta": {"count": len(offers)}, "data": offers,
+                                               "dictionaries": {"carriers": {c: c for c in CARRIERS}}})
+
+    @app.post("/v1/shopping/flight-offers/pricing")
+    async def pricing(request: Request):
+        body = await request.json()
+        flight_offers = body.get("data", {}).get("flightOffers", [])
+        return await respond("pricing", {"data": {"type": "flight-offers-pricing", "flightOffers": flight_offers}})
+
+    async def seatmaps(request: Request):
+        body = await request.json()
+        offers = body.get("data", [{}])[0].get("flightOffers", [])
+        maps = []
+        for offer in offers:
+            for itinerary in offer.get("itineraries", []):
+                for segment in itinerary.get("segments", []):
+                    seats = [
+                        {"number": f"{row}{letter}", "cabin": "ECONOMY",
+                         "travelerPricing": [{"travelerId": "1", "seatAvailabilityStatus":
+                                              "AVAILABLE" if rng.random() < 0.6 else "OCCUPIED"}]}
+                        for row in range(10, 40) for letter in "ABCDEF"
+                    ]
+                    maps.append({"type": "seatmap", "segmentId": segment.get("id"),
+                                 "carrierCode": segment.get("carrierCode"),
+                                 "decks": [{"deckType": "MAIN", "seats": seats}]})
+        return await respond("seatmaps", {"data": maps})
+
+    app.post("/v1/shopping/seatmaps")(seatmaps)
+    app.post("/v1/booking/seatmaps")(seatmaps)
+
+    @app.get("/v1/reference-data/locations")
+    async def locations(keyword: str = ""):
+        keyword = keyword.upper()
+        matches = [a for a in AIRPORTS if keyword in a[0] or keyword in a[1] or keyword in a[2]]
+        return await respond("locations", {"data": [
+            {"type": "location", "subType": "AIRPORT", "iataCode": code, "name": name,
+             "address": {"cityName": city, "countryName": country}}
+            for code, name, city, country in matches
+        ]})
+
+    @app.post("/v1/oauth2/token")
+    async def paypal_token():
+        return await respond("paypal-token", {
+            "scope": "https://uri.paypal.com/services/payments/payment", "token_type": "Bearer",
+            "access_token": "A21AA" + uuid.uuid4().hex, "app_id": "APP-STANDIN", "expires_in": 32400,
+        })
+
+    @app.post("/v2/checkout/orders")
+    async def create_order(request: Request):
+        body = await request.json()
+        order_id = uuid.uuid4().hex[:17].upper()
+        order = {
+            "id": order_id,
+            "status": "CREATED",
+            "intent": body.get("intent", "CAPTURE"),
+            "purchase_units": body.get("purchase_units", []),
+            "create_time": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "links": [
+                {"href": f"{request.base_url}v2/checkout/orders/{order_id}", "rel": "self", "method": "GET"},
+                {"href": f"https://www.sandbox.paypal.com/checkoutnow?token={order_id}", "rel": "approve", "method": "GET"},
+                {"href": f"{request.base_url}v2/checkout/orders/{order_id}/capture", "rel": "capture", "method": "POST"},
+            ],
+        }
+        orders[order_id] = order
+        return await respond("orders", order, status_code=201)
+
+    @app.post("/v2/checkout/orders/{order_id}/capture")
+    async def capture_order(order_id: str):
+        order = orders.get(order_id)
+        if order is None:
+            return await respond("capture", {"name": "RESOURCE_NOT_FOUND", "message": "Order not found"}, 404)
+        order["status"] = "COMPLETED"
+        for unit in order["purchase_units"]:
+            unit["payments"] = {"captures": [{
+                "id": uuid.uuid4().hex[:17].upper(), "status": "COMPLETED", "amount": unit.get("amount"),
+                "final_capture": True, "create_time": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }]}
+        order["payer"] = {"name": {"given_name": "Load", "surname": "Test"}, "email_address": "buyer@example.com"}
+        return await respond("capture", order, status_code=201)
+
+    @app.get("/v2/checkout/orders/{order_id}")
+    async def get_order(order_id: str):
+        order = orders.get(order_id)
+        if order is None:
+            return await respond("order-details", {"name": "RESOURCE_NOT_FOUND", "message": "Order not found"}, 404)
+        return await respond("order-details", order)
+
+    @app.get("/_stats")
+    def stats():
+        return {"uptime_seconds": round(time.monotonic() - started, 1), "requests": app.state.stats}
+
+    started = time.monotonic()
+    return app
+
+
+def parse_endpoint_latency(values: List[str]) -> Dict[str, float]:
+    latencies = {}
+    for value in values:
+        name, _, ms = value.partition("=")
+        latencies[name] = float(ms)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=150, help="Base latency of every response")
+    parser.add_argument("--jitter-ms", type=float, default=50, help="Uniform +/- jitter added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of responses that are HTTP 500")
+    parser.add_argument("--offers", type=int, default=50, help="Flight offers per search response")
+    parser.add_argument("--endpoint-latency", action="append", default=[], metavar="NAME=MS",
+                        help="Override the latency of one endpoint (token, flight-offers, pricing, seatmaps, "
+                             "locations, paypal-token, orders, capture, order-details)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    import uvicorn
+    config = StandInConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        offers=args.offers,
+        endpoint_latency_ms=parse_endpoint_latency(args.endpoint_latency),
+        seed=args.seed,
+    )
+    uvicorn.run(create_standin_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -58,6 +58,15 @@ REM Verify we're using the venv Python
 echo Verifying Python location...
 python -c "import sys; print('Python:', sys.executable)" 2>nul
 
+REM Shared directory so /metrics aggregates all uvicorn workers (cleared on each start)
+if "%PROMETHEUS_MULTIPROC_DIR%"=="" set PROMETHEUS_MULTIPROC_DIR=%TEMP%\flightbooking_metrics
+if exist "%PROMETHEUS_MULTIPROC_DIR%" rmdir /s /q "%PROMETHEUS_MULTIPROC_DIR%"
+mkdir "%PROMETHEUS_MULTIPROC_DIR%"
+
+REM Create/migrate the schema once, before the server starts
+python init_db.py
+if errorlevel 1 echo Database initialization failed; starting anyway
+
 REM Run the application in production mode (no reload)
 echo.
 echo Starting server in production mode...
@@ -23,6 +23,13 @@ if [ $? -ne 0 ]; then
     pip install uvicorn[standard]
 fi
 
+# Shared directory so /metrics aggregates all uvicorn workers (cleared on each start)
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/flightbooking_metrics}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+# Create/migrate the schema once, before the workers start
+python init_db.py || echo "Database initialization failed; starting anyway"
+
 # Run the application in production mode (no reload, multiple workers)
 echo "Starting server in production mode..."
 echo "Backend will be available at:"
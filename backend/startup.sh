@@ -11,6 +11,13 @@ fi
 export PYTHONUNBUFFERED=1
 export PYTHONPATH="${PYTHONPATH}:$(pwd)"
 
+# Shared directory so /metrics aggregates all uvicorn workers (cleared on each start)
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/flightbooking_metrics}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+# Create/migrate the schema once, before the workers start
+python init_db.py || echo "Database initialization failed; starting anyway"
+
 # Start the FastAPI application with uvicorn
 # Azure App Service will set PORT environment variable
 exec python -m uvicorn app:app --host 0.0.0.0 --port ${PORT:-8000} --workers 2
@@ -1,2 +1,2 @@
-# Utils package
-
+# Utils package
+
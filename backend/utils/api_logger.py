@@ -1,98 +1,447 @@
-"""API Logger utility to log all API calls"""
-import os
-import json
-from datetime import datetime
-from typing import Dict, Optional
-import requests
-
-
-class APILogger:
-    """Log API calls to a folder"""
-    
-    def __init__(self, log_folder: str = "api_logs"):
-        """
-        Initialize API logger
-        
-        Args:
-            log_folder: Folder name to store logs (will be created if doesn't exist)
-        """
-        self.log_folder = log_folder
-        self._ensure_log_folder()
-    
-    def _ensure_log_folder(self):
-        """Create log folder if it doesn't exist"""
-        if not os.path.exists(self.log_folder):
-            os.makedirs(self.log_folder)
-    
-    def _get_log_filename(self) -> str:
-        """Generate log filename with timestamp"""
-        timestamp = datetime.now().strftime("%Y%m%d")
-        return os.path.join(self.log_folder, f"api_calls_{timestamp}.log")
-    
-    def log_request(
-        self,
-        method: str,
-        url: str,
-        headers: Optional[Dict] = None,
-        params: Optional[Dict] = None,
-        data: Optional[Dict] = None,
-        json_data: Optional[Dict] = None,
-        response: Optional[requests.Response] = None,
-        error: Optional[str] = None
-    ):
-        """
-        Log an API request and response
-        
-        Args:
-            method: HTTP method (GET, POST, etc.)
-            url: Request URL
-            headers: Request headers (will filter sensitive data)
-            params: Query parameters
-            data: Request body data
-            json_data: Request JSON data
-            response: Response object
-            error: Error message if request failed
-        """
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "method": method,
-            "url": url,
-            "request": {
-                "headers": self._sanitize_headers(headers or {}),
-                "params": params,
-                "data": data,
-                "json": json_data
-            },
-            "response": None,
-            "error": error
-        }
-        
-        if response:
-            try:
-                log_entry["response"] = {
-                    "status_code": response.status_code,
-                    "headers": dict(response.headers),
-                    "body": response.text[:5000] if response.text else None  # Limit body size
-                }
-            except Exception as e:
-                log_entry["response"] = {"error": str(e)}
-        
-        # Write to log file
-        log_file = self._get_log_filename()
-        try:
-            with open(log_file, "a", encoding="utf-8") as f:
-                f.write(json.dumps(log_entry, indent=2) + "\n" + "="*80 + "\n")
-        except Exception as e:
-            print(f"Error writing to log file: {e}")
-    
-    def _sanitize_headers(self, headers: Dict) -> Dict:
-        """Remove sensitive information from headers"""
-        sanitized = headers.copy()
-        sensitive_keys = ['authorization', 'api-key', 'api_secret', 'client_secret', 'token']
-        
-        for key in sanitized:
-            if any(sensitive in key.lower() for sensitive in sensitive_keys):
-                sanitized[key] = "***REDACTED***"
-        
-        return sanitized
-
+"""API Logger utility to log all API calls"""
+import atexit
+import glob
+import gzip
+import json
+import os
+import queue
+import random
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import requests
+
+REDACTED = "***REDACTED***"
+# A JSON object key and the separator after it, and a scalar value (possibly cut short)
+_JSON_KEY = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:\s*')
+_JSON_SCALAR = re.compile(r'"(?:[^"\\]|\\.)*"?|[^,}\]\s]*')
+
+
+def _compress(source: str, base: str):
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    with open(source, "rb") as src, gzip.open(f"{base}_{stamp}.jsonl.gz", "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def _modified(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+def _prune_backups(pattern: str, backup_count: int):
+    backups = sorted(glob.glob(pattern), key=_modified)
+    for old in backups[:-backup_count] if backup_count else backups:
+        try:
+            os.remove(old)
+        except FileNotFoundError:
+            pass  # pruned by another worker
+
+
+def rotate_file(active: str, backup_count: int, family: Optional[str] = None):
+    """
+    Compress a log file to <name>_<timestamp>.jsonl.gz next to it and keep only
+    the newest backup_count compressed files. Used for API logs and trace files.
+
+    family is the path prefix every process's files share (e.g. api_logs/api_calls_
+    for api_calls_<pid>.jsonl), so the limit holds for the folder however often
+    workers restart; without it only this file's own backups are counted.
+    """
+    base = active[:-len(".jsonl")] if active.endswith(".jsonl") else active
+    if os.path.exists(active) and os.path.getsize(active) > 0:
+        _compress(active, base)
+    _prune_backups(f"{glob.escape(family or base + '_')}*.jsonl.gz", backup_count)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect_orphans(family: str, backup_count: int):
+    """
+    Compress the active <family><pid>.jsonl files of processes that are gone
+    (previous runs, recycled workers), then prune the family's backups. Each
+    file is renamed before compressing, so of several starting workers only one
+    takes it. POSIX only: elsewhere a signal cannot probe a process.
+    """
+    if os.name != "posix":
+        return
+    for path in glob.glob(f"{glob.escape(family)}*.jsonl"):
+        pid = path[len(family):-len(".jsonl")]
+        if not pid.isdigit() or int(pid) == os.getpid() or _process_alive(int(pid)):
+            continue
+        claimed = f"{path}.{os.getpid()}.orphan"
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            continue
+        if os.path.getsize(claimed) > 0:
+            _compress(claimed, path[:-len(".jsonl")])
+        else:
+            os.remove(claimed)
+    _prune_backups(f"{glob.escape(family)}*.jsonl.gz", backup_count)
+
+
+class APILogger:
+    """
+    Log API calls to a folder as JSON lines.
+
+    log_request() only snapshots the call and puts it on an in-memory queue; a
+    background thread serializes records and appends them to the log file in
+    batches, so logging adds no I/O to the request path. Each process writes
+    its own file, which is rotated by size and by day and gzip-compressed.
+    backup_count applies to the folder, across every process's files; when the
+    writer starts it compresses the files that processes no longer running left.
+
+    Only a snapshot of the response (status, headers, truncated body) is
+    queued, never the Response itself. Bodies are never logged for the token
+    endpoints, and credentials and personal data are redacted from the JSON
+    bodies that are logged.
+    """
+
+    SENSITIVE_KEYS = ['authorization', 'api-key', 'api_secret', 'client_secret', 'token', 'password', 'cookie']
+    # JSON body keys whose values are redacted, compared lowercased without underscores:
+    # credentials, and the payer / traveler details in PayPal and Amadeus bodies
+    SENSITIVE_BODY_KEYS = {
+        'accesstoken', 'refreshtoken', 'idtoken', 'token', 'clientsecret', 'password',
+        'emailaddress', 'givenname', 'surname', 'firstname', 'lastname', 'phone', 'phones', 'phonenumber',
+        'address', 'documents', 'dateofbirth', 'birthdate', 'payer', 'paymentsource'
+    }
+    # Endpoints whose bodies are never logged: their responses are access tokens
+    BODYLESS_ENDPOINTS = {'token'}
+
+    def __init__(
+        self,
+        log_folder: str = "api_logs",
+        max_bytes: int = 50 * 1024 * 1024,
+        backup_count: int = 14,
+        body_sample_rate: float = 1.0,
+        max_body_chars: int = 5000,
+        queue_size: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 1.0
+    ):
+        """
+        Initialize API logger
+
+        Args:
+            log_folder: Folder name to store logs (will be created if doesn't exist)
+            max_bytes: Rotate the active file once it grows past this size
+            backup_count: Compressed rotated files to keep, across all processes
+            body_sample_rate: Fraction of successful calls whose request/response bodies
+                are logged (failed calls always include them)
+            max_body_chars: Bodies are truncated to this length
+            queue_size: Records buffered in memory; further records are dropped and counted
+            batch_size: Maximum records written per batch
+            flush_interval: Seconds the writer waits to fill a batch
+        """
+        self.log_folder = log_folder
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.body_sample_rate = body_sample_rate
+        self.max_body_chars = max_body_chars
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._file = None
+        self._file_day = None
+        self._orphans_collected = False
+        self._ensure_log_folder()
+
+    def _ensure_log_folder(self):
+        """Create log folder if it doesn't exist"""
+        if not os.path.exists(self.log_folder):
+            os.makedirs(self.log_folder, exist_ok=True)
+
+    def _family(self) -> str:
+        """Path prefix of every process's log files"""
+        return os.path.join(self.log_folder, "api_calls_")
+
+    def _get_log_filename(self) -> str:
+        """Active log file for this process"""
+        return f"{self._family()}{os.getpid()}.jsonl"
+
+    def log_request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+        data: Optional[Dict] = None,
+        json_data: Optional[Dict] = None,
+        response: Optional[requests.Response] = None,
+        error: Optional[str] = None,
+        duration_ms: Optional[float] = None,
+        service: Optional[str] = None,
+        endpoint: Optional[str] = None,
+        streamed: bool = False
+    ):
+        """
+        Log an API request and response
+
+        Args:
+            method: HTTP method (GET, POST, etc.)
+            url: Request URL
+            headers: Request headers (will filter sensitive data)
+            params: Query parameters
+            data: Request body data
+            json_data: Request JSON data
+            response: Response object
+            error: Error message if request failed
+            duration_ms: Wall time of the call
+            service: Upstream name, e.g. "amadeus"
+            endpoint: Logical endpoint name, e.g. "flight-offers"
+            streamed: The caller reads the response body as it arrives, so it is never logged
+        """
+        failed = error is not None or response is None or response.status_code >= 400
+        include_bodies = endpoint not in self.BODYLESS_ENDPOINTS and \
+            (failed or random.random() < self.body_sample_rate)
+        response_snapshot = None
+        if response is not None:
+            response_snapshot = (
+                response.status_code,
+                dict(response.headers),
+                self._body_text(response) if include_bodies and not streamed else None
+            )
+        snapshot = (
+            datetime.now().isoformat(),
+            method,
+            url,
+            dict(headers) if headers else {},
+            params,
+            data if include_bodies else None,
+            json_data if include_bodies else None,
+            response_snapshot,
+            error,
+            duration_ms,
+            service,
+            endpoint
+        )
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(snapshot)
+        except queue.Full:
+            self.dropped += 1
+
+    def _body_text(self, response: requests.Response) -> Optional[str]:
+        """The start of an already downloaded body, decoded without charset detection"""
+        try:
+            content = response.content[:self.max_body_chars]
+            return content.decode(response.encoding or "utf-8", errors="replace") if content else None
+        except Exception as e:
+            return f"<unreadable body: {e}>"
+
+    def flush(self, timeout: float = 5):
+        """Wait until queued records have been written"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self):
+        """Flush queued records and stop the writer thread"""
+        if self._writer and self._writer.is_alive():
+            self.flush()
+            self._stop.set()
+            self._writer.join(5)
+        self._writer = None
+        self._close_file()
+
+    def _ensure_writer(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._stop.clear()
+                self._writer = threading.Thread(target=self._run, name="api-logger", daemon=True)
+                self._writer.start()
+
+    def _run(self):
+        if not self._orphans_collected:
+            self._orphans_collected = True
+            try:
+                collect_orphans(self._family(), self.backup_count)
+            except OSError as e:
+                print(f"Error compressing old log files: {e}")
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"Error writing to log file: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _next_batch(self) -> List[tuple]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, batch: List[tuple]):
+        lines = []
+        for snapshot in batch:
+            try:
+                lines.append(json.dumps(self._build_entry(*snapshot), separators=(",", ":"), default=str))
+            except Exception as e:
+                lines.append(json.dumps({"timestamp": snapshot[0], "error": f"unserializable log entry: {e}"}))
+        log_file = self._open_file()
+        log_file.write("\n".join(lines) + "\n")
+        log_file.flush()
+        if log_file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _build_entry(self, timestamp, method, url, headers, params, data, json_data, response,
+                     error, duration_ms, service, endpoint) -> Dict:
+        log_entry = {
+            "timestamp": timestamp,
+            "service": service,
+            "endpoint": endpoint,
+            "method": method,
+            "url": url,
+            "duration_ms": round(duration_ms, 1) if duration_ms is not None else None,
+            "request": {
+                "headers": self._sanitize_headers(headers),
+                "params": params,
+                "data": self._sanitize_headers(data) if isinstance(data, dict) else data,
+                "json": self._redact(json_data)
+            },
+            "response": None,
+            "error": error
+        }
+
+        if response is not None:
+            status_code, response_headers, body = response
+            log_entry["response"] = {
+                "status_code": status_code,
+                "headers": self._sanitize_headers(response_headers),
+                "body": self._redact_body(body)
+            }
+        return log_entry
+
+    def _is_sensitive_body_key(self, key: str) -> bool:
+        return key.lower().replace("_", "") in self.SENSITIVE_BODY_KEYS
+
+    def _redact(self, value: Any) -> Any:
+        """Copy of a decoded JSON value with sensitive keys' values replaced"""
+        if isinstance(value, dict):
+            return {k: REDACTED if self._is_sensitive_body_key(str(k)) else self._redact(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._redact(v) for v in value]
+        return value
+
+    def _redact_body(self, body: Optional[str]) -> Optional[str]:
+        """Redact a logged body: decoded if it is whole JSON, else scanned as (truncated) text"""
+        if body is None:
+            return None
+        try:
+            parsed = json.loads(body)
+        except ValueError:
+            return self._redact_text(body)
+        return json.dumps(self._redact(parsed), separators=(",", ":"), ensure_ascii=False)
+
+    def _redact_text(self, text: str) -> str:
+        """
+        Redact scalar values of sensitive keys in JSON that does not parse (usually
+        cut at max_body_chars). At a sensitive key holding an object or array, the
+        body is cut off, since its end may not even be in the text.
+        """
+        parts = []
+        pos = 0
+        for match in _JSON_KEY.finditer(text):
+            if match.start() < pos or not self._is_sensitive_body_key(match.group(1)):
+                continue
+            value_start = match.end()
+            parts.append(text[pos:value_start])
+            if text[value_start:value_start + 1] in ("{", "["):
+                parts.append(f'"{REDACTED}" ...[cut at sensitive field]')
+                return "".join(parts)
+            parts.append(f'"{REDACTED}"')
+            pos = _JSON_SCALAR.match(text, value_start).end()
+        parts.append(text[pos:])
+        return "".join(parts)
+
+    def _open_file(self):
+        today = datetime.now().strftime("%Y%m%d")
+        if self._file is not None and self._file_day != today:
+            self._rotate()
+        if self._file is None:
+            self._file = open(self._get_log_filename(), "a", encoding="utf-8")
+            self._file_day = today
+        return self._file
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _rotate(self):
+        """Compress the active file to api_calls_<pid>_<timestamp>.jsonl.gz and prune old ones"""
+        self._close_file()
+        rotate_file(self._get_log_filename(), self.backup_count, family=self._family())
+
+    def _sanitize_headers(self, headers: Dict) -> Dict:
+        """Remove sensitive information from headers"""
+        sanitized = headers.copy()
+
+        for key in sanitized:
+            if any(sensitive in key.lower() for sensitive in self.SENSITIVE_KEYS):
+                sanitized[key] = "***REDACTED***"
+
+        return sanitized
+
+
+_api_logger: Optional[APILogger] = None
+_api_logger_lock = threading.Lock()
+
+
+def get_api_logger() -> Optional[APILogger]:
+    """
+    Process-wide logger configured from the environment, or None when
+    API_LOG_ENABLED is false.
+
+    API_LOG_DIR, API_LOG_MAX_MB, API_LOG_BACKUPS and API_LOG_BODY_SAMPLE_RATE
+    tune the folder, rotation size, retained files and body sampling.
+    """
+    global _api_logger
+    if os.getenv("API_LOG_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    if _api_logger is None:
+        with _api_logger_lock:
+            if _api_logger is None:
+                _api_logger = APILogger(
+                    log_folder=os.getenv("API_LOG_DIR", "api_logs"),
+                    max_bytes=int(float(os.getenv("API_LOG_MAX_MB", "50")) * 1024 * 1024),
+                    backup_count=int(os.getenv("API_LOG_BACKUPS", "14")),
+                    body_sample_rate=float(os.getenv("API_LOG_BODY_SAMPLE_RATE", "0.1"))
+                )
+                atexit.register(_api_logger.close)
+    return _api_logger
@@ -0,0 +1,353 @@
+"""Caching utilities: in-process TTL cache, and namespaced caches shared by every worker"""
+import contextvars
+import hashlib
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from utils.cache_backends import KEY_PREFIX, CacheBackend, get_backend
+from utils.metrics import record_cache, record_cache_result
+
+# Largest pickled value a SharedCache stores; bigger ones are not cached
+MAX_VALUE_BYTES = int(os.getenv("CACHE_MAX_VALUE_BYTES", str(2 * 1024 * 1024)))
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed time-to-live"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60, name: Optional[str] = "default"):
+        """
+        Initialize cache
+
+        Args:
+            maxsize: Maximum number of entries kept; least recently used are evicted first
+            ttl: Seconds an entry stays valid after it was stored
+            name: Label for the cache_requests metric (None: not recorded)
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+        if self.name is not None:
+            record_cache(self.name, hit=entry is not None)
+        return entry[1] if entry is not None else None
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value, evicting the least recently used entry when full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Read-through lookup: return the cached value or call loader and cache a non-None result"""
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable):
+        """Drop a single entry"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class SharedCache:
+    """
+    A namespace in the shared cache backend (CACHE_BACKEND: sqlite by default,
+    memory or redis), with the same read-through API as TTLCache.
+
+    Every worker using the same namespace sees the same entries, so a value is
+    loaded from upstream once per host (or per Redis) rather than once per
+    worker, and invalidate() reaches all of them. Values are pickled, so the
+    backend must be private to this app, like the database.
+
+    With versioned, each key also has a generation that invalidate() replaces,
+    and entries are stored under the generation read before loading. A load
+    that raced a write then stores its old value under a generation nobody
+    reads any more, instead of overwriting the invalidation until the TTL ends.
+    """
+
+    def __init__(self, namespace: str, ttl: float = 60, max_value_bytes: int = MAX_VALUE_BYTES,
+                 backend: Optional[CacheBackend] = None, record: bool = True, versioned: bool = False):
+        """
+        Initialize cache
+
+        Args:
+            namespace: Key prefix and cache_requests metric label, e.g. "airports"
+            ttl: Default seconds an entry stays valid after it was stored
+            max_value_bytes: Pickled values larger than this are not stored
+            backend: Store to use (default: the process-wide one from utils.cache_backends)
+            record: Record hits and misses in the cache_requests metric
+            versioned: Keep a generation per key so invalidate() cannot be undone by an in-flight load
+        """
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_value_bytes = max_value_bytes
+        self.record = record
+        self.versioned = versioned
+        self._backend = backend
+        self._prefix = f"{KEY_PREFIX}{namespace}:"
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or get_backend()
+
+    def _key(self, key: Hashable, version: str = "") -> str:
+        text = key if isinstance(key, str) else repr(key)
+        if len(text) > 64:
+            # Long keys (request bodies, offers) are stored by digest
+            text = hashlib.blake2b(text.encode(), digest_size=20).hexdigest()
+        return self._prefix + text + (f"@{version}" if version else "")
+
+    def _version_key(self, key: Hashable) -> str:
+        return self._key(key) + "#version"
+
+    def _version(self, key: Hashable) -> str:
+        """Current generation of key ("" when not versioned)"""
+        if not self.versioned:
+            return ""
+        raw = self.backend.get(self._version_key(key))
+        return raw.decode() if raw else "0"
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing, expired or unreadable"""
+        return self._get(key, self._version(key))
+
+    def _get(self, key: Hashable, version: str) -> Optional[Any]:
+        raw = self.backend.get(self._key(key, version))
+        value = None
+        if raw is not None:
+            try:
+                value = pickle.loads(raw)
+            except Exception:
+                value = None
+        if self.record:
+            record_cache(self.namespace, hit=value is not None)
+        return value
+
+    def _dumps(self, value: Any) -> Optional[bytes]:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_value_bytes:
+            record_cache_result(self.namespace, "too_large")
+            return None
+        return data
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value for every worker (values over max_value_bytes are skipped)"""
+        self._set(key, value, ttl, self._version(key))
+
+    def _set(self, key: Hashable, value: Any, ttl: Optional[float], version: str):
+        data = self._dumps(value)
+        if data is not None:
+            self.backend.set(self._key(key, version), data, self.ttl if ttl is None else ttl)
+
+    def add(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        """Store only if no live entry exists; True if this call stored it (a lease across workers)"""
+        data = self._dumps(value)
+        if data is None:
+            return False
+        return self.backend.add(self._key(key, self._version(key)), data, self.ttl if ttl is None else ttl)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Read-through lookup: return the cached value or call loader and cache a non-None result"""
+        # Read the generation before loading, so a write during the load wins
+        version = self._version(key)
+        value = self._get(key, version)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self._set(key, value, ttl, version)
+        return value
+
+    def invalidate(self, key: Hashable):
+        """Drop a single entry, for every worker"""
+        if self.versioned:
+            # Outlive any entry stored under the old generation, or a missing generation could find it again
+            self.backend.set(self._version_key(key), uuid.uuid4().hex.encode(), 2 * self.ttl)
+        else:
+            self.backend.delete(self._key(key))
+
+    def clear(self):
+        """Drop every entry in the namespace"""
+        self.backend.clear(self._prefix)
+
+
+class StaleWhileRevalidateCache:
+    """
+    Cache that keeps serving an entry after it goes stale while refreshing it.
+
+    An entry younger than soft_ttl is fresh. Between soft_ttl and hard_ttl it is
+    stale: it is still returned immediately, and one background refresh is
+    started for the key (concurrent stale reads share it). After hard_ttl it is
+    gone, and the next read loads it inline; concurrent misses for the same key
+    in a worker wait for that single load instead of each calling the loader.
+
+    Entries live in a SharedCache namespace, so all workers serve each other's
+    loads, and a lease in the backend lets only one worker refresh a stale key.
+    """
+
+    FRESH = "fresh"
+    STALE = "stale"
+    MISS = "miss"
+    # Longest one worker may hold a key's refresh lease
+    REFRESH_LEASE = 60.0
+
+    def __init__(self, soft_ttl: float = 120, hard_ttl: float = 900, name: str = "default",
+                 refresh_workers: int = 4, max_value_bytes: int = MAX_VALUE_BYTES,
+                 backend: Optional[CacheBackend] = None):
+        """
+        Initialize cache
+
+        Args:
+            soft_ttl: Seconds an entry is served without triggering a refresh
+            hard_ttl: Seconds after which an entry is no longer served at all
+            name: Namespace and cache_requests metric label (results: hit, stale, miss)
+            refresh_workers: Threads available for background refreshes
+            max_value_bytes: Pickled values larger than this are not stored
+            backend: Store to use (default: the process-wide one from utils.cache_backends)
+        """
+        self.name = name
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self._entries = SharedCache(name, ttl=hard_ttl, max_value_bytes=max_value_bytes,
+                                    backend=backend, record=False)
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix=f"{name}-refresh")
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any],
+                    refresh_loader: Optional[Callable[[], Any]] = None) -> Tuple[Any, str, float]:
+        """
+        Return (value, status, age_seconds) with status fresh, stale or miss
+
+        Args:
+            key: Cache key
+            loader: Produces the value; called inline on a miss (its exceptions propagate)
+            refresh_loader: Used instead of loader for background refreshes
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, value = entry
+            # Wall clock: the entry may have been stored by another worker
+            age = max(0.0, time.time() - stored_at)
+            if age < self.soft_ttl:
+                record_cache_result(self.name, "hit")
+                return value, self.FRESH, age
+            record_cache_result(self.name, self.STALE)
+            self._refresh(key, refresh_loader or loader)
+            return value, self.STALE, age
+
+        record_cache_result(self.name, self.MISS)
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            value = pending.result()
+            if value is not None:
+                return value, self.MISS, 0.0
+            # A refresh that another worker held the lease for: it produced nothing here
+            value = loader()
+            self.set(key, value)
+            return value, self.MISS, 0.0
+
+        try:
+            value = loader()
+            self.set(key, value)
+            pending.set_result(value)
+            return value, self.MISS, 0.0
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def set(self, key: Hashable, value: Any):
+        if value is not None:
+            self._entries.set(key, (time.time(), value))
+
+    def invalidate(self, key: Hashable):
+        self._entries.invalidate(key)
+
+    def clear(self):
+        self._entries.clear()
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]):
+        """Start a background refresh for key unless one is already running"""
+        with self._lock:
+            if key in self._inflight:
+                return
+            future = self._inflight[key] = Future()
+        # Run in an empty context: the refresh belongs to no request's trace or deadline
+        self._executor.submit(contextvars.Context().run, self._run_refresh, key, loader, future)
+
+    def _run_refresh(self, key: Hashable, loader: Callable[[], Any], future: Future):
+        lease = ("refresh", key)
+        try:
+            if not self._entries.add(lease, os.getpid(), ttl=self.REFRESH_LEASE):
+                # Another worker is already refreshing this key
+                future.set_result(None)
+                return
+            try:
+                value = loader()
+                self.set(key, value)
+            finally:
+                self._entries.invalidate(lease)
+            self.refreshes += 1
+            future.set_result(value)
+        except Exception as e:
+            self.refresh_errors += 1
+            future.set_exception(e)
+            print(f"⚠️  Background refresh failed for {self.name} cache: {e}")
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> Dict:
+        """Background refresh counters and refreshes in flight in this worker"""
+        with self._lock:
+            inflight = len(self._inflight)
+        return {"refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors, "refreshing": inflight}
@@ -0,0 +1,416 @@
+"""Byte stores behind SharedCache: in-process LRU, a SQLite file shared by the host's workers, or Redis"""
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from utils.metrics import CACHE_BACKEND_ERRORS, CACHE_EVICTIONS
+from utils.state_files import ensure_private_file, state_path
+
+# Every key is prefixed with this, so a format change can never read old entries
+KEY_PREFIX = "fb:v1:"
+
+
+class CacheBackend(ABC):
+    """
+    Interface of a byte store with per-entry TTL.
+
+    Backends never raise on an unreachable store: reads miss and writes are
+    dropped (fail open), as with the rate limiter, so a cache outage costs
+    upstream calls but never fails a request.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float):
+        pass
+
+    @abstractmethod
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Store only if the key is absent or expired; True if stored. Used as a cross-worker lease."""
+
+    @abstractmethod
+    def delete(self, key: str):
+        pass
+
+    @abstractmethod
+    def clear(self, prefix: str):
+        """Drop every key starting with prefix (one namespace)"""
+
+    def close(self):
+        pass
+
+    def _error(self, operation: str, error: Exception):
+        CACHE_BACKEND_ERRORS.labels(self.name, operation).inc()
+        print(f"⚠️  Cache backend {self.name} {operation} failed: {error}")
+
+
+class MemoryBackend(CacheBackend):
+    """LRU dict for this process only, bounded by the total size of its values"""
+
+    name = "memory"
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._put(key, value, ttl)
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return False
+            self._put(key, value, ttl)
+            return True
+
+    def delete(self, key: str):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self, prefix: str):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                self._pop(key)
+
+    def _put(self, key: str, value: bytes, ttl: float):
+        self._pop(key)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._bytes += len(value)
+        evicted = 0
+        while self._bytes > self.max_bytes and len(self._data) > 1:
+            oldest = next(iter(self._data))
+            self._pop(oldest)
+            evicted += 1
+        if evicted:
+            CACHE_EVICTIONS.labels(self.name).inc(evicted)
+
+    def _pop(self, key: str):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Entries in a SQLite file (memory-mapped for reads) that every worker on the
+    host shares, like the rate limiter's buckets.
+
+    Reads are plain lookups; expired rows are skipped and removed by a periodic
+    sweep, which also evicts the rows closest to expiry while the file holds
+    more than max_bytes of values.
+    """
+
+    name = "sqlite"
+    SWEEP_EVERY = 5.0
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            path: SQLite file (default CACHE_DB, or flightbooking_cache.sqlite in STATE_DIR)
+            max_bytes: Total value size kept before the sweep evicts
+        """
+        self.path = path or os.getenv("CACHE_DB", state_path("flightbooking_cache.sqlite"))
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._next_sweep = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Owner-only: entries include booking details and are unpickled when read
+            ensure_private_file(self.path)
+            conn = sqlite3.connect(self.path, timeout=2, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(f"PRAGMA mmap_size={int(self.max_bytes * 2)}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                "expires_at REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)")
+            self._local.conn = conn
+        return conn
+
+    def _failed(self, operation: str, error: sqlite3.Error):
+        self._error(operation, error)
+        self._local.conn = None
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            row = self._connection().execute(
+                "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("get", e)
+            return None
+        return row[0] if row is not None else None
+
+    def set(self, key: str, value: bytes, ttl: float):
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at, size) VALUES (?, ?, ?, ?)",
+                (key, value, time.time() + ttl, len(value))
+            )
+            self._maybe_sweep()
+        except sqlite3.Error as e:
+            self._failed("set", e)
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        now = time.time()
+        try:
+            cursor = self._connection().execute(
+                "INSERT INTO entries (key, value, expires_at, size) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, "
+                "size = excluded.size WHERE entries.expires_at <= ?",
+                (key, value, now + ttl, len(value), now)
+            )
+        except sqlite3.Error as e:
+            self._failed("add", e)
+            # Without the store nobody can coordinate; let this worker go ahead
+            return True
+        return cursor.rowcount == 1
+
+    def delete(self, key: str):
+        try:
+            self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            self._failed("delete", e)
+
+    def clear(self, prefix: str):
+        try:
+            self._connection().execute("DELETE FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+        except sqlite3.Error as e:
+            self._failed("clear", e)
+
+    def _maybe_sweep(self):
+        now = time.time()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.SWEEP_EVERY
+        conn = self._connection()
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict the entries that would expire soonest until under the limit
+        excess = total - self.max_bytes
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY expires_at").fetchall():
+            if excess <= 0:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            excess -= size
+            evicted += 1
+        CACHE_EVICTIONS.labels(self.name).inc(evicted)
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class RespError(Exception):
+    """Error reply (-ERR ...) from a Redis-protocol server"""
+
+
+class RedisBackend(CacheBackend):
+    """
+    Minimal client for any Redis-protocol (RESP2) server: Redis, Valkey, KeyDB,
+    or the stand-in in loadtest/redis_standin.py.
+
+    One connection per thread. TTLs are set with SET ... PX, so the server expires
+    entries; its maxmemory policy bounds the total size. After a connection
+    failure the backend stays off (misses, dropped writes) for RETRY_AFTER
+    seconds instead of paying a connect timeout on every lookup.
+    """
+
+    name = "redis"
+    RETRY_AFTER = 5.0
+
+    def __init__(self, url: Optional[str] = None, timeout: float = 0.5):
+        """
+        Args:
+            url: redis://[:password@]host[:port][/db] (default CACHE_REDIS_URL or redis://127.0.0.1:6379/0)
+            timeout: Connect and read timeout in seconds
+        """
+        parsed = urlparse(url or os.getenv("CACHE_REDIS_URL", "redis://127.0.0.1:6379/0"))
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._down_until = 0.0
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = self._local.conn = (sock, sock.makefile("rb"))
+            if self.password:
+                self._call(conn, "AUTH", self.password)
+            if self.db:
+                self._call(conn, "SELECT", str(self.db))
+        return conn
+
+    def _command(self, operation: str, *args):
+        """Send one command; returns its reply, or raises ConnectionError after recording the failure"""
+        if time.monotonic() < self._down_until:
+            raise ConnectionError("cache backend marked down")
+        try:
+            return self._call(self._connection(), *args)
+        except (OSError, RespError) as e:
+            self._disconnect()
+            if not isinstance(e, RespError):
+                self._down_until = time.monotonic() + self.RETRY_AFTER
+            self._error(operation, e)
+            raise ConnectionError(str(e)) from e
+
+    @staticmethod
+    def _call(conn, *args):
+        sock, reader = conn
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        sock.sendall(b"".join(parts))
+        return RedisBackend._read_reply(reader)
+
+    @staticmethod
+    def _read_reply(reader):
+        line = reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("connection closed by cache server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RespError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("connection closed by cache server")
+            return data[:-2]
+        if kind == b"*":
+            count = int(rest)
+            return None if count < 0 else [RedisBackend._read_reply(reader) for _ in range(count)]
+        raise ConnectionError(f"unexpected reply from cache server: {line[:20]!r}")
+
+    def _disconnect(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn[0].close()
+            except OSError:
+                pass
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self._command("get", "GET", key)
+        except ConnectionError:
+            return None
+
+    def set(self, key: str, value: bytes, ttl: float):
+        try:
+            self._command("set", "SET", key, value, "PX", max(1, int(ttl * 1000)))
+        except ConnectionError:
+            pass
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        try:
+            return self._command("add", "SET", key, value, "PX", max(1, int(ttl * 1000)), "NX") is not None
+        except ConnectionError:
+            return True
+
+    def delete(self, key: str):
+        try:
+            self._command("delete", "DEL", key)
+        except ConnectionError:
+            pass
+
+    def clear(self, prefix: str):
+        pattern = "".join("\\" + c if c in "*?[]\\" else c for c in prefix) + "*"
+        cursor = "0"
+        try:
+            while True:
+                cursor, keys = self._command("clear", "SCAN", cursor, "MATCH", pattern, "COUNT", 500)
+                cursor = cursor.decode()
+                if keys:
+                    self._command("clear", "DEL", *keys)
+                if cursor == "0":
+                    return
+        except ConnectionError:
+            pass
+
+    def close(self):
+        self._disconnect()
+
+
+def create_backend(kind: Optional[str] = None) -> CacheBackend:
+    """Backend named by kind or CACHE_BACKEND: memory, sqlite (default) or redis"""
+    kind = (kind or os.getenv("CACHE_BACKEND", "sqlite")).lower()
+    max_bytes = int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    if kind == "memory":
+        return MemoryBackend(max_bytes=max_bytes)
+    if kind == "sqlite":
+        return SQLiteBackend(max_bytes=max_bytes)
+    if kind == "redis":
+        return RedisBackend()
+    raise ValueError(f"Unknown CACHE_BACKEND {kind!r} (expected memory, sqlite or redis)")
+
+
+_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> CacheBackend:
+    """The process-wide backend, created from the environment on first use"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+    return _backend
+
+
+def close_backend():
+    global _backend
+    with _backend_lock:
+        backend, _backend = _backend, None
+    if backend is not None:
+        backend.close()
+
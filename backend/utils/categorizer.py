@@ -1,220 +1,376 @@
-from typing import Dict, List, Optional
-from datetime import datetime, timedelta
-
-
-class FlightCategorizer:
-    def __init__(self):
-        pass
-
-    def _parse_duration(self, duration_str: str) -> int:
-        """Parse ISO 8601 duration to total minutes"""
-        try:
-            # Format: PT5H10M or PT2H30M
-            duration_str = duration_str.replace("PT", "")
-            hours = 0
-            minutes = 0
-            
-            if "H" in duration_str:
-                hours_str = duration_str.split("H")[0]
-                hours = int(hours_str)
-                duration_str = duration_str.split("H")[1]
-            
-            if "M" in duration_str:
-                minutes_str = duration_str.split("M")[0]
-                minutes = int(minutes_str)
-            
-            return hours * 60 + minutes
-        except:
-            return 0
-
-    def _format_duration(self, minutes: int) -> str:
-        """Format minutes to readable duration"""
-        hours = minutes // 60
-        mins = minutes % 60
-        if hours > 0:
-            return f"{hours}h{mins}m"
-        return f"{mins}m"
-
-    def _parse_flight_offer(self, offer: Dict) -> Optional[Dict]:
-        """Parse Amadeus flight offer to standardized format"""
-        try:
-            itineraries = offer.get("itineraries", [])
-            if not itineraries:
-                print(f"⚠️  Flight offer {offer.get('id', 'unknown')} has no itineraries")
-                return None
-
-            segments = []
-            total_duration = 0
-            stops = 0
-
-            for itinerary in itineraries:
-                segments_list = itinerary.get("segments", [])
-                if segments_list:
-                    # Calculate total duration
-                    duration_str = itinerary.get("duration", "")
-                    total_duration = self._parse_duration(duration_str)
-                    
-                    # Count stops (segments - 1)
-                    stops = len(segments_list) - 1
-
-                    # Get first and last segments
-                    first_segment = segments_list[0]
-                    last_segment = segments_list[-1]
-
-                    segments.append({
-                        "departure": {
-                            "airport": first_segment.get("departure", {}).get("iataCode"),
-                            "time": first_segment.get("departure", {}).get("at", "")[:16]  # Remove timezone
-                        },
-                        "arrival": {
-                            "airport": last_segment.get("arrival", {}).get("iataCode"),
-                            "time": last_segment.get("arrival", {}).get("at", "")[:16]
-                        },
-                        "airline": first_segment.get("carrierCode"),
-                        "duration": self._format_duration(total_duration),
-                        "stops": stops,
-                        "stops_details": [
-                            {
-                                "airport": seg.get("arrival", {}).get("iataCode"),
-                                "duration": seg.get("duration", "")
-                            }
-                            for seg in segments_list[1:-1] if len(segments_list) > 1
-                        ]
-                    })
-
-            # Get pricing
-            price_data = offer.get("price", {})
-            total_price = float(price_data.get("total", 0))
-            currency = price_data.get("currency", "GBP")
-
-            # Get travel class - handle missing data gracefully
-            travel_class = "ECONOMY"  # Default
-            try:
-                traveler_pricings = offer.get("travelerPricings", [])
-                if traveler_pricings and len(traveler_pricings) > 0:
-                    fare_details = traveler_pricings[0].get("fareDetailsBySegment", [])
-                    if fare_details and len(fare_details) > 0:
-                        travel_class = fare_details[0].get("cabin", "ECONOMY")
-            except (KeyError, IndexError, AttributeError):
-                # If structure is different, try alternative paths
-                travel_class = offer.get("cabin", "ECONOMY")
-
-            # Get airline code - handle missing segments
-            airline_code = "UNKNOWN"
-            if segments and len(segments) > 0:
-                airline_code = segments[0].get("airline", "UNKNOWN")
-            elif segments_list and len(segments_list) > 0:
-                # Fallback to first segment if segments list is empty
-                airline_code = segments_list[0].get("carrierCode", "UNKNOWN")
-
-            # Safely get segment data
-            departure_airport = ""
-            arrival_airport = ""
-            departure_time = ""
-            arrival_time = ""
-            
-            if segments and len(segments) > 0:
-                departure_airport = segments[0].get("departure", {}).get("airport", "")
-                arrival_airport = segments[0].get("arrival", {}).get("airport", "")
-                departure_time = segments[0].get("departure", {}).get("time", "")
-                arrival_time = segments[0].get("arrival", {}).get("time", "")
-            
-            return {
-                "id": offer.get("id", ""),
-                "airline": airline_code,
-                "airline_logo": f"https://www.gstatic.com/flights/airline_logos/70px/{airline_code.lower()}.png" if airline_code != "UNKNOWN" else "",
-                "departure_airport": departure_airport,
-                "arrival_airport": arrival_airport,
-                "departure_time": departure_time,
-                "arrival_time": arrival_time,
-                "duration": self._format_duration(total_duration),
-                "duration_minutes": total_duration,
-                "stops": stops,
-                "cabin_class": travel_class,
-                "price": total_price,
-                "currency": currency,
-                "segments": segments,
-                "raw_offer": offer  # Keep original for reference
-            }
-        except Exception as e:
-            print(f"⚠️  Error parsing flight offer {offer.get('id', 'unknown')}: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
-
-    def categorize_flights(self, flight_offers: List[Dict]) -> Dict:
-        """Categorize flights into cheapest, fastest, most comfortable"""
-        parsed_flights = []
-        
-        for offer in flight_offers:
-            try:
-                parsed = self._parse_flight_offer(offer)
-                if parsed:
-                    parsed_flights.append(parsed)
-            except Exception as e:
-                print(f"⚠️  Warning: Failed to parse flight offer {offer.get('id', 'unknown')}: {e}")
-                continue
-
-        if not parsed_flights:
-            print("⚠️  Warning: No flights could be parsed from offers")
-            return {}
-
-        # Find cheapest
-        cheapest = min(parsed_flights, key=lambda x: x.get("price", float('inf')))
-        cheapest["category"] = "cheapest"
-
-        # Find fastest (prefer direct flights)
-        fastest = min(
-            parsed_flights,
-            key=lambda x: (x.get("duration_minutes", float('inf')), x.get("stops", 999), x.get("price", float('inf')))
-        )
-        fastest["category"] = "fastest"
-
-        # Find most comfortable (business/premium class, or lowest stops)
-        comfortable = None
-        business_flights = [f for f in parsed_flights if f.get("cabin_class") and ("BUSINESS" in f["cabin_class"].upper() or "FIRST" in f["cabin_class"].upper())]
-        premium_flights = [f for f in parsed_flights if f.get("cabin_class") and "PREMIUM" in f["cabin_class"].upper()]
-
-        if business_flights:
-            comfortable = min(business_flights, key=lambda x: x.get("price", float('inf')))
-        elif premium_flights:
-            comfortable = min(premium_flights, key=lambda x: x.get("price", float('inf')))
-        else:
-            # If no business/premium, get the one with least stops
-            comfortable = min(parsed_flights, key=lambda x: (x.get("stops", 999), x.get("price", float('inf'))))
-
-        if comfortable:
-            comfortable["category"] = "most_comfortable"
-
-        result = {
-            "cheapest": cheapest,
-            "fastest": fastest,
-            "most_comfortable": comfortable
-        }
-        
-        print(f"✅ Categorized {len(parsed_flights)} flights: cheapest={cheapest.get('price')}, fastest={fastest.get('duration')}, comfortable={comfortable.get('price') if comfortable else 'N/A'}")
-        
-        return result
-
-    def get_best_future_deal(self, flight_offers: List[Dict]) -> Optional[Dict]:
-        """Get the best deal from future date search"""
-        parsed_flights = []
-        
-        for offer in flight_offers:
-            parsed = self._parse_flight_offer(offer)
-            if parsed:
-                parsed_flights.append(parsed)
-
-        if not parsed_flights:
-            return None
-
-        # Get the cheapest reasonable option (prefer direct or 1 stop)
-        best_deal = min(
-            parsed_flights,
-            key=lambda x: (x["stops"] if x["stops"] <= 1 else 999, x["price"])
-        )
-        best_deal["category"] = "best_future_deal"
-        best_deal["days_later"] = 30
-
-        return best_deal
-
+import heapq
+import json
+from typing import Dict, Iterable, Iterator, List, Optional
+from datetime import datetime, timedelta
+
+from utils.metrics import time_stage
+
+
+# Selection keys of the categories (min() of each wins)
+def _price_key(flight: Dict):
+    return flight.get("price", float('inf'))
+
+
+def _fastest_key(flight: Dict):
+    return (flight.get("duration_minutes", float('inf')), flight.get("stops", 999), flight.get("price", float('inf')))
+
+
+def _fewest_stops_key(flight: Dict):
+    return (flight.get("stops", 999), flight.get("price", float('inf')))
+
+
+def _future_deal_key(flight: Dict):
+    # The cheapest reasonable option: direct or 1 stop on every leg
+    stops = max((leg["stops"] for leg in flight["segments"]), default=flight["stops"])
+    return (stops if stops <= 1 else 999, flight["price"])
+
+
+def _is_business(flight: Dict) -> bool:
+    return bool(flight.get("cabin_class")) and ("BUSINESS" in flight["cabin_class"].upper()
+                                                or "FIRST" in flight["cabin_class"].upper())
+
+
+def _is_premium(flight: Dict) -> bool:
+    return bool(flight.get("cabin_class")) and "PREMIUM" in flight["cabin_class"].upper()
+
+
+class FlightCategorizer:
+    def __init__(self):
+        pass
+
+    def _parse_duration(self, duration_str: str) -> int:
+        """Parse ISO 8601 duration to total minutes"""
+        try:
+            # Format: PT5H10M or PT2H30M
+            duration_str = duration_str.replace("PT", "")
+            hours = 0
+            minutes = 0
+            
+            if "H" in duration_str:
+                hours_str = duration_str.split("H")[0]
+                hours = int(hours_str)
+                duration_str = duration_str.split("H")[1]
+            
+            if "M" in duration_str:
+                minutes_str = duration_str.split("M")[0]
+                minutes = int(minutes_str)
+            
+            return hours * 60 + minutes
+        except:
+            return 0
+
+    def _format_duration(self, minutes: int) -> str:
+        """Format minutes to readable duration"""
+        hours = minutes // 60
+        mins = minutes % 60
+        if hours > 0:
+            return f"{hours}h{mins}m"
+        return f"{mins}m"
+
+    def _parse_flight_offer(self, offer: Dict) -> Optional[Dict]:
+        """Parse Amadeus flight offer to standardized format"""
+        try:
+            itineraries = offer.get("itineraries", [])
+            if not itineraries:
+                print(f"⚠️  Flight offer {offer.get('id', 'unknown')} has no itineraries")
+                return None
+
+            segments = []
+            total_duration = 0
+            stops = 0
+
+            # Round trips and multi-city trips have one itinerary per leg; the
+            # offer's duration and stops are the totals over all of them
+            for itinerary in itineraries:
+                segments_list = itinerary.get("segments", [])
+                if segments_list:
+                    # Duration of this leg
+                    duration_str = itinerary.get("duration", "")
+                    leg_duration = self._parse_duration(duration_str)
+                    total_duration += leg_duration
+                    
+                    # Count stops (segments - 1)
+                    leg_stops = len(segments_list) - 1
+                    stops += leg_stops
+
+                    # Get first and last segments
+                    first_segment = segments_list[0]
+                    last_segment = segments_list[-1]
+
+                    segments.append({
+                        "departure": {
+                            "airport": first_segment.get("departure", {}).get("iataCode"),
+                            "time": first_segment.get("departure", {}).get("at", "")[:16]  # Remove timezone
+                        },
+                        "arrival": {
+                            "airport": last_segment.get("arrival", {}).get("iataCode"),
+                            "time": last_segment.get("arrival", {}).get("at", "")[:16]
+                        },
+                        "airline": first_segment.get("carrierCode"),
+                        "duration": self._format_duration(leg_duration),
+                        "stops": leg_stops,
+                        "stops_details": [
+                            {
+                                "airport": seg.get("arrival", {}).get("iataCode"),
+                                "duration": seg.get("duration", "")
+                            }
+                            for seg in segments_list[1:-1] if len(segments_list) > 1
+                        ]
+                    })
+
+            # Get pricing
+            price_data = offer.get("price", {})
+            total_price = float(price_data.get("total", 0))
+            currency = price_data.get("currency", "GBP")
+
+            # Get travel class - handle missing data gracefully
+            travel_class = "ECONOMY"  # Default
+            try:
+                traveler_pricings = offer.get("travelerPricings", [])
+                if traveler_pricings and len(traveler_pricings) > 0:
+                    fare_details = traveler_pricings[0].get("fareDetailsBySegment", [])
+                    if fare_details and len(fare_details) > 0:
+                        travel_class = fare_details[0].get("cabin", "ECONOMY")
+            except (KeyError, IndexError, AttributeError):
+                # If structure is different, try alternative paths
+                travel_class = offer.get("cabin", "ECONOMY")
+
+            # Get airline code - handle missing segments
+            airline_code = "UNKNOWN"
+            if segments and len(segments) > 0:
+                airline_code = segments[0].get("airline", "UNKNOWN")
+            elif segments_list and len(segments_list) > 0:
+                # Fallback to first segment if segments list is empty
+                airline_code = segments_list[0].get("carrierCode", "UNKNOWN")
+
+            # Safely get segment data
+            departure_airport = ""
+            arrival_airport = ""
+            departure_time = ""
+            arrival_time = ""
+            
+            if segments and len(segments) > 0:
+                departure_airport = segments[0].get("departure", {}).get("airport", "")
+                arrival_airport = segments[0].get("arrival", {}).get("airport", "")
+                departure_time = segments[0].get("departure", {}).get("time", "")
+                arrival_time = segments[0].get("arrival", {}).get("time", "")
+            
+            return {
+                "id": offer.get("id", ""),
+                "airline": airline_code,
+                "airline_logo": f"https://www.gstatic.com/flights/airline_logos/70px/{airline_code.lower()}.png" if airline_code != "UNKNOWN" else "",
+                "departure_airport": departure_airport,
+                "arrival_airport": arrival_airport,
+                "departure_time": departure_time,
+                "arrival_time": arrival_time,
+                "duration": self._format_duration(total_duration),
+                "duration_minutes": total_duration,
+                "stops": stops,
+                "cabin_class": travel_class,
+                "price": total_price,
+                "currency": currency,
+                "segments": segments,
+                "raw_offer": offer  # Keep original for reference
+            }
+        except Exception as e:
+            print(f"⚠️  Error parsing flight offer {offer.get('id', 'unknown')}: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+
+    @time_stage("categorize")
+    def categorize_flights(self, flight_offers: List[Dict]) -> Dict:
+        """Categorize flights into cheapest, fastest, most comfortable"""
+        parsed_flights = []
+        
+        for offer in flight_offers:
+            try:
+                parsed = self._parse_flight_offer(offer)
+                if parsed:
+                    parsed_flights.append(parsed)
+            except Exception as e:
+                print(f"⚠️  Warning: Failed to parse flight offer {offer.get('id', 'unknown')}: {e}")
+                continue
+
+        return self.categorize_parsed(parsed_flights)
+
+    def categorize_parsed(self, parsed_flights: List[Dict]) -> Dict:
+        """categorize_flights() on flights already parsed by _parse_flight_offer (sets their "category")"""
+        if not parsed_flights:
+            print("⚠️  Warning: No flights could be parsed from offers")
+            return {}
+
+        # Find cheapest
+        cheapest = min(parsed_flights, key=_price_key)
+        cheapest["category"] = "cheapest"
+
+        # Find fastest (prefer direct flights)
+        fastest = min(parsed_flights, key=_fastest_key)
+        fastest["category"] = "fastest"
+
+        # Find most comfortable (business/premium class, or lowest stops)
+        comfortable = None
+        business_flights = [f for f in parsed_flights if _is_business(f)]
+        premium_flights = [f for f in parsed_flights if _is_premium(f)]
+
+        if business_flights:
+            comfortable = min(business_flights, key=_price_key)
+        elif premium_flights:
+            comfortable = min(premium_flights, key=_price_key)
+        else:
+            # If no business/premium, get the one with least stops
+            comfortable = min(parsed_flights, key=_fewest_stops_key)
+
+        if comfortable:
+            comfortable["category"] = "most_comfortable"
+
+        result = {
+            "cheapest": cheapest,
+            "fastest": fastest,
+            "most_comfortable": comfortable
+        }
+        
+        print(f"✅ Categorized {len(parsed_flights)} flights: cheapest={cheapest.get('price')}, fastest={fastest.get('duration')}, comfortable={comfortable.get('price') if comfortable else 'N/A'}")
+        
+        return result
+
+    @time_stage("future_deal")
+    def get_best_future_deal(self, flight_offers: List[Dict]) -> Optional[Dict]:
+        """Get the best deal from future date search"""
+        parsed_flights = []
+        
+        for offer in flight_offers:
+            parsed = self._parse_flight_offer(offer)
+            if parsed:
+                parsed_flights.append(parsed)
+
+        return self.pick_future_deal(parsed_flights)
+
+    def pick_future_deal(self, parsed_flights: List[Dict]) -> Optional[Dict]:
+        """Future-deal card from already parsed flights (a copy; the input is not modified)"""
+        if not parsed_flights:
+            return None
+
+        # Get the cheapest reasonable option (prefer direct or 1 stop on every leg)
+        best_deal = dict(min(parsed_flights, key=_future_deal_key))
+        best_deal["category"] = "best_future_deal"
+        best_deal["days_later"] = 30
+
+        return best_deal
+
+
+def summarize_offers(offers: Iterable[Dict], categorize: bool = True, all_flights_limit: int = 50,
+                     parse_stage: str = "parse_all") -> Dict:
+    """
+    All the per-offer work of a search in one pass: each offer is parsed once,
+    then categorized, listed by price and used for the future-deal card.
+
+    Only flights that can still end up in the result are kept: the
+    all_flights_limit cheapest and the best so far for each category. offers
+    may be a stream (see utils.json_stream), so a large response never has all
+    of its offers decoded at once. The parse loop is timed as parse_stage;
+    name it differently when it includes waiting for the download.
+
+    Returns:
+        dict: offers (count), cheapest_total (lowest price.total, or None),
+        categorized (categorize_flights() result, {} unless categorize),
+        all_flights (the all_flights_limit cheapest parsed flights) and
+        future_deal (pick_future_deal() result)
+    """
+    categorizer = FlightCategorizer()
+    # Max-heap of (price, arrival order) for the cheapest flights, and per category
+    # the first flight with the lowest key, as min() over every flight would pick
+    cheapest_flights = []
+    best = {}
+    selections = (("fastest", _fastest_key, None), ("business", _price_key, _is_business),
+                  ("premium", _price_key, _is_premium), ("fewest_stops", _fewest_stops_key, None),
+                  ("future_deal", _future_deal_key, None))
+    count = 0
+    cheapest_total = None
+    with time_stage(parse_stage):
+        for offer in offers:
+            count += 1
+            try:
+                total = float(offer.get("price", {}).get("total"))
+                if cheapest_total is None or total < cheapest_total:
+                    cheapest_total = total
+            except (TypeError, ValueError):
+                pass
+            try:
+                parsed = categorizer._parse_flight_offer(offer)
+            except Exception as e:
+                print(f"⚠️  Warning: Failed to parse flight offer {offer.get('id', 'unknown')}: {e}")
+                continue
+            if not parsed:
+                continue
+            entry = (-_price_key(parsed), -count, parsed)
+            if len(cheapest_flights) < all_flights_limit:
+                heapq.heappush(cheapest_flights, entry)
+            elif entry[:2] > cheapest_flights[0][:2]:
+                heapq.heapreplace(cheapest_flights, entry)
+            for name, key, applies in selections:
+                if applies is None or applies(parsed):
+                    value = key(parsed)
+                    if name not in best or value < best[name][0]:
+                        best[name] = (value, count, parsed)
+
+    # The candidates in arrival order, so ties resolve as over the whole list
+    candidates = {-order: flight for _, order, flight in cheapest_flights}
+    candidates.update((order, flight) for _, order, flight in best.values())
+    parsed_flights = [candidates[order] for order in sorted(candidates)]
+
+    categorized = {}
+    if categorize and count:
+        with time_stage("categorize"):
+            # Copies: the categories must not leak into all_flights
+            categorized = categorizer.categorize_parsed([dict(flight) for flight in parsed_flights])
+
+    return {
+        "offers": count,
+        "cheapest_total": cheapest_total,
+        "categorized": categorized,
+        "all_flights": sorted(parsed_flights, key=_price_key)[:all_flights_limit],
+        "future_deal": categorizer.pick_future_deal(parsed_flights),
+    }
+
+
+def summarize_response(body: bytes, categorize: bool = True) -> Dict:
+    """summarize_offers() for a raw Flight Offers Search response body (picklable, for CpuOffload)"""
+    with time_stage("decode"):
+        offers = json.loads(body).get("data") or []
+    return summarize_offers(offers, categorize=categorize)
+
+
+def _offer_signature(offer: Dict) -> tuple:
+    """The flights (carrier, number, airports, times per segment) and total price of an offer"""
+    return tuple(
+        (segment.get("carrierCode"), segment.get("number"),
+         segment.get("departure", {}).get("iataCode"), segment.get("departure", {}).get("at"),
+         segment.get("arrival", {}).get("iataCode"), segment.get("arrival", {}).get("at"))
+        for itinerary in offer.get("itineraries", [])
+        for segment in itinerary.get("segments", [])
+    ) + (offer.get("price", {}).get("grandTotal") or offer.get("price", {}).get("total"),)
+
+
+def merge_offers(offer_lists: Iterable[Iterable[Dict]]) -> Iterator[Dict]:
+    """
+    The offers of several searches (e.g. each airport pair of a metro-area
+    search) as one stream: an offer repeating the flights and price of an
+    earlier one is dropped, and ids are renumbered from "1", as every search
+    numbers its own offers from "1".
+    """
+    seen = set()
+    for offers in offer_lists:
+        for offer in offers:
+            signature = _offer_signature(offer)
+            if signature in seen:
+                continue
+            seen.add(signature)
+            yield {**offer, "id": str(len(seen))}
+
+
+def summarize_responses(bodies: List[bytes], categorize: bool = True) -> Dict:
+    """summarize_offers() over the merged offers of several raw response bodies (picklable, for CpuOffload)"""
+    with time_stage("decode"):
+        offer_lists = [json.loads(body).get("data") or [] for body in bodies]
+    return summarize_offers(merge_offers(offer_lists), categorize=categorize)
@@ -1,232 +1,230 @@
-"""Date parsing utility to handle multiple date formats and convert to YYYY-MM-DD"""
-import re
-from datetime import datetime
-from typing import Optional
-
-
-class DateParser:
-    """Parse dates in various formats and convert to YYYY-MM-DD"""
-    
-    MONTH_NAMES = {
-        'january': 1, 'jan': 1,
-        'february': 2, 'feb': 2,
-        'march': 3, 'mar': 3,
-        'april': 4, 'apr': 4,
-        'may': 5,
-        'june': 6, 'jun': 6,
-        'july': 7, 'jul': 7,
-        'august': 8, 'aug': 8,
-        'september': 9, 'sep': 9, 'sept': 9,
-        'october': 10, 'oct': 10,
-        'november': 11, 'nov': 11,
-        'december': 12, 'dec': 12
-    }
-    
-    @staticmethod
-    def parse_date(date_string: str) -> Optional[str]:
-        """
-        Parse date string in various formats and return YYYY-MM-DD format.
-        
-        Supported formats:
-        - YYYY-MM-DD (2024-06-15)
-        - DD/MM/YYYY (15/06/2024)
-        - MM/DD/YYYY (06/15/2024)
-        - DD-MM-YYYY (15-06-2024)
-        - MM-DD-YYYY (06-15-2024)
-        - DD.MM.YYYY (15.06.2024)
-        - MM.DD.YYYY (06.15.2024)
-        - "15th June 2024" or "15 June 2024"
-        - "June 15, 2024" or "Jun 15, 2024"
-        - "15/06" or "15-06" (assumes current year)
-        - "June 15" or "15 June" (assumes current year)
-        
-        Returns:
-            str: Date in YYYY-MM-DD format, or None if parsing fails
-        """
-        if not date_string:
-            return None
-        
-        date_string = date_string.strip()
-        
-        # Try ISO format first (YYYY-MM-DD)
-        try:
-            datetime.strptime(date_string, "%Y-%m-%d")
-            return date_string
-        except ValueError:
-            pass
-        
-        # Try DD/MM/YYYY or MM/DD/YYYY
-        slash_pattern = r'(\d{1,2})[/-](\d{1,2})[/-](\d{4})'
-        match = re.search(slash_pattern, date_string)
-        if match:
-            part1, part2, year = match.groups()
-            # Try DD/MM/YYYY first (European format)
-            try:
-                day, month = int(part1), int(part2)
-                if 1 <= day <= 31 and 1 <= month <= 12:
-                    date_obj = datetime(int(year), month, day)
-                    return date_obj.strftime("%Y-%m-%d")
-            except ValueError:
-                pass
-            
-            # Try MM/DD/YYYY (American format)
-            try:
-                month, day = int(part1), int(part2)
-                if 1 <= month <= 12 and 1 <= day <= 31:
-                    date_obj = datetime(int(year), month, day)
-                    return date_obj.strftime("%Y-%m-%d")
-            except ValueError:
-                pass
-        
-        # Try DD.MM.YYYY or MM.DD.YYYY
-        dot_pattern = r'(\d{1,2})\.(\d{1,2})\.(\d{4})'
-        match = re.search(dot_pattern, date_string)
-        if match:
-            part1, part2, year = match.groups()
-            # Try DD.MM.YYYY first
-            try:
-                day, month = int(part1), int(part2)
-                if 1 <= day <= 31 and 1 <= month <= 12:
-                    date_obj = datetime(int(year), month, day)
-                    return date_obj.strftime("%Y-%m-%d")
-            except ValueError:
-                pass
-            
-            # Try MM.DD.YYYY
-            try:
-                month, day = int(part1), int(part2)
-                if 1 <= month <= 12 and 1 <= day <= 31:
-                    date_obj = datetime(int(year), month, day)
-                    return date_obj.strftime("%Y-%m-%d")
-            except ValueError:
-                pass
-        
-        # Try "15th June 2024" or "15 June 2024"
-        ordinal_pattern = r'(\d{1,2})(?:st|nd|rd|th)?\s+([a-z]+)\s+(\d{4})'
-        match = re.search(ordinal_pattern, date_string, re.IGNORECASE)
-        if match:
-            day_str, month_str, year_str = match.groups()
-            month_name = month_str.lower()
-            if month_name in DateParser.MONTH_NAMES:
-                try:
-                    day = int(day_str)
-                    month = DateParser.MONTH_NAMES[month_name]
-                    year = int(year_str)
-                    date_obj = datetime(year, month, day)
-                    return date_obj.strftime("%Y-%m-%d")
-                except ValueError:
-                    pass
-        
-        # Try "June 15, 2024" or "Jun 15, 2024"
-        month_first_pattern = r'([a-z]+)\s+(\d{1,2}),?\s+(\d{4})'
-        match = re.search(month_first_pattern, date_string, re.IGNORECASE)
-        if match:
-            month_str, day_str, year_str = match.groups()
-            month_name = month_str.lower()
-            if month_name in DateParser.MONTH_NAMES:
-                try:
-                    month = DateParser.MONTH_NAMES[month_name]
-                    day = int(day_str)
-                    year = int(year_str)
-                    date_obj = datetime(year, month, day)
-                    return date_obj.strftime("%Y-%m-%d")
-                except ValueError:
-                    pass
-        
-        # Try "15th June" or "15 June" (no year, assume current or next year)
-        ordinal_no_year_pattern = r'(\d{1,2})(?:st|nd|rd|th)?\s+([a-z]+)'
-        match = re.search(ordinal_no_year_pattern, date_string, re.IGNORECASE)
-        if match:
-            day_str, month_str = match.groups()
-            month_name = month_str.lower()
-            if month_name in DateParser.MONTH_NAMES:
-                try:
-                    day = int(day_str)
-                    month = DateParser.MONTH_NAMES[month_name]
-                    now = datetime.now()
-                    year = now.year
-                    # If the date has already passed this year, use next year
-                    try:
-                        date_obj = datetime(year, month, day)
-                        if date_obj < now:
-                            year = year + 1
-                        date_obj = datetime(year, month, day)
-                        return date_obj.strftime("%Y-%m-%d")
-                    except ValueError:
-                        pass
-                except ValueError:
-                    pass
-        
-        # Try "June 15" (no year, assume current or next year)
-        month_first_no_year_pattern = r'([a-z]+)\s+(\d{1,2})'
-        match = re.search(month_first_no_year_pattern, date_string, re.IGNORECASE)
-        if match:
-            month_str, day_str = match.groups()
-            month_name = month_str.lower()
-            if month_name in DateParser.MONTH_NAMES:
-                try:
-                    month = DateParser.MONTH_NAMES[month_name]
-                    day = int(day_str)
-                    now = datetime.now()
-                    year = now.year
-                    # If the date has already passed this year, use next year
-                    try:
-                        date_obj = datetime(year, month, day)
-                        if date_obj < now:
-                            year = year + 1
-                        date_obj = datetime(year, month, day)
-                        return date_obj.strftime("%Y-%m-%d")
-                    except ValueError:
-                        pass
-                except ValueError:
-                    pass
-        
-        # Try DD/MM or MM/DD (no year, assume current or next year)
-        short_pattern = r'(\d{1,2})[/-](\d{1,2})'
-        match = re.search(short_pattern, date_string)
-        if match:
-            part1, part2 = match.groups()
-            now = datetime.now()
-            year = now.year
-            
-            # Try DD/MM first (European format)
-            try:
-                day, month = int(part1), int(part2)
-                if 1 <= day <= 31 and 1 <= month <= 12:
-                    try:
-                        date_obj = datetime(year, month, day)
-                        if date_obj < now:
-                            year = year + 1
-                        date_obj = datetime(year, month, day)
-                        return date_obj.strftime("%Y-%m-%d")
-                    except ValueError:
-                        pass
-            except ValueError:
-                pass
-            
-            # Try MM/DD (American format)
-            try:
-                month, day = int(part1), int(part2)
-                if 1 <= month <= 12 and 1 <= day <= 31:
-                    try:
-                        date_obj = datetime(year, month, day)
-                        if date_obj < now:
-                            year = year + 1
-                        date_obj = datetime(year, month, day)
-                        return date_obj.strftime("%Y-%m-%d")
-                    except ValueError:
-                        pass
-            except ValueError:
-                pass
-        
-        return None
-    
-    @staticmethod
-    def validate_date_format(date_string: str) -> bool:
-        """Validate if date string is in YYYY-MM-DD format"""
-        try:
-            datetime.strptime(date_string, "%Y-%m-%d")
-            return True
-        except ValueError:
-            return False
-
+"""Date parsing utility to handle multiple date formats and convert to YYYY-MM-DD"""
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+MONTH_NAMES = {
+    'january': 1, 'jan': 1,
+    'february': 2, 'feb': 2,
+    'march': 3, 'mar': 3,
+    'april': 4, 'apr': 4,
+    'may': 5,
+    'june': 6, 'jun': 6,
+    'july': 7, 'jul': 7,
+    'august': 8, 'aug': 8,
+    'september': 9, 'sep': 9, 'sept': 9,
+    'october': 10, 'oct': 10,
+    'november': 11, 'nov': 11,
+    'december': 12, 'dec': 12
+}
+
+_MONTH = r'(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?' \
+         r'|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)'
+
+# Every supported format as a whole string, in one match. The outer group that
+# matched (match.lastgroup) selects the handler.
+_FORMATS = re.compile(rf'''
+    (?P<iso>(?P<iso_y>\d{{4}})-(?P<iso_m>\d{{1,2}})-(?P<iso_d>\d{{1,2}}|\ \d))
+  | (?P<numeric>(?P<num_a>\d{{1,2}})[/-](?P<num_b>\d{{1,2}})[/-](?P<num_y>\d{{4}}))
+  | (?P<dotted>(?P<dot_a>\d{{1,2}})\.(?P<dot_b>\d{{1,2}})\.(?P<dot_y>\d{{4}}))
+  | (?P<day_month_year>(?P<dmy_d>\d{{1,2}})(?:st|nd|rd|th)?\s+(?P<dmy_m>{_MONTH})\s+(?P<dmy_y>\d{{4}}))
+  | (?P<month_day_year>(?P<mdy_m>{_MONTH})\s+(?P<mdy_d>\d{{1,2}}),?\s+(?P<mdy_y>\d{{4}}))
+  | (?P<day_month>(?P<dm_d>\d{{1,2}})(?:st|nd|rd|th)?\s+(?P<dm_m>{_MONTH}))
+  | (?P<month_day>(?P<md_m>{_MONTH})\s+(?P<md_d>\d{{1,2}}))
+  | (?P<short>(?P<short_a>\d{{1,2}})[/-](?P<short_b>\d{{1,2}}))
+''', re.IGNORECASE | re.VERBOSE)
+
+# Free text ("leaving on 15 june please") is searched pattern by pattern in this
+# order; the first match of each pattern is the only one considered.
+_SLASH = re.compile(r'(\d{1,2})[/-](\d{1,2})[/-](\d{4})')
+_DOT = re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{4})')
+_ORDINAL = re.compile(r'(\d{1,2})(?:st|nd|rd|th)?\s+([a-z]+)\s+(\d{4})', re.IGNORECASE)
+_MONTH_FIRST = re.compile(r'([a-z]+)\s+(\d{1,2}),?\s+(\d{4})', re.IGNORECASE)
+_ORDINAL_NO_YEAR = re.compile(r'(\d{1,2})(?:st|nd|rd|th)?\s+([a-z]+)', re.IGNORECASE)
+_MONTH_FIRST_NO_YEAR = re.compile(r'([a-z]+)\s+(\d{1,2})', re.IGNORECASE)
+_SHORT = re.compile(r'(\d{1,2})[/-](\d{1,2})')
+
+CACHE_SIZE = 4096
+
+
+def _ymd(year: int, month: int, day: int) -> Optional[str]:
+    try:
+        date(year, month, day)
+    except ValueError:
+        return None
+    return f"{year}-{month:02d}-{day:02d}"
+
+
+def _day_month(first: int, second: int, year: int) -> Optional[str]:
+    """DD/MM (European) first, then MM/DD (American)"""
+    if 1 <= first <= 31 and 1 <= second <= 12:
+        result = _ymd(year, second, first)
+        if result:
+            return result
+    if 1 <= first <= 12 and 1 <= second <= 31:
+        return _ymd(year, first, second)
+    return None
+
+
+def _upcoming(month: int, day: int, today: date) -> Optional[str]:
+    """month/day this year, or next year if it is today or already past"""
+    year = today.year
+    try:
+        if date(year, month, day) <= today:
+            year += 1
+    except ValueError:
+        return None
+    return _ymd(year, month, day)
+
+
+def _upcoming_day_month(first: int, second: int, today: date) -> Optional[str]:
+    if 1 <= first <= 31 and 1 <= second <= 12:
+        result = _upcoming(second, first, today)
+        if result:
+            return result
+    if 1 <= first <= 12 and 1 <= second <= 31:
+        return _upcoming(first, second, today)
+    return None
+
+
+def _match_format(match: re.Match, text: str, today: date) -> Optional[str]:
+    g = match.group
+    kind = match.lastgroup
+    if kind == "iso":
+        # Returned as typed, like strptime("%Y-%m-%d") validation did
+        return text if _ymd(int(g("iso_y")), int(g("iso_m")), int(g("iso_d"))) else None
+    if kind == "numeric":
+        return _day_month(int(g("num_a")), int(g("num_b")), int(g("num_y")))
+    if kind == "dotted":
+        return _day_month(int(g("dot_a")), int(g("dot_b")), int(g("dot_y")))
+    if kind == "day_month_year":
+        return _ymd(int(g("dmy_y")), MONTH_NAMES[g("dmy_m").lower()], int(g("dmy_d")))
+    if kind == "month_day_year":
+        return _ymd(int(g("mdy_y")), MONTH_NAMES[g("mdy_m").lower()], int(g("mdy_d")))
+    if kind == "day_month":
+        return _upcoming(MONTH_NAMES[g("dm_m").lower()], int(g("dm_d")), today)
+    if kind == "month_day":
+        return _upcoming(MONTH_NAMES[g("md_m").lower()], int(g("md_d")), today)
+    return _upcoming_day_month(int(g("short_a")), int(g("short_b")), today)
+
+
+def _search_text(text: str, today: date) -> Optional[str]:
+    """
+    Find a date inside free text, trying each pattern in order. (Valid
+    YYYY-MM-DD strings never get here: the iso format accepts everything
+    strptime("%Y-%m-%d") does, including its space-padded day.)
+    """
+    for pattern in (_SLASH, _DOT):
+        match = pattern.search(text)
+        if match:
+            result = _day_month(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+            if result:
+                return result
+
+    match = _ORDINAL.search(text)
+    if match and match.group(2).lower() in MONTH_NAMES:
+        result = _ymd(int(match.group(3)), MONTH_NAMES[match.group(2).lower()], int(match.group(1)))
+        if result:
+            return result
+
+    match = _MONTH_FIRST.search(text)
+    if match and match.group(1).lower() in MONTH_NAMES:
+        result = _ymd(int(match.group(3)), MONTH_NAMES[match.group(1).lower()], int(match.group(2)))
+        if result:
+            return result
+
+    match = _ORDINAL_NO_YEAR.search(text)
+    if match and match.group(2).lower() in MONTH_NAMES:
+        result = _upcoming(MONTH_NAMES[match.group(2).lower()], int(match.group(1)), today)
+        if result:
+            return result
+
+    match = _MONTH_FIRST_NO_YEAR.search(text)
+    if match and match.group(1).lower() in MONTH_NAMES:
+        result = _upcoming(MONTH_NAMES[match.group(1).lower()], int(match.group(2)), today)
+        if result:
+            return result
+
+    match = _SHORT.search(text)
+    if match:
+        return _upcoming_day_month(int(match.group(1)), int(match.group(2)), today)
+    return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse(text: str, today: date) -> Optional[str]:
+    """Parse normalized text; today is part of the key because dates without a year depend on it"""
+    match = _FORMATS.fullmatch(text)
+    if match:
+        result = _match_format(match, text, today)
+        if result:
+            return result
+    # Not a whole-string format, or one whose values are invalid: fall back to
+    # searching, which may still find a date further into the text
+    return _search_text(text, today)
+
+
+def _normalize(date_string: str) -> str:
+    date_string = date_string.strip()
+    # Matching ignores case, so fold it for a better cache hit rate. Only ASCII:
+    # lowercasing some non-ASCII letters changes what [a-z] matches.
+    return date_string.lower() if date_string.isascii() else date_string
+
+
+class DateParser:
+    """Parse dates in various formats and convert to YYYY-MM-DD"""
+
+    MONTH_NAMES = MONTH_NAMES
+
+    @staticmethod
+    def parse_date(date_string: str) -> Optional[str]:
+        """
+        Parse date string in various formats and return YYYY-MM-DD format.
+
+        Supported formats:
+        - YYYY-MM-DD (2024-06-15)
+        - DD/MM/YYYY (15/06/2024)
+        - MM/DD/YYYY (06/15/2024)
+        - DD-MM-YYYY (15-06-2024)
+        - MM-DD-YYYY (06-15-2024)
+        - DD.MM.YYYY (15.06.2024)
+        - MM.DD.YYYY (06.15.2024)
+        - "15th June 2024" or "15 June 2024"
+        - "June 15, 2024" or "Jun 15, 2024"
+        - "15/06" or "15-06" (assumes current year)
+        - "June 15" or "15 June" (assumes current year)
+
+        Results are cached (LRU, CACHE_SIZE entries) on the normalized input and the current date.
+
+        Returns:
+            str: Date in YYYY-MM-DD format, or None if parsing fails
+        """
+        if not date_string:
+            return None
+        return _parse(_normalize(date_string), date.today())
+
+    @staticmethod
+    def parse_many(date_strings: Iterable[Optional[str]]) -> List[Optional[str]]:
+        """
+        Parse a batch of strings, e.g. every message of a chat transcript, with
+        one clock read for the whole batch.
+
+        Returns:
+            list: parse_date() result for each input, in order
+        """
+        today = date.today()
+        return [_parse(_normalize(s), today) if s else None for s in date_strings]
+
+    @staticmethod
+    def clear_cache():
+        _parse.cache_clear()
+
+    @staticmethod
+    def validate_date_format(date_string: str) -> bool:
+        """Validate if date string is in YYYY-MM-DD format"""
+        try:
+            datetime.strptime(date_string, "%Y-%m-%d")
+            return True
+        except ValueError:
+            return False
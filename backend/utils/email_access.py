@@ -0,0 +1,79 @@
+"""Signed, expiring access tokens that prove a caller can read a customer's email"""
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from typing import Optional
+
+from utils.state_files import load_or_create_secret, state_path
+
+_host_secret: Optional[bytes] = None
+_host_secret_lock = threading.Lock()
+
+
+def _secret() -> bytes:
+    """
+    EMAIL_ACCESS_SECRET, or else a secret generated once per host and kept in
+    STATE_DIR, so every worker and restart verifies the same tokens. There is no
+    per-process fallback: a token must verify whichever worker receives it.
+
+    Raises:
+        UnsafeStateFile: If the host secret file cannot be used
+    """
+    global _host_secret
+    configured = os.getenv("EMAIL_ACCESS_SECRET")
+    if configured:
+        return configured.encode("utf-8")
+    if _host_secret is None:
+        with _host_secret_lock:
+            if _host_secret is None:
+                path = state_path("flightbooking_email_access.key")
+                _host_secret = load_or_create_secret(path)
+                print(f"⚠️  EMAIL_ACCESS_SECRET not set; signing email access links with the host secret in {path} "
+                      "(set EMAIL_ACCESS_SECRET when running more than one host)")
+    return _host_secret
+
+
+def check_access_secret():
+    """Load the signing secret now, so a missing or unsafe one fails at startup rather than per request"""
+    _secret()
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode((text + "=" * (-len(text) % 4)).encode("ascii"))
+
+
+def _signature(payload: bytes) -> bytes:
+    return hmac.new(_secret(), payload, hashlib.sha256).digest()
+
+
+def issue_access_token(email: str, ttl: Optional[float] = None) -> str:
+    """
+    Token for the email-scoped endpoints (booking history, price watches),
+    valid for ttl seconds (default EMAIL_ACCESS_TTL or 24 hours). It is only
+    ever sent to the address itself, so holding it proves access to the inbox.
+    """
+    ttl = ttl if ttl is not None else float(os.getenv("EMAIL_ACCESS_TTL", "86400"))
+    payload = f"{email.strip().lower()}|{int(time.time() + ttl)}".encode("utf-8")
+    return f"{_b64(payload)}.{_b64(_signature(payload))}"
+
+
+def verify_access_token(token: Optional[str], email: str) -> bool:
+    """Whether token was issued for email and has not expired"""
+    if not token:
+        return False
+    try:
+        encoded_payload, encoded_signature = token.split(".")
+        payload = _unb64(encoded_payload)
+        if not hmac.compare_digest(_unb64(encoded_signature), _signature(payload)):
+            return False
+        token_email, expires_at = payload.decode("utf-8").rsplit("|", 1)
+        return token_email == email.strip().lower() and int(expires_at) > time.time()
+    except (ValueError, UnicodeDecodeError):
+        return False
@@ -0,0 +1,115 @@
+"""Cache-Control policies, ETags and conditional GETs for API responses"""
+import hashlib
+import re
+from typing import Iterable, List, Optional, Tuple
+
+from utils.metrics import record_cache_result
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag for a response body"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/"x" matches "x", and * matches anything"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class CachePolicy:
+    """Cache-Control for the routes matching methods and a path pattern"""
+
+    def __init__(self, methods: Iterable[str], path_pattern: str, cache_control: str):
+        self.methods = frozenset(m.upper() for m in methods)
+        self.path = re.compile(path_pattern)
+        self.cache_control = cache_control
+
+    def matches(self, method: str, path: str) -> bool:
+        return method in self.methods and self.path.fullmatch(path) is not None
+
+
+class HttpCacheMiddleware:
+    """
+    ASGI middleware that makes successful responses of the configured routes cacheable.
+
+    A 200 response gets the route's Cache-Control and an ETag: the one the route
+    already set (e.g. stored with a cached body), otherwise a hash of the body.
+    A GET or HEAD whose If-None-Match matches gets a 304 with no body instead;
+    the route has already run, so only the bytes are saved. Other methods never
+    get a 304 (RFC 9110 13.1.2 reserves it for GET and HEAD), so POST routes only
+    carry the headers. Other statuses and routes without a policy pass through untouched.
+    """
+
+    def __init__(self, app, policies: List[CachePolicy]):
+        self.app = app
+        self.policies = policies
+
+    def _policy(self, scope) -> Optional[CachePolicy]:
+        for policy in self.policies:
+            if policy.matches(scope["method"], scope["path"]):
+                return policy
+        return None
+
+    async def __call__(self, scope, receive, send):
+        policy = self._policy(scope) if scope["type"] == "http" else None
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = None
+        if scope["method"] in ("GET", "HEAD"):
+            for name, value in scope["headers"]:
+                if name == b"if-none-match":
+                    if_none_match = value.decode("latin-1")
+        start = None
+        chunks: List[bytes] = []
+
+        async def send_with_cache_headers(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                if message["status"] != 200:
+                    start = False
+                    await send(message)
+                else:
+                    # Hold the start until the body is complete: the ETag may depend on it
+                    start = message
+                return
+            if message["type"] != "http.response.body" or start is False:
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(chunks)
+            headers: List[Tuple[bytes, bytes]] = [
+                (name, value) for name, value in start.get("headers", []) if name != b"cache-control"
+            ]
+            etag = next((value.decode("latin-1") for name, value in headers if name == b"etag"), None)
+            if etag is None:
+                etag = make_etag(body)
+                headers.append((b"etag", etag.encode("latin-1")))
+            headers.append((b"cache-control", policy.cache_control.encode("latin-1")))
+
+            if if_none_match is not None and etag_matches(if_none_match, etag):
+                record_cache_result("http", "not_modified")
+                headers = [(name, value) for name, value in headers
+                           if name not in (b"content-length", b"content-type")]
+                await send({"type": "http.response.start", "status": 304, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            if if_none_match is not None:
+                record_cache_result("http", "modified")
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_with_cache_headers)
@@ -0,0 +1,127 @@
+"""Incremental parsing of large JSON responses as their bytes arrive"""
+import codecs
+import json
+from typing import Any, Iterable, Iterator
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_NUMBER_TAIL = "0123456789.eE+-"
+
+
+class JsonStreamError(ValueError):
+    """The streamed document is not valid JSON, or not an object holding the requested array"""
+
+
+def iter_json_array(chunks: Iterable[bytes], key: str = "data") -> Iterator[Any]:
+    """
+    Yield the items of the array under a top-level key of a UTF-8 JSON object,
+    each as soon as its last byte has arrived.
+
+    Only the undecoded tail (at most one partial item plus the latest chunk)
+    is buffered, so the whole document is never held in memory. Items are
+    decoded by the C json decoder; other top-level members are decoded and
+    dropped. The rest of the stream is still read after the array ends, so
+    the connection can be reused.
+
+    Raises:
+        JsonStreamError: Invalid JSON, or no array under key
+    """
+    decode_utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    eof = False
+    chunks = iter(chunks)
+
+    def more() -> bool:
+        """Append the next chunk to buf (dropping what was consumed); False once the stream had already ended"""
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        try:
+            data = next(chunks)
+        except StopIteration:
+            eof = True
+            data = b""
+        text = decode_utf8.decode(data, final=eof)
+        buf = buf[pos:] + text
+        pos = 0
+        return True
+
+    def skip_whitespace() -> bool:
+        """Advance to the next significant character, reading more as needed; False at end of stream"""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf):
+                return True
+            if not more():
+                return False
+
+    def value() -> Any:
+        """Decode the value at pos, waiting for more bytes while it may still be incomplete"""
+        nonlocal pos
+        while True:
+            try:
+                result, end = _decoder.raw_decode(buf, pos)
+                # A number may continue in the next chunk ("4" of "4.5e3"): wait until something follows it
+                if eof or (end < len(buf) and buf[end] not in _NUMBER_TAIL):
+                    pos = end
+                    return result
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise JsonStreamError(f"invalid JSON: {e}") from e
+            if not more():
+                raise JsonStreamError("JSON ended early")
+
+    def peek() -> str:
+        """The next significant character, left unconsumed"""
+        if not skip_whitespace():
+            raise JsonStreamError("JSON ended early")
+        return buf[pos]
+
+    def expect(options: str) -> str:
+        """Consume the next significant character, which must be one of options"""
+        nonlocal pos
+        char = peek()
+        if char not in options:
+            raise JsonStreamError(f"expected one of {options!r} at {char!r}")
+        pos += 1
+        return char
+
+    def at(char: str) -> bool:
+        """Consume char if it is the next significant character"""
+        nonlocal pos
+        if peek() == char:
+            pos += 1
+            return True
+        return False
+
+    expect("{")
+    found = False
+    if not at("}"):
+        while True:
+            if peek() != '"':
+                raise JsonStreamError("expected an object key")
+            member = value()
+            expect(":")
+            if member == key:
+                expect("[")
+                found = True
+                if not at("]"):
+                    while True:
+                        peek()
+                        yield value()
+                        if expect(",]") == "]":
+                            break
+            else:
+                peek()
+                value()
+            if expect(",}") == "}":
+                break
+
+    # Drain the rest of the response
+    while more():
+        pass
+    if not found:
+        raise JsonStreamError(f"no {key!r} array in the response")
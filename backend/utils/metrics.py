@@ -0,0 +1,169 @@
+"""Prometheus metrics for upstream calls, caches and the search pipeline"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, REGISTRY
+from prometheus_client import multiprocess
+
+from utils.tracing import traced
+
+# Upstream calls range from ~50 ms (token) to 30 s (timeouts on large searches)
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 8, 13, 20, 30)
+# CPU-bound stages on the event loop: sub-millisecond to a few hundred ms
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds",
+    "Latency of calls to upstream APIs",
+    ["service", "endpoint"],
+    buckets=UPSTREAM_BUCKETS
+)
+
+UPSTREAM_ERRORS = Counter(
+    "upstream_errors",
+    "Upstream calls that failed, by HTTP status or 'exception' for network errors",
+    ["service", "endpoint", "status"]
+)
+
+UPSTREAM_AUTH_RETRIES = Counter(
+    "upstream_auth_retries",
+    "Calls retried after a 401 with a refreshed token",
+    ["service", "endpoint"]
+)
+
+UPSTREAM_RETRIES = Counter(
+    "upstream_retries",
+    "Upstream calls retried, by the status code or exception that triggered the retry",
+    ["service", "endpoint", "reason"]
+)
+
+UPSTREAM_RETRY_DELAY = Histogram(
+    "upstream_retry_delay_seconds",
+    "Time spent waiting before upstream retries (backoff or Retry-After)",
+    ["service", "endpoint"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30)
+)
+
+UPSTREAM_SHORT_CIRCUITS = Counter(
+    "upstream_short_circuits",
+    "Calls rejected without contacting the upstream because its circuit was open",
+    ["service", "endpoint"]
+)
+
+UPSTREAM_CIRCUIT_OPENS = Counter(
+    "upstream_circuit_opens",
+    "Times an endpoint's circuit breaker opened",
+    ["service", "endpoint"]
+)
+
+UPSTREAM_HEDGES = Counter(
+    "upstream_hedges",
+    "Hedged (duplicate) requests sent after the p95 delay, by which attempt answered first",
+    ["service", "endpoint", "winner"]
+)
+
+UPSTREAM_THROTTLE_WAIT = Histogram(
+    "upstream_throttle_wait_seconds",
+    "Time calls waited for a rate-limit token, by priority class",
+    ["service", "priority"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30)
+)
+
+UPSTREAM_THROTTLED = Counter(
+    "upstream_throttled",
+    "Calls refused because no rate-limit token was available within the priority's maximum wait",
+    ["service", "priority"]
+)
+
+CACHE_REQUESTS = Counter(
+    "cache_requests",
+    "Cache lookups by cache name and result (hit, miss, stale, or too_large for values over the size limit)",
+    ["cache", "result"]
+)
+
+CACHE_EVICTIONS = Counter(
+    "cache_evictions",
+    "Shared cache entries evicted before expiry to stay within the byte limit",
+    ["backend"]
+)
+
+CACHE_BACKEND_ERRORS = Counter(
+    "cache_backend_errors",
+    "Shared cache operations that failed and were treated as a miss or a dropped write",
+    ["backend", "operation"]
+)
+
+CPU_OFFLOADS = Counter(
+    "cpu_offloads",
+    "CPU-heavy calls by task and where they ran (inline, or process for the offload pool)",
+    ["task", "where"]
+)
+
+STAGE_LATENCY = Histogram(
+    "search_stage_duration_seconds",
+    "Time spent in each local stage of the search pipeline",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+
+
+def record_upstream(service: str, endpoint: str, seconds: float, status=None):
+    """Record one upstream call; status is the HTTP status code or None for a network error"""
+    UPSTREAM_LATENCY.labels(service, endpoint).observe(seconds)
+    if status is None:
+        UPSTREAM_ERRORS.labels(service, endpoint, "exception").inc()
+    elif status >= 400:
+        UPSTREAM_ERRORS.labels(service, endpoint, str(status)).inc()
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_cache_result(cache: str, result: str):
+    """Record a lookup whose result is neither hit nor miss, e.g. stale"""
+    CACHE_REQUESTS.labels(cache, result).inc()
+
+
+@contextmanager
+def time_stage(stage: str):
+    """
+    Observe the duration of a block in search_stage_duration_seconds.
+
+    The block is also traced as a span of the same name, so it shows up in the
+    request's trace and Server-Timing header.
+    """
+    started = time.perf_counter()
+    try:
+        with traced(stage):
+            yield
+    finally:
+        STAGE_LATENCY.labels(stage).observe(time.perf_counter() - started)
+
+
+def multiprocess_enabled() -> bool:
+    return bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Metrics in Prometheus text format.
+
+    With PROMETHEUS_MULTIPROC_DIR set (as the startup scripts do), values are
+    aggregated from every uvicorn worker's files in that directory, so any
+    worker can answer a scrape for the whole server.
+    """
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_exit(pid: int):
+    """Release a worker's live metric files when it shuts down"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,87 @@
+"""Metro areas (IATA city codes) and their airports, for nearby-airport searches"""
+import os
+from itertools import product
+from typing import Dict, List, Optional, Tuple
+
+# IATA city code -> airports, busiest first. Where the city code is also an
+# airport code (e.g. DXB), the others are only added for nearby-airport searches.
+METRO_AREAS: Dict[str, Tuple[str, ...]] = {
+    "LON": ("LHR", "LGW", "STN", "LTN", "LCY", "SEN"),
+    "PAR": ("CDG", "ORY", "BVA"),
+    "MIL": ("MXP", "LIN", "BGY"),
+    "ROM": ("FCO", "CIA"),
+    "BRU": ("BRU", "CRL"),
+    "STO": ("ARN", "BMA", "NYO"),
+    "OSL": ("OSL", "TRF"),
+    "GLA": ("GLA", "PIK"),
+    "BCN": ("BCN", "GRO", "REU"),
+    "VCE": ("VCE", "TSF"),
+    "NYC": ("JFK", "EWR", "LGA"),
+    "WAS": ("IAD", "DCA", "BWI"),
+    "CHI": ("ORD", "MDW"),
+    "LAX": ("LAX", "BUR", "LGB", "SNA", "ONT"),
+    "SFO": ("SFO", "OAK", "SJC"),
+    "MIA": ("MIA", "FLL"),
+    "YTO": ("YYZ", "YTZ"),
+    "BUE": ("EZE", "AEP"),
+    "SAO": ("GRU", "CGH", "VCP"),
+    "RIO": ("GIG", "SDU"),
+    "DXB": ("DXB", "DWC"),
+    "TYO": ("HND", "NRT"),
+    "OSA": ("KIX", "ITM"),
+    "SEL": ("ICN", "GMP"),
+    "BJS": ("PEK", "PKX"),
+    "SHA": ("PVG", "SHA"),
+    "BKK": ("BKK", "DMK"),
+    "JKT": ("CGK", "HLP"),
+}
+
+# City names travellers type, as the city code
+CITY_NAMES: Dict[str, str] = {
+    "LONDON": "LON", "PARIS": "PAR", "MILAN": "MIL", "ROME": "ROM", "BRUSSELS": "BRU", "STOCKHOLM": "STO",
+    "OSLO": "OSL", "GLASGOW": "GLA", "BARCELONA": "BCN", "VENICE": "VCE", "NEW YORK": "NYC",
+    "WASHINGTON": "WAS", "CHICAGO": "CHI", "LOS ANGELES": "LAX", "SAN FRANCISCO": "SFO", "MIAMI": "MIA",
+    "TORONTO": "YTO", "BUENOS AIRES": "BUE", "SAO PAULO": "SAO", "RIO DE JANEIRO": "RIO", "DUBAI": "DXB",
+    "TOKYO": "TYO", "OSAKA": "OSA", "SEOUL": "SEL", "BEIJING": "BJS", "SHANGHAI": "SHA", "BANGKOK": "BKK",
+    "JAKARTA": "JKT",
+}
+
+_METRO_OF_AIRPORT: Dict[str, str] = {
+    airport: city for city, airports in METRO_AREAS.items() for airport in airports
+}
+
+
+def metro_airports(location: str, nearby: bool = False) -> List[str]:
+    """
+    Locations to search for a location, as IATA codes (a city name such as
+    "London" becomes its city code). Without nearby that is the code alone:
+    Amadeus searches every airport of a city code itself, in one call. With
+    nearby, a city code becomes its airports, and an airport of a metro area
+    comes first, followed by the area's other airports.
+    """
+    code = location.strip().upper()
+    code = CITY_NAMES.get(code, code)
+    if not nearby:
+        return [code]
+    airports = METRO_AREAS.get(code)
+    if airports is not None and code not in airports:
+        return list(airports)
+    if code in _METRO_OF_AIRPORT:
+        return [code] + [a for a in METRO_AREAS[_METRO_OF_AIRPORT[code]] if a != code]
+    return [code]
+
+
+def airport_pairs(origin: str, destination: str, nearby: bool = False,
+                  limit: Optional[int] = None) -> List[Tuple[str, str]]:
+    """
+    (origin, destination) pairs to search, most important first (the busiest
+    or requested airports on both sides), at most limit (default METRO_MAX_PAIRS
+    or 6). Without nearby this is the one requested pair. A pair with the same
+    airport at both ends is skipped.
+    """
+    limit = limit or int(os.getenv("METRO_MAX_PAIRS", "6"))
+    origins = metro_airports(origin, nearby)
+    destinations = metro_airports(destination, nearby)
+    ranked = sorted(product(enumerate(origins), enumerate(destinations)), key=lambda p: (p[0][0] + p[1][0], p[0][0]))
+    pairs = [(o, d) for (_, o), (_, d) in ranked if o != d]
+    return pairs[:limit]
@@ -0,0 +1,92 @@
+"""Run CPU-heavy response processing in a process pool, off this worker's GIL"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional, Union
+
+from utils.metrics import CPU_OFFLOADS
+
+INLINE = "inline"
+PROCESS = "process"
+
+
+def _noop() -> int:
+    return os.getpid()
+
+
+class CpuOffload:
+    """
+    Runs func(payload, *args) in this process or in a pool of helper processes.
+
+    Search handlers run in threads, so decoding and categorizing a large
+    response holds the GIL that the event loop and every other request thread
+    of the worker need. In "process" mode, payloads of at least min_bytes are
+    sent to the pool instead: only the bytes go over and only the (much
+    smaller) summary comes back. Smaller payloads run inline, where the round
+    trip would cost more than it saves. "inline" mode never offloads.
+
+    func must be a module-level function (it is pickled by name). Helpers start
+    with forkserver (spawn where unavailable), never fork: the worker has
+    threads. If a helper dies, the pool is replaced and the call runs inline.
+    """
+
+    def __init__(self, task: str, mode: Optional[str] = None, min_bytes: Optional[int] = None,
+                 workers: Optional[int] = None):
+        """
+        Args:
+            task: Label for the cpu_offloads metric, e.g. "search"
+            mode: inline or process (default CPU_OFFLOAD_MODE or inline)
+            min_bytes: Smallest payload sent to the pool (default CPU_OFFLOAD_MIN_BYTES or 262144)
+            workers: Helper processes (default CPU_OFFLOAD_WORKERS or 2)
+        """
+        self.task = task
+        self.mode = (mode or os.getenv("CPU_OFFLOAD_MODE", INLINE)).lower()
+        if self.mode not in (INLINE, PROCESS):
+            raise ValueError(f"Unknown CPU_OFFLOAD_MODE {self.mode!r} (expected inline or process)")
+        self.min_bytes = min_bytes if min_bytes is not None else int(os.getenv("CPU_OFFLOAD_MIN_BYTES", "262144"))
+        self.workers = workers or int(os.getenv("CPU_OFFLOAD_WORKERS", "2"))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._pool
+
+    def run(self, func: Callable[..., Any], payload: Union[bytes, List[bytes]], *args) -> Any:
+        """func(payload, *args), in the pool if the mode and payload size (in total, for a list) call for it"""
+        size = len(payload) if isinstance(payload, bytes) else sum(len(part) for part in payload)
+        if self.mode != PROCESS or size < self.min_bytes:
+            CPU_OFFLOADS.labels(self.task, INLINE).inc()
+            return func(payload, *args)
+        pool = self._get_pool()
+        try:
+            result = pool.submit(func, payload, *args).result()
+        except BrokenProcessPool as e:
+            print(f"⚠️  {self.task} offload pool broke ({e}); restarting it and running inline")
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            pool.shutdown(wait=False)
+            CPU_OFFLOADS.labels(self.task, INLINE).inc()
+            return func(payload, *args)
+        CPU_OFFLOADS.labels(self.task, PROCESS).inc()
+        return result
+
+    def warm_up(self):
+        """Start the helper processes now, so the first large search does not wait for them"""
+        if self.mode == PROCESS:
+            pool = self._get_pool()
+            for future in [pool.submit(_noop) for _ in range(self.workers)]:
+                future.result()
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
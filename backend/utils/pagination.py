@@ -0,0 +1,28 @@
+"""Opaque cursors for keyset-paginated endpoints"""
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+def encode_cursor(key: Optional[Tuple[datetime, int]]) -> Optional[str]:
+    """Encode a (created_at, id) keyset position as a URL-safe token"""
+    if key is None:
+        return None
+    created_at, row_id = key
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a token produced by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
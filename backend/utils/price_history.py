@@ -0,0 +1,156 @@
+"""Append-only history of the cheapest fare seen per route and travel date, shared by every worker on the host"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from utils.state_files import ensure_private_file, state_path
+
+
+class PriceHistory:
+    """
+    Cheapest one-way fares observed by searches, kept in a SQLite file.
+
+    Fares are fixed-width integer records (route id, travel day, observed at,
+    price in cents) in a WITHOUT ROWID table clustered by route and day, so a
+    route's date range is one contiguous read. Records are only ever appended;
+    a periodic sweep drops those older than the retention period. Alongside,
+    the latest future-deal candidate per route and day is kept (compressed),
+    so a future-deal card can be shown without searching again.
+
+    A route is everything that changes the fare besides the date: airports,
+    passengers, cabin and currency (see route_key). If the store cannot be
+    reached, lookups return nothing and records are dropped (fail open).
+    """
+
+    SWEEP_EVERY = 3600.0
+
+    def __init__(self, path: Optional[str] = None, retention_days: Optional[float] = None):
+        """
+        Args:
+            path: SQLite file (default PRICE_HISTORY_DB, or flightbooking_prices.sqlite in STATE_DIR)
+            retention_days: Days records are kept (default PRICE_HISTORY_RETENTION_DAYS or 90)
+        """
+        self.path = path or os.getenv("PRICE_HISTORY_DB", state_path("flightbooking_prices.sqlite"))
+        self.retention = 86400 * (retention_days if retention_days is not None
+                                  else float(os.getenv("PRICE_HISTORY_RETENTION_DAYS", "90")))
+        self._local = threading.local()
+        self._route_ids: Dict[str, int] = {}
+        self._next_sweep = 0.0
+
+    @staticmethod
+    def route_key(origin: str, destination: str, adults: int = 1, children: int = 0, infants: int = 0,
+                  travel_class: Optional[str] = None, currency: str = "GBP") -> str:
+        return (f"{origin.upper()}-{destination.upper()}|{adults}/{children}/{infants}"
+                f"|{(travel_class or '').upper()}|{currency.upper()}")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            ensure_private_file(self.path)
+            conn = sqlite3.connect(self.path, timeout=2, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS routes (id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fares (route INTEGER NOT NULL, day INTEGER NOT NULL, "
+                "observed INTEGER NOT NULL, cents INTEGER NOT NULL, PRIMARY KEY (route, day, observed)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS deals (route INTEGER NOT NULL, day INTEGER NOT NULL, "
+                "observed INTEGER NOT NULL, flight BLOB NOT NULL, PRIMARY KEY (route, day)) WITHOUT ROWID"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _failed(self, action: str, error: sqlite3.Error):
+        print(f"⚠️  Price history unavailable ({error}); {action}")
+        self._local.conn = None
+
+    def _route_id(self, conn: sqlite3.Connection, route: str, create: bool) -> Optional[int]:
+        route_id = self._route_ids.get(route)
+        if route_id is None:
+            if create:
+                conn.execute("INSERT OR IGNORE INTO routes (key) VALUES (?)", (route,))
+            row = conn.execute("SELECT id FROM routes WHERE key = ?", (route,)).fetchone()
+            if row is None:
+                return None
+            route_id = self._route_ids[route] = row[0]
+        return route_id
+
+    def record(self, route: str, travel_date: str, price: float, deal: Optional[Dict] = None):
+        """
+        Append one observation: the cheapest fare a search found for route on travel_date (YYYY-MM-DD),
+        and optionally the future-deal card built from the same search
+        """
+        try:
+            day = date.fromisoformat(travel_date).toordinal()
+        except ValueError as e:
+            # Recording is best effort: a bad date must not fail the search that found the fare
+            print(f"⚠️  Fare for {route} not recorded: {e}")
+            return
+        now = int(time.time())
+        try:
+            conn = self._connection()
+            route_id = self._route_id(conn, route, create=True)
+            conn.execute("INSERT OR IGNORE INTO fares (route, day, observed, cents) VALUES (?, ?, ?, ?)",
+                         (route_id, day, now, round(price * 100)))
+            if deal is not None:
+                flight = zlib.compress(json.dumps(deal, separators=(",", ":")).encode())
+                conn.execute("INSERT OR REPLACE INTO deals (route, day, observed, flight) VALUES (?, ?, ?, ?)",
+                             (route_id, day, now, flight))
+            self._maybe_sweep(conn, now)
+        except sqlite3.Error as e:
+            self._failed("fare not recorded", e)
+
+    def history(self, route: str, start: str, end: str, since: Optional[float] = None) -> List[Tuple[str, float, float]]:
+        """Every observation for travel dates start..end (inclusive), oldest first: (date, observed_at, price)"""
+        try:
+            conn = self._connection()
+            route_id = self._route_id(conn, route, create=False)
+            if route_id is None:
+                return []
+            rows = conn.execute(
+                "SELECT day, observed, cents FROM fares WHERE route = ? AND day BETWEEN ? AND ? AND observed >= ? "
+                "ORDER BY day, observed",
+                (route_id, date.fromisoformat(start).toordinal(), date.fromisoformat(end).toordinal(), since or 0)
+            ).fetchall()
+        except sqlite3.Error as e:
+            self._failed("no history returned", e)
+            return []
+        return [(date.fromordinal(day).isoformat(), observed, cents / 100) for day, observed, cents in rows]
+
+    def latest(self, route: str, start: str, end: str, max_age: float) -> Dict[str, float]:
+        """Most recent price per travel date in start..end, among observations at most max_age seconds old"""
+        latest = {}
+        for travel_date, _, price in self.history(route, start, end, since=time.time() - max_age):
+            latest[travel_date] = price
+        return latest
+
+    def deal(self, route: str, travel_date: str, max_age: float) -> Optional[Dict]:
+        """The future-deal card recorded for route on travel_date, if at most max_age seconds old"""
+        try:
+            conn = self._connection()
+            route_id = self._route_id(conn, route, create=False)
+            if route_id is None:
+                return None
+            row = conn.execute(
+                "SELECT flight FROM deals WHERE route = ? AND day = ? AND observed >= ?",
+                (route_id, date.fromisoformat(travel_date).toordinal(), int(time.time() - max_age))
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("no deal returned", e)
+            return None
+        return json.loads(zlib.decompress(row[0])) if row is not None else None
+
+    def _maybe_sweep(self, conn: sqlite3.Connection, now: float):
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.SWEEP_EVERY
+        cutoff = int(now - self.retention)
+        conn.execute("DELETE FROM fares WHERE observed < ?", (cutoff,))
+        conn.execute("DELETE FROM deals WHERE observed < ?", (cutoff,))
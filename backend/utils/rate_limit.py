@@ -0,0 +1,150 @@
+"""Token-bucket rate limiting for upstream calls, shared by every worker on the host"""
+import contextvars
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import requests
+
+from utils.state_files import ensure_private_file, state_path
+
+# Priority classes, most important first
+INTERACTIVE = "interactive"   # live user searches, pricing, seat maps, payments
+BATCH = "batch"               # calendar fan-outs and future-deal lookups
+BACKGROUND = "background"     # warm-up, refreshers and hedged duplicates
+
+# Share of the bucket each class must leave untouched, so bursts of lower
+# priority work cannot starve interactive calls
+RESERVE = {INTERACTIVE: 0.0, BATCH: 0.3, BACKGROUND: 0.6}
+# Longest a call waits for a token before giving up
+MAX_WAIT = {INTERACTIVE: 5.0, BATCH: 20.0, BACKGROUND: 30.0}
+# Smallest bucket in which every class can still take a token above its reserve
+MIN_BURST = max(1.0 / (1.0 - reserve) for reserve in RESERVE.values())
+
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("upstream_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level: str):
+    """Run upstream calls made inside the block (including from copied contexts) at this priority"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+class RateLimitExceeded(requests.exceptions.RequestException):
+    """No token became available within the priority's maximum wait"""
+
+
+class SharedTokenBucket:
+    """
+    Token bucket whose state lives in a SQLite file, so every uvicorn worker
+    (and any script) on the host draws from the same budget.
+
+    Each acquire is one short IMMEDIATE transaction: refill from the elapsed
+    time, then take a token if the bucket holds more than the caller's priority
+    must leave in reserve. If the store cannot be reached the call is allowed
+    (fail open): the limiter protects the upstream quota, it must not take the
+    site down.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, path: Optional[str] = None):
+        """
+        Args:
+            name: Bucket name, e.g. "amadeus"
+            rate: Tokens added per second
+            burst: Bucket capacity, at least MIN_BURST
+            path: SQLite file (default RATE_LIMIT_DB, or flightbooking_ratelimit.sqlite in STATE_DIR)
+
+        Raises:
+            ValueError: If rate is not positive, or burst is so small that a lower
+                priority's reserve leaves it no token (it would only ever time out)
+        """
+        if rate <= 0:
+            raise ValueError(f"{name} rate limit must be positive, got {rate}")
+        starved = [level for level, reserve in RESERVE.items() if burst - reserve * burst < 1]
+        if starved:
+            raise ValueError(
+                f"{name} rate limit burst {burst:g} leaves no capacity for {', '.join(starved)} calls "
+                f"(reserves {', '.join(f'{level} {RESERVE[level]:.0%}' for level in starved)}); use at least {MIN_BURST:g}"
+            )
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.path = path or os.getenv("RATE_LIMIT_DB", state_path("flightbooking_ratelimit.sqlite"))
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            ensure_private_file(self.path)
+            conn = sqlite3.connect(self.path, timeout=2, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def try_acquire(self, level: str = INTERACTIVE) -> float:
+        """Take a token if one is available to this priority; returns 0, or seconds to wait before trying again"""
+        reserve = RESERVE[level] * self.burst
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+                tokens = self.burst if row is None else min(self.burst, row[0] + max(0.0, now - row[1]) * self.rate)
+                if tokens >= reserve + 1:
+                    tokens -= 1
+                    wait = 0.0
+                else:
+                    wait = (reserve + 1 - tokens) / self.rate
+                conn.execute(
+                    "INSERT INTO buckets (name, tokens, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                    (self.name, tokens, now)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return wait
+        except sqlite3.Error as e:
+            print(f"⚠️  Rate limiter store unavailable ({e}); allowing {self.name} call")
+            self._local.conn = None
+            return 0.0
+
+    def acquire(self, level: Optional[str] = None) -> float:
+        """
+        Block until a token is available to the priority (default: the current context's).
+
+        Returns:
+            Seconds waited
+
+        Raises:
+            RateLimitExceeded: No token within MAX_WAIT for the priority
+        """
+        level = level or current_priority()
+        started = time.monotonic()
+        deadline = started + MAX_WAIT[level]
+        while True:
+            wait = self.try_acquire(level)
+            if wait == 0:
+                return time.monotonic() - started
+            if time.monotonic() + wait > deadline:
+                raise RateLimitExceeded(f"{self.name} rate limit: no {level} capacity within {MAX_WAIT[level]:.0f}s")
+            # Jitter so waiting workers do not retry in lockstep
+            time.sleep(wait * random.uniform(1.0, 1.5))
@@ -0,0 +1,129 @@
+"""Circuit breaker, latency tracking and hedging budget for upstream calls"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, Optional
+
+import requests
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling an upstream endpoint whose circuit is open"""
+
+    def __init__(self, service: str, endpoint: str, retry_in: float):
+        super().__init__(f"{service} {endpoint} circuit open after repeated failures; retry in {retry_in:.0f}s")
+        self.service = service
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one upstream endpoint.
+
+    closed:    calls go through; failure_threshold failures in a row open the circuit
+    open:      calls fail fast with CircuitOpenError for reset_timeout seconds
+    half_open: one trial call goes through; success closes the circuit, failure reopens it
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> Optional[float]:
+        """None if the call may proceed, otherwise seconds until the next trial call"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return None
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                remaining = self.opened_at + self.reset_timeout - now
+                if remaining > 0:
+                    return remaining
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                return self.reset_timeout
+            self._trial_in_flight = True
+            return None
+
+    def cancel(self):
+        """The call allowed by allow() was never made; release the half-open trial slot"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Record a failed call; True if this opened the circuit"""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                opened = self.state != self.OPEN
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+                return opened
+            return False
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies (seconds) for one endpoint"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Latency at pct (0-100), or None until min_samples calls have been seen"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+class HedgeBudget:
+    """
+    Caps hedged requests to a fraction of eligible calls.
+
+    Every eligible call adds `ratio` tokens (up to `burst`); a hedge spends one.
+    """
+
+    def __init__(self, ratio: float = 0.1, burst: float = 10):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
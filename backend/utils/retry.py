@@ -0,0 +1,94 @@
+"""Retry policy and call deadlines for upstream requests"""
+import contextvars
+import os
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import requests
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("upstream_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """
+    Give upstream calls inside the block (including retries) at most `seconds`
+    in total. Nested deadlines can only shorten the outer one.
+    """
+    at = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(min(at, outer) if outer is not None else at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline() -> Optional[float]:
+    """Absolute time.monotonic() deadline of the calling context, if any"""
+    return _deadline.get()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy:
+    """
+    When and how long to wait before retrying an upstream call.
+
+    Retries network errors and 429/5xx responses, up to max_attempts in total.
+    The wait honours Retry-After when the upstream sends it, and is otherwise
+    "full jitter" exponential backoff: uniform(0, min(max_delay, base_delay * 2^n)).
+    """
+
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, max_attempts: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None):
+        """
+        Args:
+            max_attempts: Attempts including the first (default UPSTREAM_RETRY_ATTEMPTS or 3)
+            base_delay: First backoff ceiling in seconds (default UPSTREAM_RETRY_BASE_DELAY or 0.25)
+            max_delay: Largest backoff ceiling in seconds (default UPSTREAM_RETRY_MAX_DELAY or 4)
+        """
+        self.max_attempts = max_attempts or int(os.getenv("UPSTREAM_RETRY_ATTEMPTS", "3"))
+        self.base_delay = base_delay if base_delay is not None else float(os.getenv("UPSTREAM_RETRY_BASE_DELAY", "0.25"))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv("UPSTREAM_RETRY_MAX_DELAY", "4"))
+
+    def should_retry_status(self, status_code: int) -> bool:
+        return status_code in self.RETRY_STATUSES
+
+    @staticmethod
+    def should_retry_error(error: requests.exceptions.RequestException) -> bool:
+        """Network-level failures; not bad URLs, bad requests or our own fail-fast errors"""
+        return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                                  requests.exceptions.ChunkedEncodingError))
+
+    def delay(self, retry_number: int, response: Optional[requests.Response] = None) -> float:
+        """Seconds to wait before retry number retry_number (0 for the first retry)"""
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return retry_after
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry_number)))
@@ -0,0 +1,104 @@
+"""Location and ownership checks for the SQLite files every worker on the host shares"""
+import os
+import secrets
+import sqlite3
+import stat
+import tempfile
+
+# Directory for the default store files (cache, rate limiter, tokens, price history)
+STATE_DIR = os.getenv("STATE_DIR") or os.path.join(
+    tempfile.gettempdir(), f"flightbooking-{os.getuid()}" if hasattr(os, "getuid") else "flightbooking"
+)
+
+
+class UnsafeStateFile(sqlite3.OperationalError):
+    """
+    A store file (or the state directory) that another user could have written.
+    Raised where SQLite errors are, so every store treats it as unavailable (fail open).
+    """
+
+
+def state_path(filename: str) -> str:
+    """Default path of a store file, inside STATE_DIR"""
+    return os.path.join(STATE_DIR, filename)
+
+
+def _check_owner(path: str, info: os.stat_result, forbidden_mode: int):
+    if not hasattr(os, "getuid"):
+        return
+    if info.st_uid != os.getuid() or info.st_mode & forbidden_mode:
+        raise UnsafeStateFile(
+            f"refusing {path}: it must be owned by uid {os.getuid()} and not accessible to others "
+            f"(owner uid {info.st_uid}, mode {stat.S_IMODE(info.st_mode):o})"
+        )
+
+
+def _ensure_state_dir():
+    os.makedirs(STATE_DIR, mode=0o700, exist_ok=True)
+    info = os.lstat(STATE_DIR)
+    if not stat.S_ISDIR(info.st_mode):
+        raise UnsafeStateFile(f"refusing {STATE_DIR}: not a directory")
+    _check_owner(STATE_DIR, info, 0o022)
+
+
+def _in_state_dir(path: str) -> bool:
+    return os.path.dirname(os.path.abspath(path)) == os.path.abspath(STATE_DIR)
+
+
+def ensure_private_file(path: str):
+    """
+    Create path owner-only (0600) if missing, and check it before SQLite opens it:
+    it must be a regular file (not a symlink) owned by this user with no group or
+    other permissions. Store contents are trusted once read (the cache unpickles
+    them), so a file someone else planted is refused rather than used.
+
+    Raises:
+        UnsafeStateFile: If the file or the state directory fails the check
+    """
+    try:
+        if _in_state_dir(path):
+            _ensure_state_dir()
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600)
+    except OSError as e:
+        raise UnsafeStateFile(f"cannot open {path}: {e}") from e
+    try:
+        info = os.fstat(fd)
+    finally:
+        os.close(fd)
+    if not stat.S_ISREG(info.st_mode):
+        raise UnsafeStateFile(f"refusing {path}: not a regular file")
+    _check_owner(path, info, 0o077)
+
+
+def load_or_create_secret(path: str, nbytes: int = 32) -> bytes:
+    """
+    Random secret stored in path: the first process on the host generates it
+    (owner-only), every other worker and later restart reads the same one.
+
+    Raises:
+        UnsafeStateFile: If the file fails the ensure_private_file check, or cannot be read or written
+    """
+    try:
+        if _in_state_dir(path):
+            _ensure_state_dir()
+        if not os.path.lexists(path):
+            # Write it completely under a private name, then link it into place:
+            # of several workers starting at once, exactly one link succeeds
+            candidate = f"{path}.{os.getpid()}.tmp"
+            fd = os.open(candidate, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_NOFOLLOW", 0), 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(nbytes))
+            try:
+                os.link(candidate, path)
+            except FileExistsError:
+                pass
+            finally:
+                os.unlink(candidate)
+        ensure_private_file(path)
+        with open(path, encoding="ascii") as f:
+            secret = f.read().strip()
+    except (OSError, ValueError) as e:
+        raise UnsafeStateFile(f"cannot use secret file {path}: {e}") from e
+    if not secret:
+        raise UnsafeStateFile(f"secret file {path} is empty")
+    return secret.encode("ascii")
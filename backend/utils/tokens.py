@@ -0,0 +1,217 @@
+"""OAuth access tokens shared by every thread and worker on the host, refreshed before they expire"""
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+from utils.metrics import record_cache
+from utils.state_files import ensure_private_file, state_path
+
+# Fraction of a token's lifetime after which it is refreshed in the background
+REFRESH_RATIO = float(os.getenv("TOKEN_REFRESH_RATIO", "0.8"))
+# Longest one worker may hold the fetch lease before another worker takes over
+LEASE_SECONDS = 15.0
+
+
+class SharedAccessToken:
+    """
+    An access token fetched once for the whole host and kept fresh in the background.
+
+    The token, its expiry and a fetch lease live in a SQLite file (readable only
+    by the owner). A thread that needs a token first checks this process's copy,
+    then the store; only the holder of the lease calls fetch, while every other
+    thread and worker waits for it to write the result. A daemon thread refreshes
+    the token once REFRESH_RATIO of its lifetime has passed, so requests keep
+    using a valid token and never wait for the token endpoint.
+
+    If the store cannot be reached the token is fetched by this process alone
+    (fail open), as with the rate limiter.
+    """
+
+    def __init__(self, name: str, fetch: Callable[[], Tuple[str, float]], path: Optional[str] = None):
+        """
+        Args:
+            name: Store key; include anything that distinguishes credentials, e.g. "paypal:<client hash>"
+            fetch: Calls the token endpoint and returns (access_token, expires_in seconds)
+            path: SQLite file (default TOKEN_STORE_DB, or flightbooking_tokens.sqlite in STATE_DIR)
+        """
+        self.name = name
+        self.metric_name = name.split(":", 1)[0] + "_token"
+        self.fetch = fetch
+        self.path = path or os.getenv("TOKEN_STORE_DB", state_path("flightbooking_tokens.sqlite"))
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._refresher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def get(self) -> str:
+        """Return a valid token, fetching one only if neither this process nor the store has it"""
+        token = self._token
+        if token and time.time() < self._usable_until():
+            record_cache(self.metric_name, hit=True)
+            return token
+        record_cache(self.metric_name, hit=False)
+        with self._lock:
+            # Another thread may have loaded it while we waited for the lock
+            if not (self._token and time.time() < self._usable_until()):
+                self._obtain(refresh=False)
+            token = self._token
+        self.start_refresher()
+        return token
+
+    def invalidate(self, token: str):
+        """Discard a token the API rejected, here and in the store, so the next get() fetches a new one"""
+        with self._lock:
+            if self._token == token:
+                self._token = None
+                self._expires_at = self._refresh_at = 0.0
+        try:
+            self._connection().execute(
+                "UPDATE tokens SET token = NULL, expires_at = 0, refresh_at = 0 WHERE name = ? AND token = ?",
+                (self.name, token)
+            )
+        except sqlite3.Error:
+            self._local.conn = None
+
+    def start_refresher(self):
+        """Start the background refresh thread (idempotent)"""
+        with self._lock:
+            if self._refresher is not None:
+                return
+            self._stop.clear()
+            self._refresher = threading.Thread(target=self._refresh_loop, name=f"{self.metric_name}-refresh", daemon=True)
+            self._refresher.start()
+
+    def stop(self):
+        """Stop the background refresh thread"""
+        self._stop.set()
+        refresher, self._refresher = self._refresher, None
+        if refresher is not None:
+            refresher.join(timeout=2)
+
+    def _usable_until(self) -> float:
+        # Stop using a token shortly before it expires, so it cannot expire in flight
+        return self._expires_at - min(60.0, (self._expires_at - self._refresh_at) / 2)
+
+    def _refresh_loop(self):
+        delay = max(1.0, self._refresh_at - time.time())
+        while not self._stop.wait(delay):
+            try:
+                with self._lock:
+                    if time.time() >= self._refresh_at:
+                        self._obtain(refresh=True)
+                delay = max(1.0, self._refresh_at - time.time())
+            except Exception as e:
+                # Keep serving the current token and try again well before it expires
+                remaining = self._expires_at - time.time()
+                delay = max(1.0, min(30.0, remaining / 4)) if remaining > 0 else 30.0
+                print(f"⚠️  Background refresh of {self.metric_name} failed ({e}); retrying in {delay:.0f}s")
+
+    def _obtain(self, refresh: bool):
+        """
+        Load a token into this process from the store, fetching it under the
+        lease when the store has none (refresh: none that is not yet due for refresh).
+        Called with self._lock held.
+        """
+        waited = time.monotonic()
+        while True:
+            try:
+                row, lease = self._claim(refresh)
+            except sqlite3.Error as e:
+                print(f"⚠️  Token store unavailable ({e}); fetching {self.metric_name} locally")
+                self._local.conn = None
+                token, expires_in = self.fetch()
+                self._set(token, time.time(), expires_in)
+                return
+            if row is not None:
+                self._token, self._expires_at, self._refresh_at = row
+                return
+            if lease:
+                try:
+                    token, expires_in = self.fetch()
+                except BaseException:
+                    self._release_lease()
+                    raise
+                self._store(token, time.time(), expires_in)
+                return
+            if time.monotonic() - waited > LEASE_SECONDS * 2:
+                raise TimeoutError(f"timed out waiting for another worker to fetch {self.metric_name}")
+            # Another worker holds the lease; jitter so waiters do not poll in lockstep
+            time.sleep(random.uniform(0.05, 0.15))
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Owner-only, checked before SQLite opens it: it holds live credentials
+            ensure_private_file(self.path)
+            conn = sqlite3.connect(self.path, timeout=2, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tokens (name TEXT PRIMARY KEY, token TEXT, expires_at REAL NOT NULL, "
+                "refresh_at REAL NOT NULL, lease_until REAL NOT NULL, lease_owner INTEGER)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _claim(self, refresh: bool) -> Tuple[Optional[Tuple[str, float, float]], bool]:
+        """
+        One IMMEDIATE transaction. Returns ((token, expires_at, refresh_at), False)
+        if the store has a good enough token, otherwise (None, whether we took the fetch lease).
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute(
+                "SELECT token, expires_at, refresh_at, lease_until FROM tokens WHERE name = ?", (self.name,)
+            ).fetchone()
+            if row is not None and row[0]:
+                token, expires_at, refresh_at = row[0], row[1], row[2]
+                usable_until = expires_at - min(60.0, (expires_at - refresh_at) / 2)
+                if (refresh_at if refresh else usable_until) > now:
+                    conn.execute("COMMIT")
+                    return (token, expires_at, refresh_at), False
+            lease = row is None or row[3] <= now
+            if lease:
+                conn.execute(
+                    "INSERT INTO tokens (name, token, expires_at, refresh_at, lease_until, lease_owner) "
+                    "VALUES (?, NULL, 0, 0, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET lease_until = excluded.lease_until, lease_owner = excluded.lease_owner",
+                    (self.name, now + LEASE_SECONDS, os.getpid())
+                )
+            conn.execute("COMMIT")
+            return None, lease
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _set(self, token: str, fetched_at: float, expires_in: float):
+        self._token = token
+        self._expires_at = fetched_at + expires_in
+        self._refresh_at = fetched_at + expires_in * REFRESH_RATIO
+
+    def _store(self, token: str, fetched_at: float, expires_in: float):
+        self._set(token, fetched_at, expires_in)
+        try:
+            self._connection().execute(
+                "UPDATE tokens SET token = ?, expires_at = ?, refresh_at = ?, lease_until = 0, lease_owner = NULL "
+                "WHERE name = ?",
+                (token, self._expires_at, self._refresh_at, self.name)
+            )
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not share {self.metric_name} through the token store: {e}")
+            self._local.conn = None
+
+    def _release_lease(self):
+        try:
+            self._connection().execute(
+                "UPDATE tokens SET lease_until = 0, lease_owner = NULL WHERE name = ? AND lease_owner = ?",
+                (self.name, os.getpid())
+            )
+        except sqlite3.Error:
+            self._local.conn = None
@@ -0,0 +1,165 @@
+"""OpenTelemetry tracing with a local JSONL exporter and Server-Timing summaries"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+
+from utils.api_logger import collect_orphans, rotate_file
+
+tracer = trace.get_tracer("flightbooking")
+
+# Stage durations of the request being handled; a list shared by every thread
+# the request fans out to, since copied contexts keep the same list object
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+class JsonlFileSpanExporter(SpanExporter):
+    """
+    Write finished spans to a local file, one OpenTelemetry JSON span per line.
+    Like the API logs, the file is gzip-rotated at max_bytes and only
+    backup_count rotated files are kept: of the whole family (the path prefix
+    of every process's trace files) if given, whose orphaned files from
+    processes no longer running are also compressed on startup.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024, backup_count: int = 14,
+                 family: Optional[str] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.family = family
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if family is not None:
+            try:
+                collect_orphans(family, backup_count)
+            except OSError as e:
+                print(f"Error compressing old trace files: {e}")
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        try:
+            with self._lock:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+                    size = f.tell()
+                if size >= self.max_bytes:
+                    rotate_file(self.path, self.backup_count, family=self.family)
+            return SpanExportResult.SUCCESS
+        except OSError as e:
+            print(f"Error writing trace file: {e}")
+            return SpanExportResult.FAILURE
+
+    def shutdown(self):
+        pass
+
+
+class ServerTimingProcessor(SpanProcessor):
+    """Record every ended span marked as a stage into the current request's timings"""
+
+    def on_end(self, span: ReadableSpan):
+        timings = _request_timings.get()
+        if timings is not None and span.attributes.get("server_timing"):
+            timings.append((span.name, (span.end_time - span.start_time) / 1e6))
+
+
+def setup_tracing():
+    """
+    Install the tracer provider for this process (idempotent).
+
+    Server-Timing is always collected. With TRACING_ENABLED=true, spans also go
+    to TRACE_EXPORT_DIR/traces_<pid>.jsonl (default "traces") through a batching
+    processor, rotated at TRACE_MAX_MB with TRACE_BACKUPS files kept.
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        provider = TracerProvider(resource=Resource.create({"service.name": "flight-booking-api"}))
+        provider.add_span_processor(ServerTimingProcessor())
+        if os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes"):
+            family = os.path.join(os.getenv("TRACE_EXPORT_DIR", "traces"), "traces_")
+            provider.add_span_processor(BatchSpanProcessor(JsonlFileSpanExporter(
+                f"{family}{os.getpid()}.jsonl",
+                max_bytes=int(float(os.getenv("TRACE_MAX_MB", "50")) * 1024 * 1024),
+                backup_count=int(os.getenv("TRACE_BACKUPS", "14")),
+                family=family
+            )))
+        trace.set_tracer_provider(provider)
+        _configured = True
+
+
+def flush_tracing(timeout_millis: int = 5000):
+    """Export pending spans (the provider itself shuts down at interpreter exit)"""
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, "force_flush"):
+        provider.force_flush(timeout_millis)
+
+
+@contextmanager
+def traced(name: str, **attributes):
+    """
+    Trace a pipeline stage as a span and include it in the Server-Timing header.
+
+    Can be used as a context manager or a decorator.
+    """
+    with tracer.start_as_current_span(name, attributes={"server_timing": True, **attributes}) as span:
+        yield span
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that opens a root span per HTTP request and adds a
+    Server-Timing header listing the duration of each stage span (summed by
+    name, in first-seen order) plus the total.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        span_name = f"{scope['method']} {scope['path']}"
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                header = format_server_timing(timings, (time.perf_counter() - started) * 1000)
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        try:
+            with tracer.start_as_current_span(span_name, kind=trace.SpanKind.SERVER) as span:
+                span.set_attribute("http.method", scope["method"])
+                span.set_attribute("http.target", scope["path"])
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+
+
+def format_server_timing(timings: List[Tuple[str, float]], total_ms: float) -> str:
+    totals: Dict[str, float] = {}
+    for name, duration_ms in timings:
+        totals[name] = totals.get(name, 0.0) + duration_ms
+    parts = [f"{name};dur={duration_ms:.1f}" for name, duration_ms in totals.items()]
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
@@ -0,0 +1,373 @@
+"""Pooled HTTP sessions for upstream APIs (Amadeus, PayPal)"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.api_logger import APILogger, get_api_logger
+from utils.metrics import (
+    record_upstream, UPSTREAM_CIRCUIT_OPENS, UPSTREAM_HEDGES, UPSTREAM_RETRIES, UPSTREAM_RETRY_DELAY,
+    UPSTREAM_SHORT_CIRCUITS, UPSTREAM_THROTTLE_WAIT, UPSTREAM_THROTTLED
+)
+from utils.rate_limit import BACKGROUND, RateLimitExceeded, SharedTokenBucket, current_priority
+from utils.resilience import CircuitBreaker, CircuitOpenError, HedgeBudget, LatencyTracker
+from utils.retry import IDEMPOTENT_METHODS, RetryPolicy, current_deadline
+from utils.tracing import traced
+
+_DEFAULT = object()
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def _on_event_loop() -> bool:
+    """Whether this thread runs an asyncio event loop, where any sleep stalls every request of the worker"""
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def _close_response(future: Future):
+    """Release the connection of a hedged attempt that lost the race (it holds one until read with stream=True)"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class UpstreamSession:
+    """
+    Keep-alive HTTP session for one upstream service.
+
+    Reuses TCP/TLS connections across calls instead of opening a new one per
+    request. Every call names the logical endpoint it hits (e.g. "flight-offers")
+    so cross-cutting concerns can be applied per endpoint in one place. Each
+    call is traced as a "<service>.<endpoint>" span.
+
+    Per endpoint, the session also keeps:
+    - a circuit breaker: after UPSTREAM_BREAKER_FAILURES consecutive failures
+      (network errors, 429 or 5xx) calls fail fast with CircuitOpenError for
+      UPSTREAM_BREAKER_RESET seconds, then a single trial call is let through
+    - a window of recent latencies; with adaptive_timeouts the read timeout is
+      UPSTREAM_TIMEOUT_MULTIPLIER x the observed p99 (never above the caller's
+      timeout, never below UPSTREAM_MIN_TIMEOUT)
+    - for calls made with hedge=True, a duplicate request sent once the first
+      has been outstanding for the observed p95; the first good response wins.
+      Hedges are limited to UPSTREAM_HEDGE_RATIO of eligible calls.
+
+    Transient failures (network errors, 429, 5xx) are retried with jittered
+    backoff or the upstream's Retry-After, within the caller's deadline; see
+    request().
+
+    With a rate_limiter, every call first takes a token from the shared bucket
+    at the priority of the calling context (see utils.rate_limit.priority);
+    hedges are only sent if a background-priority token is free right away.
+    """
+
+    def __init__(
+        self,
+        service: str,
+        pool_size: Optional[int] = None,
+        api_logger: Optional[APILogger] = _DEFAULT,
+        adaptive_timeouts: bool = False,
+        rate_limiter: Optional[SharedTokenBucket] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        idempotency_header: Optional[str] = None
+    ):
+        """
+        Initialize session
+
+        Args:
+            service: Upstream name, e.g. "amadeus" or "paypal"
+            pool_size: Maximum pooled connections per host (default UPSTREAM_POOL_SIZE or 20)
+            api_logger: Logger every call is recorded to (default: the process-wide
+                logger from get_api_logger(); None disables logging)
+            adaptive_timeouts: Derive read timeouts from observed latency instead of
+                always waiting the caller's full timeout
+            rate_limiter: Shared token bucket every call must take a token from
+            retry_policy: How transient failures are retried (default RetryPolicy())
+            idempotency_header: Request header that makes a non-idempotent call safe
+                to retry, e.g. "PayPal-Request-Id"
+        """
+        self.service = service
+        self.api_logger = get_api_logger() if api_logger is _DEFAULT else api_logger
+        self.pool_size = pool_size or int(os.getenv("UPSTREAM_POOL_SIZE", "20"))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.idempotency_header = idempotency_header
+        self.adaptive_timeouts = adaptive_timeouts and _env_flag("UPSTREAM_ADAPTIVE_TIMEOUTS", "true")
+        self.hedging = _env_flag("UPSTREAM_HEDGE", "true")
+        self.failure_threshold = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+        self.reset_timeout = float(os.getenv("UPSTREAM_BREAKER_RESET", "30"))
+        self.timeout_multiplier = float(os.getenv("UPSTREAM_TIMEOUT_MULTIPLIER", "3"))
+        self.min_timeout = float(os.getenv("UPSTREAM_MIN_TIMEOUT", "2"))
+        self.connect_timeout = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.latencies: Dict[str, LatencyTracker] = {}
+        self.hedge_budget = HedgeBudget(ratio=float(os.getenv("UPSTREAM_HEDGE_RATIO", "0.1")))
+        self._state_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop_warned = set()
+
+    def request(
+        self,
+        endpoint: str,
+        method: str,
+        url: str,
+        hedge: bool = False,
+        idempotent: Optional[bool] = None,
+        **kwargs
+    ) -> requests.Response:
+        """
+        Send a request through the pooled session, retrying transient failures
+
+        Network errors and 429/5xx responses are retried with the session's
+        RetryPolicy (Retry-After or jittered exponential backoff) while the
+        deadline allows: the calling context's (utils.retry.deadline) or, without
+        one, the call's own timeout, so retries never make a call slower than a
+        single attempt was allowed to be. Calls that are not idempotent are only
+        retried when they carry the session's idempotency header, which is resent
+        unchanged so the upstream can de-duplicate them.
+
+        Waiting (retry delays, rate-limit tokens, hedges) needs a worker thread,
+        e.g. asyncio.to_thread from async endpoints. Called on the event loop
+        thread itself, the call makes a single attempt without waiting, and a
+        warning names the endpoint.
+
+        Args:
+            endpoint: Logical endpoint name used for logging and metrics
+            method: HTTP method
+            url: Full request URL
+            hedge: The call is idempotent and may be sent twice to cut tail latency
+            idempotent: Safe to repeat (default: hedge, or an idempotent HTTP method)
+            **kwargs: Passed through to requests.Session.request
+
+        Returns:
+            requests.Response (the last one, if retries were exhausted)
+
+        Raises:
+            CircuitOpenError: The endpoint's circuit is open
+            RateLimitExceeded: No rate-limit token within the priority's maximum wait
+            (both are RequestExceptions, so callers handle them like network errors)
+        """
+        if idempotent is None:
+            idempotent = hedge or method.upper() in IDEMPOTENT_METHODS
+        headers = kwargs.get("headers") or {}
+        retryable = idempotent or (self.idempotency_header is not None and self.idempotency_header in headers)
+
+        on_loop = _on_event_loop()
+        if on_loop and endpoint not in self._loop_warned:
+            self._loop_warned.add(endpoint)
+            print(f"⚠️  {self.service}.{endpoint} called on the event loop thread; "
+                  f"not retrying or throttling it (run it with asyncio.to_thread)")
+
+        deadline_at = current_deadline()
+        if deadline_at is None and kwargs.get("timeout") is not None:
+            timeout = kwargs["timeout"]
+            deadline_at = time.monotonic() + (timeout[1] if isinstance(timeout, tuple) else timeout)
+
+        retry = 0
+        while True:
+            response = None
+            error = None
+            try:
+                response = self._attempt(endpoint, method, url, hedge, retry, deadline_at, dict(kwargs), on_loop)
+                reason = str(response.status_code) if self.retry_policy.should_retry_status(response.status_code) else None
+            except (CircuitOpenError, RateLimitExceeded):
+                raise
+            except requests.exceptions.RequestException as e:
+                if not self.retry_policy.should_retry_error(e):
+                    raise
+                error = e
+                reason = type(e).__name__
+
+            if reason is None:
+                return response
+            delay = self.retry_policy.delay(retry, response)
+            if (not retryable or on_loop or retry + 1 >= self.retry_policy.max_attempts
+                    or (deadline_at is not None and time.monotonic() + delay >= deadline_at)):
+                if error is not None:
+                    raise error
+                return response
+
+            UPSTREAM_RETRIES.labels(self.service, endpoint, reason).inc()
+            UPSTREAM_RETRY_DELAY.labels(self.service, endpoint).observe(delay)
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+            retry += 1
+
+    def _attempt(self, endpoint: str, method: str, url: str, hedge: bool, retry: int,
+                 deadline_at: Optional[float], kwargs: Dict, on_loop: bool = False) -> requests.Response:
+        """One attempt: circuit breaker, rate limit, then the (possibly hedged) request"""
+        breaker, latency = self._endpoint_state(endpoint)
+        retry_in = breaker.allow()
+        if retry_in is not None:
+            UPSTREAM_SHORT_CIRCUITS.labels(self.service, endpoint).inc()
+            raise CircuitOpenError(self.service, endpoint, retry_in)
+
+        if self.rate_limiter is not None:
+            level = current_priority()
+            try:
+                if on_loop:
+                    # Take a token only if one is free now; waiting would block the loop
+                    if self.rate_limiter.try_acquire(level) != 0:
+                        raise RateLimitExceeded(f"{self.rate_limiter.name} rate limit: no {level} capacity "
+                                                f"(not waiting on the event loop)")
+                    waited = 0.0
+                else:
+                    waited = self.rate_limiter.acquire(level)
+            except RateLimitExceeded:
+                breaker.cancel()
+                UPSTREAM_THROTTLED.labels(self.service, level).inc()
+                raise
+            if waited:
+                UPSTREAM_THROTTLE_WAIT.labels(self.service, level).observe(waited)
+
+        if "timeout" in kwargs:
+            kwargs["timeout"] = self._timeout(latency, kwargs["timeout"], deadline_at)
+
+        attempt = f"retry{retry}" if retry else "primary"
+        response = None
+        try:
+            hedge_after = latency.percentile(95) if hedge and self.hedging and not on_loop else None
+            if hedge_after is not None:
+                self.hedge_budget.deposit()
+                response = self._send_hedged(endpoint, method, url, hedge_after, kwargs, attempt)
+            else:
+                response = self._send(endpoint, method, url, kwargs, attempt)
+            return response
+        finally:
+            if response is not None and not self._is_failure(response):
+                breaker.record_success()
+            elif breaker.record_failure():
+                UPSTREAM_CIRCUIT_OPENS.labels(self.service, endpoint).inc()
+                print(f"⚠️  {self.service} {endpoint} circuit opened after {breaker.failures} failures")
+
+    def _endpoint_state(self, endpoint: str):
+        breaker = self.breakers.get(endpoint)
+        if breaker is None:
+            with self._state_lock:
+                breaker = self.breakers.setdefault(
+                    endpoint, CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                )
+                self.latencies.setdefault(endpoint, LatencyTracker())
+        return breaker, self.latencies[endpoint]
+
+    def _timeout(self, latency: LatencyTracker, timeout, deadline_at: Optional[float] = None):
+        """(connect, read) timeout, with the read timeout adapted to observed latency and the deadline"""
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        connect = min(connect, self.connect_timeout)
+        if self.adaptive_timeouts:
+            p99 = latency.percentile(99)
+            if p99 is not None:
+                read = min(read, max(self.min_timeout, p99 * self.timeout_multiplier))
+        if deadline_at is not None:
+            read = max(0.1, min(read, deadline_at - time.monotonic()))
+        return connect, read
+
+    @staticmethod
+    def _is_failure(response: requests.Response) -> bool:
+        return response.status_code == 429 or response.status_code >= 500
+
+    def _send(self, endpoint: str, method: str, url: str, kwargs: Dict, attempt: str = "primary") -> requests.Response:
+        started = time.perf_counter()
+        response = None
+        error = None
+        try:
+            with traced(f"{self.service}.{endpoint}", **{"http.method": method, "http.url": url,
+                                                          "upstream.attempt": attempt}) as span:
+                response = self.session.request(method, url, **kwargs)
+                span.set_attribute("http.status_code", response.status_code)
+            return response
+        except requests.exceptions.RequestException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            record_upstream(self.service, endpoint, elapsed, response.status_code if response is not None else None)
+            if response is not None and not self._is_failure(response):
+                self.latencies[endpoint].observe(elapsed)
+            if self.api_logger is not None:
+                self.api_logger.log_request(
+                    method=method,
+                    url=url,
+                    headers=kwargs.get("headers"),
+                    params=kwargs.get("params"),
+                    data=kwargs.get("data"),
+                    json_data=kwargs.get("json"),
+                    response=response,
+                    error=error,
+                    duration_ms=elapsed * 1000,
+                    service=self.service,
+                    endpoint=endpoint,
+                    streamed=bool(kwargs.get("stream"))
+                )
+
+    def _send_hedged(self, endpoint: str, method: str, url: str, hedge_after: float, kwargs: Dict,
+                     attempt: str = "primary") -> requests.Response:
+        """Send the request; if it has not answered within hedge_after seconds, race a duplicate"""
+        executor = self._get_executor()
+        # Each attempt runs in a copy of the caller's context so its span joins the request's trace
+        primary = executor.submit(contextvars.copy_context().run, self._send, endpoint, method, url, kwargs, attempt)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done or not self.hedge_budget.try_spend():
+            return primary.result()
+        if self.rate_limiter is not None and self.rate_limiter.try_acquire(BACKGROUND) != 0:
+            return primary.result()
+
+        hedge = executor.submit(contextvars.copy_context().run, self._send, endpoint, method, url, kwargs, "hedge")
+        attempts = {primary: "primary", hedge: "hedge"}
+        pending = set(attempts)
+        last_response = None
+        last_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except requests.exceptions.RequestException as e:
+                    last_error = e
+                    continue
+                if not self._is_failure(response):
+                    UPSTREAM_HEDGES.labels(self.service, endpoint, attempts[future]).inc()
+                    for loser in pending:
+                        loser.add_done_callback(_close_response)
+                    return response
+                last_response = response
+        UPSTREAM_HEDGES.labels(self.service, endpoint, "none").inc()
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._state_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.pool_size, thread_name_prefix=f"{self.service}-hedge"
+                    )
+        return self._executor
+
+    def circuit_states(self) -> Dict[str, str]:
+        """Endpoints whose circuit is not closed, e.g. {"flight-offers": "open"}"""
+        return {endpoint: b.state for endpoint, b in self.breakers.items() if b.state != CircuitBreaker.CLOSED}
+
+    def close(self):
+        """Close all pooled connections"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self.session.close()
@@ -0,0 +1,229 @@
+"""Price watches and the background scheduler that re-checks them in shared searches"""
+import math
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, PriceWatch
+from email_queue import EmailDispatcher, enqueue_email
+from email_service import EmailService
+from utils.price_history import PriceHistory
+from utils.rate_limit import priority, BACKGROUND, RateLimitExceeded
+
+
+def watch_search_key(origin: str, destination: str, departure_date: str, adults: int = 1, children: int = 0,
+                     infants: int = 0, travel_class: Optional[str] = None, currency: str = "GBP") -> str:
+    """Price-history route plus travel date: every watch with this key is answered by the same search"""
+    route = PriceHistory.route_key(origin, destination, adults, children, infants, travel_class, currency)
+    return f"{route}|{departure_date}"
+
+
+def enqueue_price_alert(db: Session, email_service: EmailService, watch: PriceWatch, price: float):
+    """Queue the price alert for a watch whose target was reached. The caller commits."""
+    watch_details = {
+        "origin": watch.origin,
+        "destination": watch.destination,
+        "departure_date": watch.departure_date,
+        "travel_class": watch.travel_class,
+        "currency": watch.currency,
+        "target_price": watch.target_price
+    }
+    message = email_service.build_price_alert_message(watch.customer_email, watch_details, price)
+    return enqueue_email(db, **message)
+
+
+def _cheapest_total(offers: Iterable[Dict]) -> Optional[float]:
+    """Lowest offer total; offers without a usable total are skipped, None if none has one"""
+    totals = []
+    for offer in offers:
+        try:
+            total = float((offer.get("price") or {}).get("total"))
+        except (TypeError, ValueError):
+            continue
+        if math.isfinite(total):
+            totals.append(total)
+    return min(totals, default=None)
+
+
+class PriceWatchScheduler:
+    """
+    Background worker that re-checks active price watches.
+
+    Watches are grouped by search_key, so however many customers watch the same
+    route, date, passengers and cabin, it costs one upstream search per
+    check_interval. A run searches at most max_searches groups (the rate budget),
+    most overdue first, at background priority so the shared token bucket keeps
+    interactive capacity in reserve; the rest wait for the next run. Every uvicorn
+    worker may run a scheduler: a group is claimed with a conditional UPDATE of
+    last_checked_at, so each group is searched by only one of them.
+
+    When the run's searches are done, all watches of the searched groups are
+    evaluated in one pass and alerts are queued in the email outbox.
+    """
+
+    def __init__(
+        self,
+        amadeus_client,
+        email_service: EmailService,
+        email_dispatcher: Optional[EmailDispatcher] = None,
+        price_history: Optional[PriceHistory] = None,
+        session_factory=SessionLocal,
+        check_interval: float = None,
+        max_searches: int = None,
+        poll_interval: float = None
+    ):
+        """
+        Args:
+            amadeus_client: Client used for the searches
+            email_service: Service used to build alert emails
+            email_dispatcher: Woken after alerts are queued, if given
+            price_history: Store every searched fare is recorded in, if given
+            session_factory: Callable returning a new DB session
+            check_interval: Seconds between two searches of the same group
+            max_searches: Upstream searches per run; 0 disables the scheduler
+            poll_interval: Seconds between runs
+        """
+        self.amadeus_client = amadeus_client
+        self.email_service = email_service
+        self.email_dispatcher = email_dispatcher
+        self.price_history = price_history
+        self.session_factory = session_factory
+        self.check_interval = check_interval or float(os.getenv("PRICE_WATCH_INTERVAL", "3600"))
+        self.max_searches = max_searches if max_searches is not None else int(os.getenv("PRICE_WATCH_MAX_SEARCHES", "20"))
+        self.poll_interval = poll_interval or float(os.getenv("PRICE_WATCH_POLL_INTERVAL", "60"))
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """Start the scheduler thread. Returns False if it is disabled."""
+        if self.max_searches <= 0:
+            print("Price watch scheduler disabled (PRICE_WATCH_MAX_SEARCHES=0); watches are not checked.")
+            return False
+        if self._thread and self._thread.is_alive():
+            return True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="price-watch-scheduler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout: float = 10):
+        """Stop the scheduler thread after the search in progress"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Price watch scheduler error: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def run_once(self) -> Dict:
+        """Search the most overdue groups within the budget and evaluate their watches"""
+        db = self.session_factory()
+        try:
+            expired = self._expire_past(db)
+            prices: Dict[str, Optional[float]] = {}
+            searches = 0
+            for key in self._due_keys(db):
+                if searches >= self.max_searches or self._stop.is_set():
+                    break
+                if not self._claim(db, key):
+                    continue
+                searches += 1
+                try:
+                    prices[key] = self._search(db, key)
+                except RateLimitExceeded as e:
+                    # Budget spent by other traffic: the rest waits for the next run
+                    print(f"⚠️  Price watch checks paused: {e}")
+                    break
+                except Exception as e:
+                    print(f"⚠️  Price watch search failed for {key}: {e}")
+
+            alerts = self._evaluate(db, prices)
+            if alerts and self.email_dispatcher is not None:
+                self.email_dispatcher.wake()
+            return {"searches": searches, "alerts": alerts, "expired": expired}
+        finally:
+            db.close()
+
+    def _expire_past(self, db: Session) -> int:
+        """Deactivate watches whose departure date has passed"""
+        result = db.execute(
+            update(PriceWatch)
+            .where(PriceWatch.active.is_(True), PriceWatch.departure_date < date.today().isoformat())
+            .values(active=False)
+        )
+        db.commit()
+        return result.rowcount
+
+    def _due_filter(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.check_interval)
+        return (PriceWatch.active.is_(True),
+                or_(PriceWatch.last_checked_at.is_(None), PriceWatch.last_checked_at <= cutoff))
+
+    def _due_keys(self, db: Session) -> List[str]:
+        """Search keys with at least one due watch, never-checked and longest-waiting first"""
+        oldest = func.min(func.coalesce(PriceWatch.last_checked_at, datetime(1970, 1, 1)))
+        rows = db.query(PriceWatch.search_key).filter(*self._due_filter()) \
+            .group_by(PriceWatch.search_key).order_by(oldest).limit(self.max_searches * 2).all()
+        return [key for (key,) in rows]
+
+    def _claim(self, db: Session, key: str) -> bool:
+        """Mark a group checked now, unless another scheduler got to it first"""
+        result = db.execute(
+            update(PriceWatch)
+            .where(PriceWatch.search_key == key, *self._due_filter())
+            .values(last_checked_at=datetime.utcnow())
+        )
+        db.commit()
+        return result.rowcount > 0
+
+    def _search(self, db: Session, key: str) -> Optional[float]:
+        """One upstream search for a group; returns its cheapest fare, None if nothing was offered"""
+        watch = db.query(PriceWatch).filter(PriceWatch.search_key == key).first()
+        if watch is None:
+            # Its last watch was deleted since the group was listed
+            return None
+        with priority(BACKGROUND):
+            price = self.amadeus_client.search_flights(
+                watch.origin, watch.destination, watch.departure_date,
+                adults=watch.adults, children=watch.children, infants=watch.infants,
+                travel_class=watch.travel_class, currency=watch.currency,
+                consume=_cheapest_total
+            )
+        if price is not None and self.price_history is not None:
+            route = PriceHistory.route_key(watch.origin, watch.destination, watch.adults, watch.children,
+                                           watch.infants, watch.travel_class, watch.currency)
+            self.price_history.record(route, watch.departure_date, price)
+        return price
+
+    def _evaluate(self, db: Session, prices: Dict[str, Optional[float]]) -> int:
+        """Apply this run's prices to every active watch of the searched groups. Returns alerts queued."""
+        found = {key: price for key, price in prices.items() if price is not None}
+        if not found:
+            return 0
+        alerts = 0
+        now = datetime.utcnow()
+        watches = db.query(PriceWatch).filter(
+            PriceWatch.active.is_(True), PriceWatch.search_key.in_(list(found))
+        ).all()
+        for watch in watches:
+            price = found[watch.search_key]
+            watch.last_price = price
+            # Alert once per drop: again only if the fare falls below the last alerted price
+            if price <= watch.target_price and (watch.notified_price is None or price < watch.notified_price):
+                enqueue_price_alert(db, self.email_service, watch, price)
+                watch.notified_price = price
+                watch.notified_at = now
+                alerts += 1
+        db.commit()
+        return alerts
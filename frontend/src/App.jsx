@@ -3,6 +3,7 @@ import { BrowserRouter as Router, Routes, Route } from 'react-router-dom'
 import ChatBot from './components/ChatBot'
 import PaymentSuccess from './components/PaymentSuccess'
 import PaymentCancelled from './components/PaymentCancelled'
+import MyBookings from './components/MyBookings'
 import './App.css'
 
 function AppRoutes() {
@@ -10,6 +11,7 @@ function AppRoutes() {
     <Routes>
       <Route path="/payment-success" element={<PaymentSuccess />} />
       <Route path="/payment-cancelled" element={<PaymentCancelled />} />
+      <Route path="/my-bookings" element={<MyBookings />} />
       <Route path="/" element={<ChatBot />} />
     </Routes>
   )
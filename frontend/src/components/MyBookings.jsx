@@ -0,0 +1,253 @@
+import React, { useEffect, useState } from 'react'
+import { useSearchParams, useNavigate } from 'react-router-dom'
+import axios from 'axios'
+
+// Use Vite proxy in dev (relative path /api), or full URL in production
+const API_BASE_URL = import.meta.env.VITE_API_URL || ''
+
+const EMPTY_WATCH = { origin: '', destination: '', departure_date: '', target_price: '' }
+
+// Validation errors (422) carry a list in detail; only show plain messages
+const errorMessage = (err, fallback) => {
+  const detail = err.response?.data?.detail
+  return typeof detail === 'string' ? detail : fallback
+}
+
+// Opened from the access link emailed by POST /api/email-access (?email=...&token=...)
+const MyBookings = () => {
+  const [searchParams] = useSearchParams()
+  const navigate = useNavigate()
+  const email = searchParams.get('email')
+  const token = searchParams.get('token')
+
+  const [bookings, setBookings] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
+  const [watches, setWatches] = useState([])
+  const [loading, setLoading] = useState(Boolean(email && token))
+  const [error, setError] = useState(null)
+
+  // Without a link: ask for one
+  const [requestEmail, setRequestEmail] = useState('')
+  const [linkSent, setLinkSent] = useState(false)
+
+  const [watchForm, setWatchForm] = useState(EMPTY_WATCH)
+  const [watchError, setWatchError] = useState(null)
+
+  const loadBookings = async (cursor = null) => {
+    const params = { email, token }
+    if (cursor) params.cursor = cursor
+    const response = await axios.get(`${API_BASE_URL}/api/bookings`, { params })
+    setBookings(previous => cursor ? [...previous, ...response.data.bookings] : response.data.bookings)
+    setNextCursor(response.data.next_cursor)
+  }
+
+  const loadWatches = async () => {
+    const response = await axios.get(`${API_BASE_URL}/api/price-watches`, { params: { email, token } })
+    setWatches(response.data.price_watches)
+  }
+
+  useEffect(() => {
+    if (!email || !token) return
+    const load = async () => {
+      try {
+        await Promise.all([loadBookings(), loadWatches()])
+      } catch (err) {
+        console.error('Error loading bookings:', err)
+        setError(err.response?.status === 403
+          ? 'This link has expired or is not valid. Request a new one below.'
+          : errorMessage(err, 'Could not load your bookings'))
+      } finally {
+        setLoading(false)
+      }
+    }
+    load()
+  }, [email, token])
+
+  const requestLink = async (event) => {
+    event.preventDefault()
+    try {
+      await axios.post(`${API_BASE_URL}/api/email-access`, { email: requestEmail || email })
+      setLinkSent(true)
+    } catch (err) {
+      setError(errorMessage(err, 'Could not send the access link'))
+    }
+  }
+
+  const createWatch = async (event) => {
+    event.preventDefault()
+    setWatchError(null)
+    try {
+      await axios.post(`${API_BASE_URL}/api/price-watches`, {
+        ...watchForm,
+        customer_email: email,
+        target_price: parseFloat(watchForm.target_price)
+      }, { params: { token } })
+      setWatchForm(EMPTY_WATCH)
+      await loadWatches()
+    } catch (err) {
+      setWatchError(errorMessage(err, 'Could not create the price alert'))
+    }
+  }
+
+  const stopWatch = async (watchId) => {
+    try {
+      await axios.delete(`${API_BASE_URL}/api/price-watches/${watchId}`, { params: { email, token } })
+      setWatches(previous => previous.filter(watch => watch.id !== watchId))
+    } catch (err) {
+      setWatchError(errorMessage(err, 'Could not stop the price alert'))
+    }
+  }
+
+  if (loading) {
+    return (
+      <div className="min-h-screen flex items-center justify-center bg-gradient-to-br from-blue-500 to-purple-600">
+        <div className="bg-white rounded-lg p-8 max-w-md w-full mx-4 text-center">
+          <div className="animate-spin rounded-full h-12 w-12 border-b-2 border-blue-600 mx-auto mb-4"></div>
+          <p className="text-gray-600">Loading your bookings...</p>
+        </div>
+      </div>
+    )
+  }
+
+  if (!email || !token || error) {
+    return (
+      <div className="min-h-screen flex items-center justify-center bg-gradient-to-br from-blue-500 to-purple-600 p-4">
+        <div className="bg-white rounded-lg p-8 max-w-md w-full shadow-2xl text-center">
+          <div className="text-6xl mb-4">🔑</div>
+          <h1 className="text-2xl font-bold text-gray-800 mb-2">My Bookings</h1>
+          {error && <p className="text-red-600 mb-4">{error}</p>}
+          {linkSent ? (
+            <p className="text-gray-600 mb-6">
+              An access link is on its way. Check your inbox.
+            </p>
+          ) : (
+            <form onSubmit={requestLink} className="space-y-3 mb-6">
+              <p className="text-gray-600">We'll email you a link to see your bookings and price alerts.</p>
+              <input
+                type="email"
+                required
+                value={requestEmail}
+                onChange={(e) => setRequestEmail(e.target.value)}
+                placeholder={email || 'you@example.com'}
+                className="w-full px-4 py-2 border border-gray-300 rounded-lg"
+              />
+              <button
+                type="submit"
+                className="w-full px-6 py-3 bg-gradient-to-r from-blue-600 to-purple-600 text-white rounded-lg hover:from-blue-700 hover:to-purple-700 transition font-semibold"
+              >
+                Email Me a Link
+              </button>
+            </form>
+          )}
+          <button onClick={() => navigate('/')} className="text-sm text-blue-600 hover:underline">
+            Return to Home
+          </button>
+        </div>
+      </div>
+    )
+  }
+
+  return (
+    <div className="min-h-screen bg-gradient-to-br from-blue-500 to-purple-600 p-4">
+      <div className="bg-white rounded-lg p-8 max-w-2xl w-full mx-auto shadow-2xl">
+        <h1 className="text-3xl font-bold text-gray-800 mb-1">My Bookings</h1>
+        <p className="text-gray-600 mb-6">{email}</p>
+
+        {bookings.length === 0 ? (
+          <p className="text-gray-600 mb-6">No bookings yet.</p>
+        ) : (
+          <div className="space-y-3 mb-6">
+            {bookings.map(booking => (
+              <div key={booking.booking_reference} className="bg-gray-50 rounded-lg p-4 text-sm">
+                <p><strong>Booking Reference:</strong> <span className="text-blue-600 font-mono">{booking.booking_reference}</span></p>
+                <p><strong>Route:</strong> {booking.origin} → {booking.destination} on {booking.departure_date}</p>
+                <p><strong>Total:</strong> {booking.currency} {booking.total_price?.toFixed(2)}</p>
+                <p><strong>Status:</strong> {booking.booking_status} (payment {booking.payment_status})</p>
+              </div>
+            ))}
+          </div>
+        )}
+        {nextCursor && (
+          <button
+            onClick={() => loadBookings(nextCursor)}
+            className="w-full px-6 py-2 border border-gray-300 text-gray-700 rounded-lg hover:bg-gray-50 transition mb-6"
+          >
+            Load More
+          </button>
+        )}
+
+        <h2 className="text-xl font-semibold text-gray-800 mb-3">📉 Price Alerts</h2>
+        {watchError && <p className="text-red-600 text-sm mb-3">{watchError}</p>}
+        {watches.length === 0 ? (
+          <p className="text-gray-600 text-sm mb-4">You are not watching any flights.</p>
+        ) : (
+          <div className="space-y-2 mb-4">
+            {watches.map(watch => (
+              <div key={watch.id} className="flex items-center justify-between bg-gray-50 rounded-lg p-3 text-sm">
+                <div>
+                  <p><strong>{watch.origin} → {watch.destination}</strong> on {watch.departure_date}</p>
+                  <p className="text-gray-600">
+                    Target {watch.currency} {watch.target_price.toFixed(2)}
+                    {watch.last_price != null && ` · last seen ${watch.currency} ${watch.last_price.toFixed(2)}`}
+                  </p>
+                </div>
+                <button onClick={() => stopWatch(watch.id)} className="text-red-600 hover:underline">
+                  Stop
+                </button>
+              </div>
+            ))}
+          </div>
+        )}
+
+        <form onSubmit={createWatch} className="grid grid-cols-2 gap-2 mb-6 text-sm">
+          <input
+            required
+            value={watchForm.origin}
+            onChange={(e) => setWatchForm({ ...watchForm, origin: e.target.value })}
+            placeholder="From (e.g. LHR)"
+            className="px-3 py-2 border border-gray-300 rounded-lg"
+          />
+          <input
+            required
+            value={watchForm.destination}
+            onChange={(e) => setWatchForm({ ...watchForm, destination: e.target.value })}
+            placeholder="To (e.g. CFU)"
+            className="px-3 py-2 border border-gray-300 rounded-lg"
+          />
+          <input
+            type="date"
+            required
+            value={watchForm.departure_date}
+            onChange={(e) => setWatchForm({ ...watchForm, departure_date: e.target.value })}
+            className="px-3 py-2 border border-gray-300 rounded-lg"
+          />
+          <input
+            type="number"
+            min="1"
+            step="0.01"
+            required
+            value={watchForm.target_price}
+            onChange={(e) => setWatchForm({ ...watchForm, target_price: e.target.value })}
+            placeholder="Target price (GBP)"
+            className="px-3 py-2 border border-gray-300 rounded-lg"
+          />
+          <button
+            type="submit"
+            className="col-span-2 px-6 py-2 bg-blue-600 text-white rounded-lg hover:bg-blue-700 transition"
+          >
+            Watch This Flight
+          </button>
+        </form>
+
+        <button
+          onClick={() => navigate('/')}
+          className="w-full px-6 py-3 bg-gradient-to-r from-blue-600 to-purple-600 text-white rounded-lg hover:from-blue-700 hover:to-purple-700 transition font-semibold"
+        >
+          Book Another Flight
+        </button>
+      </div>
+    </div>
+  )
+}
+
+export default MyBookings
@@ -59,6 +59,10 @@ REM Verify we're using the venv Python
 echo Verifying Python location...
 python -c "import sys; print('Python:', sys.executable)" 2>nul
 
+REM Create/migrate the schema once, before the server starts
+python init_db.py
+if errorlevel 1 echo Database initialization failed; starting anyway
+
 REM Run the application using uvicorn via Python module for better compatibility
 echo.
 echo Starting server...
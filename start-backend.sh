@@ -26,6 +26,9 @@ if [ $? -ne 0 ]; then
     pip install uvicorn[standard]
 fi
 
+# Create/migrate the schema
+python init_db.py || echo "Database initialization failed; starting anyway"
+
 # Run the application using uvicorn via Python module for better compatibility
 echo "Starting server..."
 echo "Backend will be available at:"